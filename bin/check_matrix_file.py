@@ -53,7 +53,8 @@ def read_file(format_name, file_path, verbose):
 
         for quote in parser.extract_quotes():
             if verbose:
-                print quote
+                # ORM objects are only created when they are printed
+                print quote.to_matrix_quote()
             quote.validate()
         print 'Got %s quotes' % parser.get_count()
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""Process the emails that the Postfix hook (receive_matrix_email.sh) saves
+in the spool directory, as they arrive. Unlike receive_matrix_email.py,
+which starts a new process for each email, this keeps a pool of worker
+processes that have already imported the parsers and connected to the
+databases and S3.
+
+Emails that could not be processed are moved to the spool's "error"
+directory along with the error message (see brokerage.email_spool), and
+bounced to their senders through the local mail server. So are emails that
+take longer than a time limit, in case the worker process processing one
+has died or is stuck.
+"""
+import logging
+import signal
+import smtplib
+import time
+import traceback
+from multiprocessing import Pool
+
+from brokerage import init_altitude_db, init_config, init_logging, init_model
+from brokerage.email_spool import EmailSpool, CUR, ERROR, make_bounce
+from brokerage.model import AltitudeSession, Session
+from brokerage.quote_email_processor import LOG_NAME
+from bin.receive_matrix_email import make_quote_email_processor
+
+# mail server that bounce messages are sent through (Postfix, which
+# delivers the emails to the spool)
+BOUNCE_SMTP_HOST = 'localhost'
+
+# QuoteEmailProcessor of each worker process, created by _init_worker
+_worker_processor = None
+
+
+def _init_worker():
+    global _worker_processor
+    # only the main process stops the daemon
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_model()
+    init_altitude_db()
+    # workers of a Pool are daemonic, so they can't start their own pools
+    _worker_processor = make_quote_email_processor(single_process=True)
+
+
+def _process_email_in_worker(email_path):
+    """:return: None if the email was processed successfully, or the
+    formatted traceback of the exception
+    """
+    try:
+        with open(email_path, 'rb') as email_file:
+            _worker_processor.process_email(email_file)
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        Session.remove()
+        AltitudeSession.remove()
+    return None
+
+
+class MatrixEmailDaemon(object):
+    """Hands out emails from an EmailSpool to a pool of worker processes.
+    """
+    def __init__(self, spool, processes, poll_seconds, timeout_seconds):
+        """
+        :param spool: EmailSpool
+        :param processes: number of worker processes
+        :param poll_seconds: time to wait between checks for new emails
+        :param timeout_seconds: time after which an email that is still
+        being processed fails
+        """
+        self._spool = spool
+        self._processes = processes
+        self._poll_seconds = poll_seconds
+        self._timeout_seconds = timeout_seconds
+        self._logger = logging.getLogger(LOG_NAME)
+        self._stopping = False
+
+        # email name -> (AsyncResult of _process_email_in_worker, time when
+        # it was claimed)
+        self._pending = {}
+
+        # True when an email timed out, so a worker process may be stuck:
+        # no more emails are claimed until the others are done, and then
+        # the pool is replaced
+        self._restart_pool = False
+
+    def stop(self, *args):
+        """Stop claiming new emails, so 'run' returns after the ones that
+        were already claimed are done. This is the SIGTERM handler.
+        """
+        self._logger.info('Stopping after %s emails' % len(self._pending))
+        self._stopping = True
+
+    def run(self):
+        self._spool.create_directories()
+        # emails from the last time the daemon stopped in the middle
+        for name in self._spool.recover():
+            self._logger.info('Recovered unfinished email %s' % name)
+        pool = self._make_pool()
+        try:
+            while not self._stopping or self._pending:
+                if self._restart_pool and not self._pending:
+                    self._logger.info('Replacing worker processes')
+                    pool.terminate()
+                    pool.join()
+                    pool = self._make_pool()
+                    self._restart_pool = False
+                if not (self._stopping or self._restart_pool):
+                    self._claim(pool)
+                self._check_results()
+                time.sleep(self._poll_seconds)
+        finally:
+            # a stuck worker would never finish
+            if self._restart_pool:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+
+    def _make_pool(self):
+        return Pool(processes=self._processes, initializer=_init_worker)
+
+    def _claim(self, pool):
+        # only enough emails to keep the workers busy are claimed, so the
+        # rest stay in "new" if the daemon stops
+        limit = 2 * self._processes - len(self._pending)
+        for name in self._spool.claim(limit=limit):
+            self._logger.info('Processing email %s' % name)
+            self._pending[name] = (pool.apply_async(
+                _process_email_in_worker, (self._spool.get_path(CUR, name),)),
+                                   time.time())
+
+    def _check_results(self):
+        now = time.time()
+        for name, (result, start_time) in self._pending.items():
+            if not result.ready():
+                # the result of a worker process that died never becomes
+                # ready
+                if now - start_time < self._timeout_seconds:
+                    continue
+                del self._pending[name]
+                error = 'Email was not processed within %s seconds' % (
+                    self._timeout_seconds)
+                self._logger.error('Error when processing email %s: %s' % (
+                    name, error))
+                self._fail(name, error)
+                self._restart_pool = True
+                continue
+            del self._pending[name]
+            error = result.get()
+            if error is None:
+                self._spool.finish(name)
+                continue
+            self._logger.error('Error when processing email %s:\n%s' % (
+                name, error))
+            self._fail(name, error)
+
+    def _fail(self, name, error):
+        """Move a claimed email to the spool's "error" directory and bounce
+        it. A bounce that can't be sent is only logged, since the email is
+        still in "error".
+        """
+        self._spool.fail(name, error)
+        try:
+            with open(self._spool.get_path(ERROR, name), 'rb') as email_file:
+                bounce = make_bounce(email_file, error)
+            if bounce is None:
+                return
+            recipient, message = bounce
+            smtp = smtplib.SMTP(BOUNCE_SMTP_HOST)
+            try:
+                # empty envelope sender, so the bounce is never bounced
+                smtp.sendmail('', [recipient], message.as_string())
+            finally:
+                smtp.quit()
+        except Exception:
+            self._logger.error('Could not bounce email %s:\n%s' % (
+                name, traceback.format_exc()))
+
+
+if __name__ == '__main__':
+    logger = logging.getLogger(LOG_NAME)
+    logger.setLevel(logging.DEBUG)
+    init_logging()
+    init_config()
+    from brokerage import config
+    daemon = MatrixEmailDaemon(
+        EmailSpool(config.get('brokerage', 'email_spool_dir')),
+        config.get('brokerage', 'email_processes'),
+        config.get('brokerage', 'spool_poll_seconds'),
+        config.get('brokerage', 'email_timeout_seconds'))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    try:
+        daemon.run()
+    except Exception:
+        logger.error('Error in matrix email daemon:\n%s' % (
+            traceback.format_exc()))
+        raise
@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 """Receive quotes from suppliers' "matrix" spreadsheets in email attachments.
-Pipe an email into stdin to process it.
+Pipe an email into stdin to process it. (In deployment, emails are saved in
+a spool directory and processed by bin/matrix_email_daemon.py instead.)
 """
 import logging
 import traceback
+from datetime import timedelta
 from fcntl import flock, LOCK_EX
 from sys import stdin
 
@@ -26,6 +28,42 @@ def split_altitude_uri(altitude_uri):
     return server, username, password, database
 
 
+def make_quote_email_processor(single_process=False):
+    """:return: QuoteEmailProcessor with the settings in the config file,
+    which must be initialized first.
+    :param single_process: if True, each file is read in this process
+    instead of using worker processes (which is required in a daemonic
+    process, like the workers of bin/matrix_email_daemon.py).
+    """
+    from brokerage import config
+    s3_connection = S3Connection(
+        config.get('aws_s3', 'aws_access_key_id'),
+        config.get('aws_s3', 'aws_secret_access_key'),
+        is_secure=config.get('aws_s3', 'is_secure'),
+        port=config.get('aws_s3', 'port'),
+        host=config.get('aws_s3', 'host'),
+        calling_format=config.get('aws_s3', 'calling_format'))
+    s3_bucket_name = config.get('brokerage', 'quote_file_bucket')
+    if single_process:
+        parser_processes, attachment_processes = 1, 1
+    else:
+        parser_processes = config.get('brokerage', 'parser_processes')
+        attachment_processes = config.get('brokerage', 'attachment_processes')
+    return QuoteEmailProcessor(
+        CLASSES_FOR_FORMATS, QuoteDAO(), s3_connection, s3_bucket_name,
+        parser_processes=parser_processes,
+        trace_dir=config.get('brokerage', 'reader_trace_dir') or None,
+        snapshot_dir=config.get('brokerage', 'quote_snapshot_dir') or None,
+        max_file_memory=config.get(
+            'brokerage', 'max_file_memory_mb') * 2 ** 20 or None,
+        attachment_processes=attachment_processes,
+        upload_threads=config.get('brokerage', 'upload_threads'),
+        attachment_index_dir=config.get(
+            'brokerage', 'attachment_index_dir') or None,
+        duplicate_window=timedelta(hours=config.get(
+            'brokerage', 'duplicate_window_hours')))
+
+
 if __name__ == '__main__':
     try:
         # logger initially has no handlers; initialize() adds them according
@@ -33,19 +71,7 @@ if __name__ == '__main__':
         logger = logging.getLogger(LOG_NAME)
         logger.setLevel(logging.DEBUG)
         initialize()
-
-        from brokerage import config
-        s3_connection = S3Connection(
-            config.get('aws_s3', 'aws_access_key_id'),
-            config.get('aws_s3', 'aws_secret_access_key'),
-            is_secure=config.get('aws_s3', 'is_secure'),
-            port=config.get('aws_s3', 'port'),
-            host=config.get('aws_s3', 'host'),
-            calling_format=config.get('aws_s3', 'calling_format'))
-        s3_bucket_name = config.get('brokerage', 'quote_file_bucket')
-        qep = QuoteEmailProcessor(CLASSES_FOR_FORMATS, QuoteDAO(),
-                                  s3_connection, s3_bucket_name)
-        qep.process_email(stdin)
+        make_quote_email_processor().process_email(stdin)
     except Exception as e:
         logger.error('Error when processing email:\n%s' % (
             traceback.format_exc()))
@@ -0,0 +1,111 @@
+"""Code for recognizing quote files that have already been processed, so
+an identical copy (such as an email that was forwarded twice, or resent
+along with a correction) can be skipped instead of being uploaded, read and
+inserted again.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from util.dateutils import ISO_8601_DATETIME
+
+
+def get_content_hash(quote_file):
+    """
+    :param quote_file: seekable file object, which is left at the start
+    :return: string that identifies the file by its content
+    """
+    content_hash = hashlib.sha1()
+    quote_file.seek(0)
+    for chunk in iter(lambda: quote_file.read(2 ** 16), ''):
+        content_hash.update(chunk)
+    quote_file.seek(0)
+    return content_hash.hexdigest()
+
+
+class AttachmentOutcome(object):
+    """Result of successfully processing a quote file.
+    """
+    def __init__(self, quote_count, matrix_format_id, time):
+        """
+        :param quote_count: number of quotes read from the file
+        :param matrix_format_id: primary key of the file's MatrixFormat
+        :param time: datetime (UTC) when the file was processed
+        """
+        self.quote_count = quote_count
+        self.matrix_format_id = matrix_format_id
+        self.time = time
+
+
+class AttachmentIndex(object):
+    """Remembers the outcome of each quote file from a supplier by the hash
+    of its content, for a limited time. The index is stored as one JSON
+    file per supplier in a directory.
+    """
+    def __init__(self, directory, window):
+        """
+        :param directory: path of the directory where the index is stored
+        :param window: timedelta: how long a file is remembered
+        """
+        self._directory = directory
+        self._window = window
+
+    def _get_path(self, supplier):
+        return os.path.join(self._directory, '%s.json' % supplier.id)
+
+    def _load(self, supplier, now):
+        """:return: dictionary mapping content hash to (quote count, format
+        id, time string) for files of 'supplier' that are still within the
+        window at time 'now'
+        """
+        try:
+            with open(self._get_path(supplier)) as index_file:
+                entries = json.load(index_file)
+        except IOError:
+            return {}
+        oldest = (now - self._window).strftime(ISO_8601_DATETIME)
+        # the time format sorts the same way as the times themselves
+        return {str(content_hash): entry for content_hash, entry in
+                entries.iteritems() if entry[2] >= oldest}
+
+    def get(self, supplier, content_hash, now=None):
+        """
+        :param supplier: core.model.Supplier that sent the file
+        :param content_hash: value returned by get_content_hash for the file
+        :param now: current datetime (UTC) (for testing)
+        :return: AttachmentOutcome of the same file from the same supplier,
+        if it was processed within the window, otherwise None.
+        """
+        if now is None:
+            now = datetime.utcnow()
+        entry = self._load(supplier, now).get(content_hash)
+        if entry is None:
+            return None
+        quote_count, matrix_format_id, time_string = entry
+        return AttachmentOutcome(quote_count, matrix_format_id,
+                                 datetime.strptime(time_string,
+                                                   ISO_8601_DATETIME))
+
+    def add(self, supplier, content_hash, quote_count, matrix_format_id,
+            now=None):
+        """Record that a file was processed successfully. Entries that are
+        outside the window are removed at the same time.
+        :param supplier: core.model.Supplier that sent the file
+        :param content_hash: value returned by get_content_hash for the file
+        :param quote_count: number of quotes read from the file
+        :param matrix_format_id: primary key of the file's MatrixFormat
+        :param now: current datetime (UTC) (for testing)
+        """
+        if now is None:
+            now = datetime.utcnow()
+        entries = self._load(supplier, now)
+        entries[content_hash] = [quote_count, matrix_format_id,
+                                 now.strftime(ISO_8601_DATETIME)]
+        # written atomically, so a concurrent 'get' never sees a partial
+        # file (like QuoteSnapshot.save)
+        path = self._get_path(supplier)
+        temp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(temp_path, 'w') as index_file:
+            json.dump(entries, index_file)
+        os.rename(temp_path, path)
@@ -54,6 +54,42 @@ class db(Schema):
 class brokerage(Schema):
     # name of Amazon S3 bucket where quote files will be uploaded
     quote_file_bucket = String()
+    # maximum number of processes for reading a single quote file (only
+    # some formats can use more than 1)
+    parser_processes = Int(min=1)
+    # maximum number of processes for reading the attachments of one email
+    # at the same time (each one in a single process)
+    attachment_processes = Int(min=1)
+    # number of threads that upload quote files to S3 while they are read
+    upload_threads = Int(min=1)
+    # directory where the content hash of each quote file that was
+    # processed is remembered, so identical copies of it are skipped. empty
+    # means every file is processed.
+    attachment_index_dir = Directory()
+    # number of hours that a file is remembered in the attachment index
+    duplicate_window_hours = Int(min=0)
+    # directory where traces of the cells read in each quote file format
+    # are saved, so later files of the same format can be loaded faster.
+    # empty means traces are not used.
+    reader_trace_dir = Directory()
+    # directory where the quotes from the last file of each supplier and
+    # format are remembered, so only new or changed quotes are inserted from
+    # the next one. empty means all quotes are always inserted.
+    quote_snapshot_dir = Directory()
+    # maximum memory in megabytes that can be used to load a single quote
+    # file; larger files are rejected. 0 means no limit.
+    max_file_memory_mb = Int(min=0)
+    # directory where the Postfix hook saves incoming emails for
+    # bin/matrix_email_daemon.py (see brokerage.email_spool)
+    email_spool_dir = Directory()
+    # number of worker processes in the daemon, each processing one email
+    # at a time
+    email_processes = Int(min=1)
+    # seconds that the daemon waits before checking for new emails again
+    spool_poll_seconds = Number(min=0)
+    # seconds after which the daemon gives up on an email that is still
+    # being processed (for example because its worker process died)
+    email_timeout_seconds = Number(min=1)
 
 class aws_s3(Schema):
     # utility bill file storage in Amazon S3
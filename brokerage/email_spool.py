@@ -0,0 +1,157 @@
+"""Code for the directory where incoming emails wait to be processed by the
+matrix email daemon (bin/matrix_email_daemon.py), so Postfix only has to
+save each email instead of starting the whole application for it.
+"""
+import os
+import socket
+import time
+from email.mime.text import MIMEText
+from email.parser import HeaderParser
+from email.utils import parseaddr
+from errno import ENOENT
+from itertools import count
+
+# subdirectories of the spool, like those of a maildir: emails are written
+# in TMP and then moved to NEW, so they only appear there when complete.
+# the daemon moves each one to CUR while it is being processed, and to
+# ERROR if that failed.
+TMP = 'tmp'
+NEW = 'new'
+CUR = 'cur'
+ERROR = 'error'
+
+# the error message of an email in ERROR is stored in a file with the same
+# name plus this suffix
+ERROR_SUFFIX = '.error'
+
+# makes the names of emails delivered by this process unique
+_delivery_counter = count()
+
+
+class EmailSpool(object):
+    """Directory where emails are stored to be processed later, one file per
+    email, in the layout of a maildir (see TMP, NEW, CUR, ERROR).
+
+    Emails are delivered by the Postfix hook (receive_matrix_email.sh),
+    which does the same thing as 'deliver' in a shell script. Each one is
+    then claimed by the daemon, and removed when it has been processed or
+    moved to ERROR (after which the daemon bounces it; see make_bounce).
+    Every step is a rename, so an email is never seen partially written or
+    by two processes at once.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the spool directory
+        """
+        self._path = path
+
+    def create_directories(self):
+        """Create the subdirectories of the spool if they don't exist.
+        """
+        for name in (TMP, NEW, CUR, ERROR):
+            path = os.path.join(self._path, name)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    def get_path(self, subdirectory, name):
+        """:return: path of the email with the given name in the given
+        subdirectory (one of TMP, NEW, CUR, ERROR)
+        """
+        return os.path.join(self._path, subdirectory, name)
+
+    def deliver(self, email_file):
+        """Store an email in NEW.
+        :param email_file: file containing the email
+        :return: name of the email in the spool
+        """
+        # like the names of files in a maildir
+        name = '%.6f.%d_%d.%s' % (time.time(), os.getpid(),
+                                  next(_delivery_counter),
+                                  socket.gethostname())
+        temp_path = self.get_path(TMP, name)
+        with open(temp_path, 'wb') as spool_file:
+            for chunk in iter(lambda: email_file.read(2 ** 16), ''):
+                spool_file.write(chunk)
+            spool_file.flush()
+            os.fsync(spool_file.fileno())
+        os.rename(temp_path, self.get_path(NEW, name))
+        return name
+
+    def claim(self, limit=None):
+        """Move emails from NEW to CUR, oldest first (by name, which starts
+        with the time when it was delivered).
+        :param limit: maximum number of emails to claim, or None for all
+        :return: list of names of the claimed emails
+        """
+        claimed = []
+        for name in sorted(os.listdir(os.path.join(self._path, NEW))):
+            if limit is not None and len(claimed) >= limit:
+                break
+            try:
+                os.rename(self.get_path(NEW, name), self.get_path(CUR, name))
+            except OSError as e:
+                # another process claimed it first
+                if e.errno != ENOENT:
+                    raise
+                continue
+            claimed.append(name)
+        return claimed
+
+    def recover(self):
+        """Move emails that were claimed but never finished (because the
+        process that claimed them stopped) back to NEW. This should only be
+        done when no other process is using the spool.
+        :return: list of names of the recovered emails
+        """
+        names = sorted(os.listdir(os.path.join(self._path, CUR)))
+        for name in names:
+            os.rename(self.get_path(CUR, name), self.get_path(NEW, name))
+        return names
+
+    def finish(self, name):
+        """Remove a claimed email after it was processed successfully.
+        """
+        os.remove(self.get_path(CUR, name))
+
+    def fail(self, name, message):
+        """Move a claimed email that could not be processed to ERROR.
+        :param message: error message (string), which is saved along with it
+        """
+        with open(self.get_path(ERROR, name + ERROR_SUFFIX), 'w') as \
+                error_file:
+            error_file.write(message)
+        os.rename(self.get_path(CUR, name), self.get_path(ERROR, name))
+
+
+def make_bounce(email_file, error_message):
+    """Make a message that returns an email that could not be processed to
+    its sender, with the error message (as Postfix did when the email was
+    processed by the Postfix hook itself).
+    :param email_file: file containing the email, at the start
+    :param error_message: string
+    :return: (recipient address, email.mime.text.MIMEText), or None if the
+    email has no sender to return it to
+    """
+    # only the headers are read
+    header_lines = []
+    for line in iter(email_file.readline, ''):
+        if line in ('\n', '\r\n'):
+            break
+        header_lines.append(line)
+    headers = HeaderParser().parsestr(''.join(header_lines))
+
+    # the envelope sender is where bounces should go. an empty one means
+    # the email was a bounce itself, which must not be answered.
+    sender = headers['Return-Path']
+    if sender is None:
+        sender = headers['From']
+    _, recipient = parseaddr(sender or '')
+    if recipient == '':
+        return None
+    bounce = MIMEText('The email "%s" could not be processed:\n\n%s' % (
+        headers['Subject'], error_message))
+    bounce['Subject'] = 'Undelivered Mail Returned to Sender'
+    bounce['From'] = headers['Delivered-To'] or 'MAILER-DAEMON'
+    bounce['To'] = recipient
+    bounce['Auto-Submitted'] = 'auto-replied'
+    return recipient, bounce
@@ -8,3 +8,7 @@ class DatabaseError(MatrixError):
 
 class ValidationError(MatrixError):
     pass
+
+
+class FileTooLargeError(MatrixError):
+    """Raised when loading a quote file takes more memory than allowed."""
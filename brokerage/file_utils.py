@@ -1,12 +1,14 @@
 import os
 from abc import ABCMeta
 from os.path import splitext
+from shutil import copyfileobj
 from zipfile import ZipFile
 
 from testfixtures import TempDirectory
 
 from brokerage.exceptions import MatrixError
 from brokerage import ROOT_PATH
+from util.file_utils import AttachmentFile
 from util.shell import shell_quote, run_command_in_shell
 
 
@@ -18,7 +20,8 @@ class Converter(object):
     """Base for utility classes that convert a file from one type to another
     by writing a temporary file and then running another program to convert
     that into an output file. All this happens in a temporary directory that
-    should get automatically cleaned up.
+    is removed by 'close' (a Converter can also be used as a context
+    manager).
     """
     __metaclass__ = ABCMeta
 
@@ -46,9 +49,17 @@ class Converter(object):
         :return: converted file opened in 'rb' mode
         """
         temp_file_path = os.path.join(self.directory.path, file_name)
-        with open(temp_file_path, 'wb') as temp_file:
-            temp_file.write(fp.read())
         converted_file_path = self.get_converted_file_path(temp_file_path)
+        if isinstance(fp, AttachmentFile) and \
+                converted_file_path != temp_file_path:
+            # the attachment is already on disk (or written there once), so
+            # it is linked instead of copied. when the converted file has
+            # the same name, it must be a copy, because the converter
+            # overwrites it.
+            os.symlink(fp.get_path(), temp_file_path)
+        else:
+            with open(temp_file_path, 'wb') as temp_file:
+                copyfileobj(fp, temp_file)
         command = self.get_command(temp_file_path, converted_file_path)
         _, _, check_exit_status = run_command_in_shell(command)
 
@@ -60,9 +71,18 @@ class Converter(object):
                 file_name, converted_file_path))
         return open(converted_file_path, 'rb')
 
-    def __del__(self):
+    def close(self):
+        """Remove the temporary directory, including the converted file.
+        Files that are still open can be read until they are closed.
+        """
         self.directory.cleanup()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
 
 class LibreOfficeFileConverter(Converter):
     """Converts MS Office/LibreOffice files from one type to another using
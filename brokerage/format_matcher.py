@@ -0,0 +1,173 @@
+"""Code for choosing the MatrixFormat of a quote file, based on the file
+name (or email subject), without querying the database for every file.
+"""
+import re
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from brokerage.model import MatrixFormat, Session
+
+
+def copy_unattached(instance):
+    """Return a copy of the column attributes of a mapped object (such as a
+    MatrixFormat) that is not associated with any session, so they can be
+    used after the original's session has been committed, rolled back or
+    closed. Relationships are not copied. The copy must never be added to a
+    session.
+    """
+    mapper = inspect(instance).mapper
+    copy = mapper.class_manager.new_instance()
+    for column_property in mapper.column_attrs:
+        # setting the values this way does not fire attribute events
+        set_committed_value(copy, column_property.key,
+                            getattr(instance, column_property.key))
+    return copy
+
+
+class FormatMatcher(object):
+    """Matches file names against the matrix attachment names of a
+    supplier's MatrixFormats, using regular expressions that are only
+    compiled once.
+    """
+    def __init__(self, matrix_formats):
+        """
+        :param matrix_formats: iterable of MatrixFormats of one supplier
+        """
+        self._formats = [(
+            None if f.matrix_attachment_name is None else re.compile(
+                f.matrix_attachment_name, re.IGNORECASE | re.DOTALL),
+            f.match_email_body, f) for f in matrix_formats]
+
+    def match(self, file_name, match_email_body):
+        """
+        :param file_name: name of the matrix file (or email subject)
+        :param match_email_body: only formats with the same
+        'match_email_body' value can match
+        :return: list of all matching MatrixFormats, in the same order they
+        were given
+        """
+        return [f for regex, body, f in self._formats if
+                body == match_email_body and
+                (regex is None or regex.match(file_name))]
+
+    def get_formats(self, match_email_body):
+        """
+        :return: list of all MatrixFormats with the given 'match_email_body'
+        value, whatever their names.
+        """
+        return [f for _, body, f in self._formats if body == match_email_body]
+
+
+class FormatMatcherCache(object):
+    """Keeps a FormatMatcher for each supplier. The matchers contain copies
+    of MatrixFormats that are not in any session, so using them never causes
+    a database query.
+
+    A supplier's matcher is discarded whenever a MatrixFormat belonging to
+    it is changed, inserted or deleted through the ORM (see the event
+    listeners below). Changes made some other way, such as by another
+    process (like the admin pages of the web app, for the matrix email
+    daemon), are seen when the matcher expires after 'ttl' seconds, or
+    after an explicit call to 'invalidate'.
+    """
+    # time in seconds that a matcher is used before the formats are loaded
+    # again by default
+    DEFAULT_TTL = 60
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        """
+        :param ttl: time in seconds that each matcher is used
+        """
+        self.ttl = ttl
+
+        # supplier id -> (FormatMatcher, expiration time)
+        self._matchers = {}
+
+    def get_matcher(self, supplier, now=None):
+        """
+        :param supplier: brokerage.model.Supplier (which may be a copy that
+        is not in any session)
+        :param now: current time as returned by time.time() (for testing)
+        :return: FormatMatcher for the supplier's MatrixFormats
+        """
+        if supplier.id is None:
+            # a supplier that is not in the database yet can't be
+            # identified later, and its formats may still change
+            return FormatMatcher(supplier.matrix_formats)
+        if now is None:
+            now = time.time()
+        entry = self._matchers.get(supplier.id)
+        if entry is None or now >= entry[1]:
+            # the formats are queried, rather than taken from
+            # supplier.matrix_formats, because 'supplier' may be a copy
+            matrix_formats = Session().query(MatrixFormat).filter_by(
+                supplier_id=supplier.id).order_by(
+                MatrixFormat.matrix_format_id).all()
+            entry = (FormatMatcher([copy_unattached(f) for f in
+                                    matrix_formats]), now + self.ttl)
+            self._matchers[supplier.id] = entry
+        return entry[0]
+
+    def has_matcher(self, supplier_id):
+        """:return: True if a FormatMatcher for the supplier with the given
+        id is cached (so its MatrixFormats have not been changed through the
+        ORM since then). The matcher may have expired.
+        """
+        return supplier_id in self._matchers
+
+    def invalidate(self, supplier_id=None):
+        """Discard the matcher for the given supplier, or all matchers if
+        'supplier_id' is None.
+        """
+        if supplier_id is None:
+            self._matchers.clear()
+        else:
+            self._matchers.pop(supplier_id, None)
+
+
+format_matcher_cache = FormatMatcherCache()
+
+
+def _invalidate_suppliers(matrix_format, *suppliers):
+    """Invalidate the matchers of all suppliers that 'matrix_format'
+    belongs to or is being moved to or from. Only attributes that are
+    already loaded are used (because these functions can be called in the
+    middle of a flush) so if the supplier of a MatrixFormat that is already
+    in the database is unknown, all matchers are invalidated.
+    """
+    supplier_ids = {matrix_format.__dict__.get('supplier_id')}
+    supplier_ids.update(getattr(s, 'id', None) for s in
+                        suppliers + (matrix_format.__dict__.get('supplier'),))
+    supplier_ids.discard(None)
+    if supplier_ids == set() and inspect(matrix_format).has_identity:
+        format_matcher_cache.invalidate()
+    for supplier_id in supplier_ids:
+        format_matcher_cache.invalidate(supplier_id)
+
+
+@event.listens_for(MatrixFormat, 'after_insert')
+@event.listens_for(MatrixFormat, 'after_update')
+@event.listens_for(MatrixFormat, 'after_delete')
+def _matrix_format_flushed(mapper, connection, target):
+    _invalidate_suppliers(target)
+
+
+@event.listens_for(MatrixFormat.matrix_attachment_name, 'set')
+@event.listens_for(MatrixFormat.match_email_body, 'set')
+def _matrix_format_attribute_set(target, value, oldvalue, initiator):
+    _invalidate_suppliers(target)
+
+
+@event.listens_for(MatrixFormat.supplier, 'set')
+def _matrix_format_supplier_set(target, value, oldvalue, initiator):
+    _invalidate_suppliers(target, value, oldvalue)
+
+
+@event.listens_for(MatrixFormat.supplier_id, 'set')
+def _matrix_format_supplier_id_set(target, value, oldvalue, initiator):
+    for supplier_id in (value, oldvalue):
+        if isinstance(supplier_id, (int, long)):
+            format_matcher_cache.invalidate(supplier_id)
+    _invalidate_suppliers(target)
@@ -18,11 +18,12 @@ from sqlalchemy.types import Integer, String, Enum
 from sqlalchemy.util.langhelpers import symbol
 
 from brokerage.validation import MatrixQuoteValidator
-from util.units import unit_registry
+from util.dateutils import date_to_datetime
+from util.monthmath import Month
 
 __all__ = ['Address', 'Base', 'AltitudeBase', 'MYSQLDB_DATETIME_MIN',
            'Session', 'AltitudeSession', 'altitude_metadata',
-           'Supplier']
+           'Supplier', 'MatrixQuoteRecord']
 
 # Python's datetime.min is too early for the MySQLdb module; including it in a
 # query to mean "the beginning of time" causes a strptime failure, so this
@@ -34,20 +35,15 @@ AltitudeSession = scoped_session(sessionmaker())
 altitude_metadata = MetaData()
 
 # allowed units for register quantities.
-# UnitRegistry attributes are used in the values to ensure that there's an
-# entry for every one of the allowed units (otherwise unit conversion would
-# fail, as it has in past bugs.)
-PHYSICAL_UNITS = {
-    'BTU': unit_registry.BTU,
-    'MMBTU': unit_registry.MMBTU,
-    'kWD': unit_registry.kWD,
-    'kWh': unit_registry.kWh,
-    'therms': unit_registry.therms,
-}
+# every one of them must be in util.units.unit_registry (otherwise unit
+# conversion would fail, as it has in past bugs). this is checked by a test
+# rather than here, so the UnitRegistry isn't created when this module is
+# imported.
+PHYSICAL_UNITS = ['BTU', 'MMBTU', 'therms', 'kWD', 'kWh']
 
 # this type should be used for database columns whose values can be the unit
 # names above
-physical_unit_type = Enum(*PHYSICAL_UNITS.keys(), name='physical_unit')
+physical_unit_type = Enum(*PHYSICAL_UNITS, name='physical_unit')
 
 
 class _Base(object):
@@ -300,6 +296,14 @@ class Quote(AltitudeBase):
         self.service_type = service_type
         self.created_by = 1
 
+        # same as the server defaults, so these columns always have values
+        # when the object is converted into insert parameters with
+        # raw_column_dict
+        if self.purchase_of_receivables is None:
+            self.purchase_of_receivables = False
+        if self.dual_billing is None:
+            self.dual_billing = True
+
         # pick a MatrixQuoteValidator class based on service type (mandatory)
         assert self.service_type is not None
         assert isinstance(self.term_months, int)
@@ -341,3 +345,176 @@ class MatrixQuote(Quote):
         return '\n'.join(['Matrix quote'] +
                          ['%s: %s' % (name, getattr(self, name)) for name in
                           self.column_names()] + [''])
+
+
+def shift_months(start, months):
+    """Return the first of the month 'months' months after the month of the
+    datetime 'start' (which should be the first of a month).
+    """
+    if months == 0:
+        return start
+    return date_to_datetime((Month(start) + months).first)
+
+
+def expand_column_dict(quote_dict):
+    """Return a list of dictionaries of column values for each start month
+    of a dictionary from MatrixQuoteRecord.raw_column_dict (a list containing
+    only a copy of 'quote_dict' if it has only one start month).
+    """
+    start_from_name = MatrixQuote.start_from.property.columns[0].name
+    start_until_name = MatrixQuote.start_until.property.columns[0].name
+    quote_dict = dict(quote_dict)
+    month_count = quote_dict.pop(MatrixQuoteRecord.START_MONTH_COUNT_KEY, 1)
+    result = []
+    for i in xrange(month_count):
+        d = dict(quote_dict)
+        d[start_from_name] = shift_months(quote_dict[start_from_name], i)
+        d[start_until_name] = shift_months(quote_dict[start_until_name], i)
+        result.append(d)
+    return result
+
+
+class MatrixQuoteRecord(object):
+    """Compact, non-ORM representation of a matrix quote. QuoteParsers yield
+    these instead of MatrixQuotes because they are much cheaper to create:
+    there is no SQLAlchemy instance state, and no per-quote validator or
+    timestamp (date_received is filled in once per file by QuoteParser).
+
+    A MatrixQuoteRecord can be converted into database insert parameters with
+    raw_column_dict, or into a real MatrixQuote with to_matrix_quote when an
+    ORM object is actually needed.
+
+    One record can also stand for several quotes that are the same except
+    for their start periods, which begin on consecutive months: if
+    'start_month_count' is N, start_from and start_until (which must be the
+    first of a month) are the start period of the first of them, and each of
+    the others starts one month later than the one before. The quotes are
+    only expanded when they are inserted into the database (see
+    QuoteDAO.insert_quotes), or by calling 'expand'.
+    """
+    __slots__ = [
+        'rate_class_alias', 'rate_class_alias_id', 'start_from',
+        'start_until', 'term_months', 'date_received', 'valid_from',
+        'valid_until', 'purchase_of_receivables', 'price', 'dual_billing',
+        'percent_swing', 'service_type', 'min_volume', 'limit_volume',
+        # not stored in the database
+        'file_reference', 'supplier_id', 'start_month_count',
+    ]
+
+    # key in the dictionary returned by raw_column_dict for the number of
+    # start months, when there is more than one
+    START_MONTH_COUNT_KEY = 'start_month_count'
+
+    # (attribute name, column name) pairs for Rate_Matrix columns whose
+    # values come from the record. created lazily because SQLAlchemy mappers
+    # may not be configured yet when this module is imported.
+    _columns = None
+
+    @classmethod
+    def _get_columns(cls):
+        if cls._columns is None:
+            mapper = class_mapper(MatrixQuote)
+            cls._columns = [
+                (attr_name, column_property.columns[0].name)
+                for attr_name, column_property in mapper.column_attrs.items()
+                if column_property.columns[0] not in mapper.primary_key and
+                attr_name not in ('created_by', 'discriminator')]
+        return cls._columns
+
+    def __init__(self, start_from, start_until, term_months, valid_from,
+                 valid_until, price, rate_class_alias, service_type,
+                 min_volume=None, limit_volume=None,
+                 purchase_of_receivables=False, dual_billing=True,
+                 percent_swing=None, rate_class_alias_id=None,
+                 date_received=None, file_reference=None,
+                 start_month_count=1):
+        # term_months is checked here for the same reason as in Quote
+        assert service_type is not None
+        assert isinstance(term_months, int)
+        assert start_month_count >= 1
+        self.start_from = start_from
+        self.start_until = start_until
+        self.term_months = term_months
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        self.price = price
+        self.rate_class_alias = rate_class_alias
+        self.rate_class_alias_id = rate_class_alias_id
+        self.service_type = service_type
+        self.min_volume = min_volume
+        self.limit_volume = limit_volume
+        self.purchase_of_receivables = purchase_of_receivables
+        self.dual_billing = dual_billing
+        self.percent_swing = percent_swing
+        self.date_received = date_received
+        self.file_reference = file_reference
+        self.supplier_id = None
+        self.start_month_count = start_month_count
+
+    @property
+    def last_start_from(self):
+        """start_from of the last of the quotes this record stands for.
+        """
+        return shift_months(self.start_from, self.start_month_count - 1)
+
+    def expand(self):
+        """Return a list of MatrixQuoteRecords with one start month each,
+        for all the quotes this record stands for.
+        """
+        if self.start_month_count == 1:
+            return [self]
+        result = []
+        for i in xrange(self.start_month_count):
+            record = self.__class__.__new__(self.__class__)
+            record.__setstate__(self.__getstate__())
+            record.start_from = shift_months(self.start_from, i)
+            record.start_until = shift_months(self.start_until, i)
+            record.start_month_count = 1
+            result.append(record)
+        return result
+
+    def validate(self):
+        """Sanity check to catch any obviously-wrong values. Raise
+        ValidationError if there are any.
+        """
+        MatrixQuoteValidator.get_instance(self.service_type).validate(self)
+
+    def raw_column_dict(self):
+        """
+        :return: dictionary whose keys are column names in the Rate_Matrix
+        table and whose values are the corresponding values of this quote,
+        suitable for use as parameters of an insert statement (the same as
+        MatrixQuote.raw_column_dict). If the record has more than one start
+        month, the dictionary also contains START_MONTH_COUNT_KEY.
+        """
+        result = {column_name: getattr(self, attr_name) for
+                  attr_name, column_name in self._get_columns()}
+        result[MatrixQuote.created_by.property.columns[0].name] = 1
+        result[MatrixQuote.discriminator.property.columns[0].name] = \
+            MatrixQuote.__mapper_args__['polymorphic_identity']
+        if self.start_month_count > 1:
+            result[self.START_MONTH_COUNT_KEY] = self.start_month_count
+        return result
+
+    # records are pickled when QuoteParser sends them between processes.
+    # classes with __slots__ have no __dict__, so the state is a tuple in the
+    # same order as __slots__.
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def to_matrix_quote(self):
+        """Return a new MatrixQuote with the same values as this record
+        (only the first start month if there is more than one).
+        """
+        return MatrixQuote(
+            file_reference=self.file_reference,
+            service_type=self.service_type,
+            **{attr_name: getattr(self, attr_name) for attr_name, _ in
+               self._get_columns()})
+
+    def __str__(self):
+        return str(self.to_matrix_quote())
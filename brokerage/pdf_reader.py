@@ -1,11 +1,12 @@
 """Code related to getting quotes out of PDF files.
 """
-import re
+from cStringIO import StringIO
 
 from pdfminer.layout import LTTextBox
 
 from brokerage.exceptions import ValidationError
-from brokerage.reader import Reader
+from brokerage.reader import Reader, ReaderTrace, NOT_FOUND, _compile_regex
+from util.file_utils import AttachmentFile
 from util.pdf import PDFUtil
 
 
@@ -32,22 +33,92 @@ class PDFReader(Reader):
         self._offset_x = 0
         self._offset_y = 0
 
+        # when the file was loaded with a pruning trace, the file, for
+        # loading pages that were skipped
+        self._full_file = None
+
     def load_file(self, quote_file, file_name=None):
         """Read from 'quote_file'.
         :param quote_file: file to read from.
         """
         self._file_name = file_name
-        self._pages = PDFUtil().get_pdfminer_layout(quote_file)
+        self._full_file = None
+        if self._pruning_trace is None:
+            self._pages = PDFUtil().get_pdfminer_layout(quote_file)
+            return
+        # only pages that appear in the trace are analyzed (coordinates
+        # within a page are not used for pruning because searches for text
+        # can find elements anywhere on the page)
+        quote_file.seek(0)
+        # an AttachmentFile stays open while the file is being read, so it
+        # is kept instead of a copy of its content
+        if isinstance(quote_file, AttachmentFile):
+            self._full_file = quote_file
+        else:
+            self._full_file = StringIO(quote_file.read())
+        self._pages = PDFUtil().get_pdfminer_layout(
+            self._full_file,
+            page_numbers=set(self._pruning_trace.get_page_specifiers()))
+
+    def close(self):
+        self._pages = None
+        self._full_file = None
 
     def is_loaded(self):
         return self._pages != None
 
-    def _get_page(self, page_number):
+    def load_file_partially(self, quote_file, page_specifiers):
+        # same as using a pruning trace that contains only these pages
+        trace = ReaderTrace()
+        for page_number in page_specifiers:
+            trace.record(page_number, 0, 0)
+        pruning_trace = self._pruning_trace
+        self.set_pruning_trace(trace)
         try:
-            return self._pages[page_number - 1]
+            self.load_file(quote_file)
+        finally:
+            self.set_pruning_trace(pruning_trace)
+        return True
+
+    def contains_match(self, page_number, regex):
+        """Return True if any text element on the given page matches the
+        regular expression (ignoring surrounding whitespace), wherever it
+        is, False otherwise.
+        :param page_number: PDF page number starting with 1.
+        :param regex: regular expression string
+        """
+        page = self._try_get_page(page_number, 0, 0)
+        if page is None:
+            return False
+        return self._get_matching_elements(page, 0, 0, regex) != []
+
+    def _try_get_page(self, page_number, y, x):
+        """Return the layout of the given page, or None if there is no such
+        page. If the page was skipped when the file was loaded, the whole file
+        is loaded again.
+        :param y: vertical coordinate being read (for the trace)
+        :param x: horizontal coordinate being read (for the trace)
+        """
+        if self.trace is not None:
+            self.trace.record(page_number, y, x)
+        try:
+            page = self._pages[page_number - 1]
         except IndexError:
+            return None
+        if page is None:
+            self.call_counts['full_load'] += 1
+            self._full_file.seek(0)
+            self._pages = PDFUtil().get_pdfminer_layout(self._full_file)
+            self._full_file = None
+            page = self._pages[page_number - 1]
+        return page
+
+    def _get_page(self, page_number, y, x):
+        page = self._try_get_page(page_number, y, x)
+        if page is None:
             raise ValidationError('No page %s: last page number is %s' % (
                 page_number, len(self._pages)))
+        return page
 
     def set_offset_by_element_regex(self, regex, element_y, element_x):
         """
@@ -69,6 +140,26 @@ class PDFReader(Reader):
         self._offset_x = x0 - element_x
         self._offset_y = y0 - element_y
 
+    def _find_closest_box(self, page_number, y, x):
+        """Return the text box whose upper left corner is closest to the
+        given coordinates (with the offset added), or None if there is no
+        such page, no text box on it, or none within the tolerance.
+        """
+        self.call_counts['nearest_box'] += 1
+        y += self._offset_y
+        x += self._offset_x
+        page = self._try_get_page(page_number, y, x)
+        if page is None:
+            return None
+        text_boxes = [
+            element for element in page if isinstance(element, LTTextBox)]
+        if text_boxes == []:
+            return None
+        closest_box = min(text_boxes, key=lambda box: self.distance(box, x, y))
+        if self.distance(closest_box, x, y) > self._tolerance:
+            return None
+        return closest_box
+
     def get_with_coordinates(self, page_number, y, x, the_type):
         """
         Extract a value from the text box in the PDF file whose upper left
@@ -83,27 +174,30 @@ class PDFReader(Reader):
         :return: text box content (string with whitespace stripped), x0, y0,
         x1, y1
         """
-        y += self._offset_y
-        x += self._offset_x
-
-        # get all text boxes on the page (there must be at least one)
-        page = self._get_page(page_number)
-        text_boxes = list(
-            element for element in page if isinstance(element, LTTextBox))
-        if text_boxes == []:
-            raise ValidationError('No text elements on page %s' % page_number)
-
-        # find closest box to the given coordinates, within tolerance
-        closest_box = min(text_boxes, key=lambda box: self.distance(box, x, y))
-        text = closest_box.get_text().strip()
-        if self.distance(closest_box, x, y) > self._tolerance:
+        self.call_counts['get'] += 1
+        closest_box = self._find_closest_box(page_number, y, x)
+        if closest_box is None:
+            if page_number > len(self._pages):
+                raise ValidationError(
+                    'No page %s: last page number is %s' % (
+                        page_number, len(self._pages)))
             raise ValidationError(
-                'No text elements within %s of (%s,%s) in %s page %s: '
-                'closest is "%s" at (%s,%s)' % (
-                    self._tolerance, x, y, self._file_name, page_number, text,
-                    closest_box.x0, closest_box.y0))
-        return text, closest_box.x0, closest_box.y0, closest_box.x1, \
-               closest_box.y1
+                'No text elements within %s of (%s,%s) in %s page %s' % (
+                    self._tolerance, x + self._offset_x, y + self._offset_y,
+                    self._file_name, page_number))
+        return closest_box.get_text().strip(), closest_box.x0, \
+               closest_box.y0, closest_box.x1, closest_box.y1
+
+    def try_get(self, page_number, y, x, the_type):
+        """Same as get, but return NOT_FOUND instead of raising
+        ValidationError if there is no text box within tolerance of the
+        given coordinates.
+        """
+        self.call_counts['get'] += 1
+        closest_box = self._find_closest_box(page_number, y, x)
+        if closest_box is None:
+            return NOT_FOUND
+        return closest_box.get_text().strip()
 
     def get(self, page_number, y, x, the_type):
         """
@@ -146,6 +240,7 @@ class PDFReader(Reader):
         and actual coordinates of the matching element.
         :return: resulting value or list of values
         """
+        self.call_counts['get_matches'] += 1
         # to tolerate variations in the position of the element, find the
         # closest element within tolerance that matches the regex
         elements = self._find_matching_elements(page_number, y, x, regex)
@@ -161,6 +256,38 @@ class PDFReader(Reader):
         text = closest_element.get_text().strip()
         return self._validate_and_convert_text(regex, text, types)
 
+    def try_match(self, page_number, y, x, regex, types, tolerance=None):
+        """Same as get_matches, but return NOT_FOUND instead of raising
+        ValidationError if there is no matching element (within
+        'tolerance') or its text can't be converted.
+        """
+        self.call_counts['get_matches'] += 1
+        page = self._try_get_page(page_number, y, x)
+        if page is None:
+            return NOT_FOUND
+        elements = self._get_matching_elements(page, y, x, regex)
+        if elements == []:
+            return NOT_FOUND
+        closest_element = elements[0]
+        if tolerance is not None and self.distance(
+                closest_element, x, y) > tolerance:
+            return NOT_FOUND
+        text = closest_element.get_text().strip()
+        return self._try_convert_text(regex, text, types)
+
+    def _get_matching_elements(self, page, y, x, regex):
+        """Return list of text elements in 'page' matching the given regular
+        expression (ignoring surrounding whitespace) in increasing order of
+        distance from the given coordinates. The list may be empty.
+        """
+        self.call_counts['nearest_box'] += 1
+        pattern = _compile_regex(regex)
+        matching_elements = [
+            e for e in page if isinstance(e, LTTextBox) and
+            pattern.match(e.get_text().strip())]
+        matching_elements.sort(key=lambda e: self.distance(e, x, y))
+        return matching_elements
+
     def _find_matching_elements(self, page_number, y, x, regex):
         """Return list of text elements matching the given regular expression
         (ignoring surrounding whitespace) in increasing order of distance
@@ -171,14 +298,11 @@ class PDFReader(Reader):
         :param x: x coordinate (float)
         :param regex: regular expression string
         """
-        page = self._get_page(page_number)
-        matching_elements = [
-            e for e in page if isinstance(e, LTTextBox) and
-            re.match(regex, e.get_text().strip())]
+        page = self._get_page(page_number, y, x)
+        matching_elements = self._get_matching_elements(page, y, x, regex)
         if matching_elements == []:
             raise ValidationError(
                 'No text elements on page %s match "%s"' % (page_number, regex))
-        matching_elements.sort(key=lambda e: self.distance(e, x, y))
         return matching_elements
 
     def find_element_coordinates(self, page_number, y, x, regex):
@@ -1,17 +1,33 @@
-import email
 from email.header import decode_header
+from errno import ESRCH
 import logging
-import re
+import os
+import sys
 import traceback
 from cStringIO import StringIO
+from datetime import datetime
 from itertools import islice
+from multiprocessing import Array, Pool, Queue as ProcessQueue
+from Queue import Empty, Queue
+from threading import Event, Lock, Thread
 
 import statsd
+from sqlalchemy import bindparam, cast, func, literal_column, select, \
+    union_all
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
+from sqlalchemy.types import Integer, Interval
 
+from brokerage.attachment_index import AttachmentIndex, get_content_hash
 from brokerage.exceptions import MatrixError, ValidationError
-from brokerage.model import AltitudeSession, Session, Supplier, Company
-from util.email_util import get_attachments, get_body
+from brokerage.format_matcher import format_matcher_cache
+from brokerage.quote_file_uploader import QuoteFileUploader
+from brokerage.supplier_cache import supplier_cache
+from brokerage.quote_snapshot import IncrementalInserter, QuoteSnapshot
+from brokerage.model import AltitudeSession, Session, Supplier, Company, \
+    MatrixQuote, MatrixQuoteRecord, expand_column_dict
+from brokerage.quote_parser import _get_file_size
+from brokerage.validation import MatrixQuoteValidator
+from util.email_util import read_email
 
 LOG_NAME = 'read_quotes'
 
@@ -20,6 +36,8 @@ LOG_NAME = 'read_quotes'
 # when no StatsD server is running (e.g. while testing) nothing happens
 QUOTE_METRIC_FORMAT = 'quote.matrix.%(suppliername)s'
 EMAIL_METRIC_NAME = 'quote.email'
+# attachments skipped because they were the same as ones already processed
+DUPLICATE_METRIC_NAME = 'quote.email.duplicate_attachment'
 
 
 class QuoteProcessingError(MatrixError):
@@ -51,6 +69,13 @@ class NoQuotesError(QuoteProcessingError):
     """No quotes were read."""
 
 
+class WorkerError(QuoteProcessingError):
+    """Reading a file in a worker process failed, or the process stopped
+    without finishing it. When the file's reader raised an exception, the
+    formatted traceback is the 'worker_traceback' attribute.
+    """
+
+
 class MultipleErrors(QuoteProcessingError):
     """Used to report a series of one or more error messages from processing
     multiple files.
@@ -71,10 +96,244 @@ class MultipleErrors(QuoteProcessingError):
             '\n'.join(e.message for e in self.exceptions))
 
 
+# QuoteEmailProcessor, list of (MatrixFormat, supplier id, file name, file)
+# for the files being read by worker processes, a queue for sending back
+# the quotes from each file, and an array where the id of the process
+# reading each file is stored, which the workers inherit when the pool is
+# created (see QuoteEmailProcessor._read_files_in_pool)
+_pool_processor = None
+_pool_files = None
+_pool_queues = None
+_pool_pids = None
+_pool_lock = Lock()
+
+def _read_file_in_worker(index):
+    """Runs in a worker process created by
+    QuoteEmailProcessor._read_files_in_pool. Each batch of quotes from the
+    file at 'index' in _pool_files is put in the queue at the same index in
+    _pool_queues as soon as it is generated, followed by a FileResult, or by
+    a WorkerError with the message and traceback of the exception that was
+    raised when reading the file. (The exception itself is not sent, because
+    some exceptions, like CalledProcessError, can't be unpickled.)
+    """
+    _pool_pids[index] = os.getpid()
+    queue = _pool_queues[index]
+    try:
+        result = _pool_processor._read_file(queue.put, *_pool_files[index])
+    except Exception as e:
+        result = WorkerError(
+            traceback.format_exception_only(type(e), e)[-1].strip())
+        result.worker_traceback = traceback.format_exc()
+    queue.put(result)
+
+
+def _is_process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        if e.errno == ESRCH:
+            return False
+        raise
+    return True
+
+
+class WorkerQueue(object):
+    """Receives what _read_file_in_worker sends back for one file, while
+    checking that the worker process reading it has not stopped: a Pool
+    replaces a worker that was killed (for example for using too much
+    memory), but the file it was reading is never finished.
+    """
+    # seconds between checks of the worker process while waiting
+    POLL_SECONDS = 1
+
+    def __init__(self, queue, async_result, pids, index):
+        """
+        :param queue: multiprocessing.Queue that the worker puts items in
+        :param async_result: AsyncResult of _read_file_in_worker
+        :param pids: array of process ids (see _pool_pids)
+        :param index: index of the file in 'pids'
+        """
+        self._queue = queue
+        self._async_result = async_result
+        self._pids = pids
+        self._index = index
+
+    def get(self):
+        """Return the next batch of quotes, FileResult or WorkerError,
+        waiting for it if necessary. Raise WorkerError if the worker
+        process stopped without sending it.
+        """
+        finished_polls = 0
+        while True:
+            try:
+                return self._queue.get(timeout=self.POLL_SECONDS)
+            except Empty:
+                pass
+            if self._async_result.ready():
+                # the last items can arrive a little after the result
+                finished_polls += 1
+                if finished_polls > 1:
+                    raise WorkerError(
+                        'Worker process finished without sending the '
+                        'result of reading the file')
+            pid = self._pids[self._index]
+            if pid != 0 and not _is_process_running(pid):
+                raise WorkerError('Worker process %s stopped while reading '
+                                  'the file' % pid)
+
+
+# put in the queue of _insert_in_thread after the last batch
+_END_OF_BATCHES = object()
+
+
+def _insert_in_thread(insert, batches, queue_size):
+    """Call 'insert' with each batch from 'batches' in a new thread, while
+    the next batches are generated in this one, so the database and the
+    quote parser are not waiting for each other. At most 'queue_size'
+    batches wait between them.
+
+    If generating or inserting a batch raises an exception, no more batches
+    are inserted, and the exception is raised here after the thread has
+    stopped (so the caller can roll back the transaction).
+    :param insert: function that inserts one batch
+    :param batches: iterator of batches
+    """
+    queue = Queue(maxsize=queue_size)
+    stop = Event()
+    errors = []
+
+    def run():
+        while True:
+            batch = queue.get()
+            if batch is _END_OF_BATCHES:
+                return
+            # after an error, the rest of the batches are discarded so
+            # 'put' never blocks
+            if stop.is_set():
+                continue
+            try:
+                insert(batch)
+            except Exception:
+                errors.append(sys.exc_info())
+                stop.set()
+
+    thread = Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    try:
+        for batch in batches:
+            if stop.is_set():
+                break
+            queue.put(batch)
+    except Exception:
+        stop.set()
+        raise
+    finally:
+        queue.put(_END_OF_BATCHES)
+        thread.join()
+    if errors != []:
+        raise errors[0][0], errors[0][1], errors[0][2]
+
+
+class FileResult(object):
+    """What is needed from a QuoteParser after it has read a whole file in
+    a worker process: its name, ParserStats and number of quotes. (The
+    quotes themselves are sent back separately while they are read.)
+    """
+    def __init__(self, name, stats, count):
+        self.NAME = name
+        self.stats = stats
+        self._count = count
+
+        # set in the main process, which has the MatrixFormat
+        self.matrix_format = None
+
+    def get_count(self):
+        return self._count
+
+
+def _add_months(dialect_name, value, months):
+    """Return an SQL expression for the datetime 'value' plus 'months'
+    months, in the given SQLAlchemy dialect ('postgresql' or 'mssql').
+    """
+    if dialect_name == 'mssql':
+        return func.dateadd(literal_column('month'), months, value)
+    return value + months * literal_column("interval '1 month'", Interval)
+
+
+def _format_copy_value(value):
+    """Return a value as a string in the text format of PostgreSQL's COPY
+    command.
+    """
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    # backslashes and the delimiter characters must be escaped
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+def _get_expanding_insert(dialect_name, column_names, month_count):
+    """Return an "INSERT ... SELECT" statement that inserts 'month_count'
+    rows into the Rate_Matrix table for each set of parameters it is
+    executed with: one for each start month, using a series of month numbers
+    instead of sending every row to the database.
+    :param column_names: names of the columns whose values are given as
+    parameters (the keys of MatrixQuoteRecord.raw_column_dict)
+    """
+    table = MatrixQuote.__table__
+    months = union_all(*[
+        select([literal_column(str(n), Integer).label('n')])
+        for n in xrange(month_count)]).alias('months')
+    shifted_column_names = {
+        MatrixQuote.start_from.property.columns[0].name,
+        MatrixQuote.start_until.property.columns[0].name}
+    columns = [c for c in table.columns if c.name in column_names]
+    values = []
+    for column in columns:
+        # parameters are cast because in a SELECT their types can't be
+        # inferred from the columns they are inserted into
+        value = cast(bindparam(column.name), column.type)
+        if column.name in shifted_column_names:
+            value = _add_months(dialect_name, value, months.c.n)
+        values.append(value)
+    return table.insert().from_select(
+        [c.name for c in columns], select(values).select_from(months))
+
+
 class QuoteDAO(object):
     """Handles database access for QuoteEmailProcessor. Not sure if it's a
     good design to wrap the SQLAlchemy session object like this.
     """
+    # databases where quotes with several start months are expanded by an
+    # "INSERT ... SELECT" statement rather than in Python
+    EXPANDING_DIALECTS = ('postgresql', 'mssql')
+
+    # maximum number of ids in one "IN" clause (SQL Server allows at most
+    # 2100 parameters per statement)
+    ID_CHUNK_SIZE = 1000
+
+    # maximum number of parameters in one statement for each database, which
+    # determines how many rows are inserted by each multi-row INSERT (see
+    # insert_quotes). one less than SQL Server's limit of 2100 is used
+    # because some drivers add a parameter of their own.
+    PARAMETER_LIMITS = {'mssql': 2099, 'sqlite': 999}
+    DEFAULT_PARAMETER_LIMIT = 32767
+
+    # maximum number of rows in one "INSERT ... VALUES" (SQL Server's limit)
+    MAX_VALUES_ROWS = 1000
+
+    # DBAPI drivers whose databases can load rows with the COPY command,
+    # which is much faster than any INSERT
+    COPY_DRIVERS = ('psycopg2',)
+
     def __init__(self):
         self.altitude_session = AltitudeSession()
 
@@ -87,12 +346,20 @@ class QuoteDAO(object):
         corresponding to the email in the main database, and another with the
         same name in the Altitude database.
 
+        The result for each address is cached (see supplier_cache), so
+        usually the databases are not queried at all.
+
         :param to_addr: email recipient address
 
         :return: core.model.Supplier representing the supplier table int the
-        main database, brokerage.model.Company representing the
-        same supplier in the Altitude database (may be None).
+        main database (a copy that is not in any session), and the primary
+        key of the brokerage.model.Company representing the same supplier in
+        the Altitude database (may be None).
         """
+        cached = supplier_cache.get(to_addr)
+        if cached is not None:
+            return cached
+
         # the matching behavior is implemented by counting the number of
         # matching suppliers for each criterion, and then only filtering by that
         # criterion if the count > 0. i couldn't think of a way that avoids
@@ -110,7 +377,9 @@ class QuoteDAO(object):
         # for the same supplier must always be the same
         q = self.altitude_session.query(Company).filter_by(name=supplier.name)
         altitude_supplier = q.first()
-        return supplier, altitude_supplier
+        company_id = None if altitude_supplier is None else \
+            altitude_supplier.company_id
+        return supplier_cache.add(to_addr, supplier, company_id), company_id
 
     def get_matrix_format_for_file(self, supplier, file_name, match_email_body):
         """
@@ -122,6 +391,11 @@ class QuoteDAO(object):
         matrix attachment name is None. This should be unique.
         UnknownFormatError is raised if there is not exactly one match.
 
+        The regular expressions for each supplier are compiled once and
+        cached along with copies of the MatrixFormats, so after the first
+        file, the database is not used until the cache expires (see
+        format_matcher).
+
         :param supplier: core.model.Supplier
         :param file_name: name of the matrix file
         :param match_email_body: boolean value that indicates if quotes are
@@ -130,11 +404,8 @@ class QuoteDAO(object):
         """
         #matrix_attachment_name matches either an attachment name an email
         # subject but not both, depending on match_email_body
-        matching_formats = [f for f in supplier.matrix_formats if
-            (f.matrix_attachment_name is None or
-                            re.match(f.matrix_attachment_name, file_name,
-                                     re.IGNORECASE | re.DOTALL)) and
-                            f.match_email_body == match_email_body]
+        matching_formats = format_matcher_cache.get_matcher(supplier).match(
+            file_name, match_email_body)
         if len(matching_formats) == 0:
             raise UnknownFormatError('No formats matched file name "%s"' %
                                      file_name)
@@ -143,13 +414,154 @@ class QuoteDAO(object):
                                      '"%s"' % file_name)
         return matching_formats[0]
 
+    def get_matrix_formats(self, supplier, match_email_body):
+        """Return all MatrixFormats of the given supplier (regardless of
+        file name), for identifying a file by its content.
+        :param supplier: core.model.Supplier
+        :param match_email_body: only formats with the same value of
+        'match_email_body' are included
+        :return: list of brokerage.model.MatrixFormat
+        """
+        return format_matcher_cache.get_matcher(supplier).get_formats(
+            match_email_body)
+
     def insert_quotes(self, quote_list):
         """
-        Insert Quotes into the Altitude database, using the SQLAlchemy "bulk
-        insert" feature for performance.
-        :param quote_list: iterable of Quote objects
+        Insert quotes into the Altitude database, bypassing the ORM for
+        performance. PostgreSQL gets them with a single COPY command (see
+        COPY_DRIVERS); other databases with as few multi-row
+        "INSERT ... VALUES" statements as their limit on the number of
+        parameters allows (see PARAMETER_LIMITS).
+
+        Quotes with several start months (whose dictionaries contain
+        MatrixQuoteRecord.START_MONTH_COUNT_KEY) are expanded into one row
+        per start month by the database itself if it supports that (see
+        EXPANDING_DIALECTS), with one more executemany statement for each
+        distinct number of months; otherwise they are expanded here.
+
+        :param quote_list: list of dictionaries of column values, as returned
+        by MatrixQuoteRecord.raw_column_dict or Quote.raw_column_dict
+        """
+        if quote_list == []:
+            return
+        key = MatrixQuoteRecord.START_MONTH_COUNT_KEY
+        single_month_quotes, multi_month_quotes = [], {}
+        for quote_dict in quote_list:
+            month_count = quote_dict.get(key, 1)
+            if month_count == 1:
+                single_month_quotes.append(quote_dict)
+            else:
+                multi_month_quotes.setdefault(month_count, []).append(
+                    quote_dict)
+
+        dialect_name = self.altitude_session.get_bind().dialect.name
+        for month_count, quote_dicts in sorted(
+                multi_month_quotes.iteritems()):
+            if dialect_name not in self.EXPANDING_DIALECTS:
+                for quote_dict in quote_dicts:
+                    single_month_quotes.extend(
+                        expand_column_dict(quote_dict))
+                continue
+            column_names = set(quote_dicts[0]) - {key}
+            self.altitude_session.execute(
+                _get_expanding_insert(dialect_name, column_names,
+                                      month_count), quote_dicts)
+        if single_month_quotes != []:
+            self._insert_rows(single_month_quotes)
+
+    def _insert_rows(self, quote_dicts):
+        """Insert rows into the Rate_Matrix table.
+        :param quote_dicts: list of dictionaries of column values, which
+        must all have the same keys
+        """
+        dialect = self.altitude_session.get_bind().dialect
+        if dialect.driver in self.COPY_DRIVERS:
+            self._copy_rows(quote_dicts)
+            return
+        table = MatrixQuote.__table__
+        if not dialect.supports_multivalues_insert:
+            self.altitude_session.execute(table.insert(), quote_dicts)
+            return
+        limit = self.PARAMETER_LIMITS.get(dialect.name,
+                                          self.DEFAULT_PARAMETER_LIMIT)
+        chunk_size = max(1, min(self.MAX_VALUES_ROWS,
+                                limit // len(quote_dicts[0])))
+        for i in xrange(0, len(quote_dicts), chunk_size):
+            self.altitude_session.execute(
+                table.insert().values(quote_dicts[i:i + chunk_size]))
+
+    def _copy_rows(self, quote_dicts):
+        """Insert rows into the Rate_Matrix table with PostgreSQL's COPY
+        command, in the current transaction.
+        :param quote_dicts: list of dictionaries of column values, which
+        must all have the same keys
+        """
+        column_names = sorted(quote_dicts[0])
+        data = StringIO()
+        for quote_dict in quote_dicts:
+            data.write('\t'.join(_format_copy_value(quote_dict[name])
+                                 for name in column_names))
+            data.write('\n')
+        data.seek(0)
+        # the DBAPI connection of the session's transaction
+        cursor = self.altitude_session.connection().connection.cursor()
+        try:
+            cursor.copy_expert('COPY "%s" (%s) FROM STDIN' % (
+                MatrixQuote.__table__.name,
+                ', '.join('"%s"' % name for name in column_names)), data)
+        finally:
+            cursor.close()
+
+    def _get_id_chunks(self, quote_ids):
+        for i in xrange(0, len(quote_ids), self.ID_CHUNK_SIZE):
+            yield quote_ids[i:i + self.ID_CHUNK_SIZE]
+
+    def get_max_quote_id(self):
+        """
+        :return: greatest primary key in the Rate_Matrix table, or 0 if it is
+        empty. Quotes inserted after this is called will have greater ids.
+        """
+        max_id = self.altitude_session.execute(
+            select([func.max(MatrixQuote.rate_id)])
+        ).scalar()
+        return 0 if max_id is None else max_id
+
+    def count_quotes(self, quote_ids):
+        """
+        :param quote_ids: list of Rate_Matrix primary keys
+        :return: how many of them belong to rows that exist
+        """
+        return sum(self.altitude_session.execute(
+            select([func.count()]).where(MatrixQuote.rate_id.in_(chunk))
+        ).scalar() for chunk in self._get_id_chunks(quote_ids))
+
+    def extend_quotes(self, quote_ids, valid_until):
+        """Set valid_until of existing quotes, with one UPDATE statement (per
+        ID_CHUNK_SIZE quotes).
+        :param quote_ids: list of Rate_Matrix primary keys
+        :param valid_until: new value of valid_until
         """
-        self.altitude_session.bulk_save_objects(quote_list)
+        valid_until_name = MatrixQuote.valid_until.property.columns[0].name
+        for chunk in self._get_id_chunks(quote_ids):
+            self.altitude_session.execute(
+                MatrixQuote.__table__.update().where(
+                    MatrixQuote.rate_id.in_(chunk)).values(
+                    {valid_until_name: valid_until}))
+
+    def get_quotes_after(self, quote_id, column_names):
+        """
+        :param quote_id: Rate_Matrix primary key
+        :param column_names: names of Rate_Matrix columns to get
+        :return: iterator of (id, dictionary of column values) for all quotes
+        whose id is greater than 'quote_id'
+        """
+        table = MatrixQuote.__table__
+        columns = [c for c in table.columns if c.name in column_names]
+        result = self.altitude_session.execute(
+            select([MatrixQuote.rate_id] + columns).where(
+                MatrixQuote.rate_id > quote_id))
+        for row in result:
+            yield row[0], {c.name: value for c, value in zip(columns, row[1:])}
 
     def begin(self):
         """Start transaction in Altitude database for one quote file.
@@ -182,35 +594,84 @@ class QuoteEmailProcessor(object):
     attachments, and extracts the quotes from the attachments.
     """
     # number of quotes to read and insert at once. larger is faster as long
-    # as it doesn't use up too much memory. (1000 is the maximum number of
-    # rows allowed per insert statement in pymssql.)
+    # as it doesn't use up too much memory. (QuoteDAO.insert_quotes splits
+    # each batch into statements small enough for the database.)
     BATCH_SIZE = 1000
 
+    # maximum number of batches that have been read from a file and are
+    # waiting to be inserted (see _insert_in_thread), so that at most about
+    # this many plus 2 batches are in memory at once. 0 to read and insert
+    # them one at a time in the same thread.
+    INSERT_QUEUE_SIZE = 2
+
+    # maximum number of batches of quotes from each file read in a worker
+    # process (see _read_files_in_pool) that wait to be sent to this one.
+    # the worker stops reading the file until some of them are inserted.
+    READ_QUEUE_SIZE = 2
+
     def __init__(self, classes_for_formats, quote_dao, s3_connection,
-                 s3_bucket_name):
+                 s3_bucket_name, parser_processes=1, trace_dir=None,
+                 snapshot_dir=None, max_file_memory=None,
+                 attachment_processes=1, upload_threads=1,
+                 attachment_index_dir=None, duplicate_window=None):
         """
-        :param classes_for_formats: dictionary mapping the primary key of
-        each MatrixFormat in the database to the QuoteParser subclass that
+        :param classes_for_formats: dictionary (or other mapping, like
+        quote_parsers.CLASSES_FOR_FORMATS) mapping the primary key of each
+        MatrixFormat in the database to the QuoteParser subclass that
         handles it.
         :param quote_dao: QuoteDAO object for handling database access.
         param s3_connection: boto.s3.S3Connection
         :param s3_bucket_name: name of S3 bucket where quote files will be
         stored (string).
+        :param parser_processes: maximum number of worker processes that
+        each QuoteParser can use (int).
+        :param trace_dir: directory where QuoteParsers save and load
+        ReaderTraces, or None to not use them.
+        :param snapshot_dir: directory where a QuoteSnapshot of the last
+        file of each supplier and format is saved, so only new or changed
+        quotes are inserted from the next one (see quote_snapshot). None to
+        insert all quotes from every file.
+        :param max_file_memory: maximum number of bytes of memory that can
+        be used to load one quote file, or None for no limit. files that
+        need more are rejected with FileTooLargeError.
+        :param attachment_processes: maximum number of worker processes for
+        reading the files of one email at the same time (int). each file is
+        read in a single process, so 'parser_processes' is not used then.
+        :param upload_threads: number of threads that upload files to S3
+        while they are being read (see QuoteFileUploader).
+        :param attachment_index_dir: directory where the outcome of every
+        file is remembered by its content (see AttachmentIndex), so exact
+        copies of a file from the same supplier are skipped. None to
+        process every file.
+        :param duplicate_window: timedelta: how long a file is remembered
+        in the AttachmentIndex.
         """
         self.logger = logging.getLogger(LOG_NAME)
         self.logger.setLevel(logging.DEBUG)
         self._classes_for_formats = classes_for_formats
         self._quote_dao = quote_dao
-        self._s3_connection = s3_connection
-        self._s3_bucket_name = s3_bucket_name
-
-    def _process_quote_file(self, supplier, altitude_supplier, file_name,
-                            file_content, match_email_body):
+        self._uploader = QuoteFileUploader(s3_connection, s3_bucket_name,
+                                           threads=upload_threads)
+        self._parser_processes = parser_processes
+        self._trace_dir = trace_dir
+        self._snapshot_dir = snapshot_dir
+        self._max_file_memory = max_file_memory
+        assert attachment_processes >= 1
+        self._attachment_processes = attachment_processes
+        self._attachment_index = None if attachment_index_dir is None else \
+            AttachmentIndex(attachment_index_dir, duplicate_window)
+
+        # (path, QuoteSnapshot) to be saved after the current file's
+        # transaction is committed
+        self._pending_snapshot = None
+
+    def _process_quote_file(self, supplier, company_id, file_name,
+                            quote_file, match_email_body):
         """Process quotes from a single quote file for the given supplier.
 
         :param supplier: core.model.Supplier instance
 
-        :param altitude_supplier: brokerage.model.Company instance
+        :param company_id: primary key of the brokerage.model.Company
         corresponding to the Company table in the Altitude SQL Server database,
         representing a supplier. Not to be confused with the "supplier" table
         (core.model.Supplier) or core.altitude.AltitudeSupplier which is a
@@ -218,9 +679,8 @@ class QuoteEmailProcessor(object):
 
         :param file_name: name of quote file (can be used to get the date)
 
-        :param file_content: content of a quote file as a string. (A file
-        object would be better, but the Python 'email' module processes a
-        whole file at a time so it all has to be in memory anyway.)
+        :param quote_file: seekable file object containing the quote file
+        (such as one returned by util.email_util.read_email)
 
         :param match_email_body: boolean argument that tells if the quotes
         are in email body
@@ -228,49 +688,371 @@ class QuoteEmailProcessor(object):
         :return the QuoteParser instance used to process the given file (
         which can be used to get the number of quotes).
         """
-        # find the MatrixFormat corresponding to this file
-        # (may raise UnknownFormatError)
-        matrix_format = self._quote_dao.get_matrix_format_for_file(
-            supplier, file_name, match_email_body)
-
-        # upload files after identifying the format, but before parsing,
-        # so even invalid files get uploaded
-        self._store_quote_file(file_name, file_content)
-
-        # copy string into a StringIO :(
-        quote_file = StringIO(file_content)
+        matrix_format = self._prepare_file(supplier, file_name, quote_file,
+                                           match_email_body)
 
         # pick a QuoteParser class for the given supplier, and load the file
         # into it, and validate the file
         quote_parser = self._classes_for_formats[
-            matrix_format.matrix_format_id]()
-        quote_parser.load_file(quote_file, file_name, matrix_format)
-        quote_parser.validate()
+            matrix_format.matrix_format_id](processes=self._parser_processes,
+                                            trace_dir=self._trace_dir,
+                                            max_memory=self._max_file_memory)
+        # the file and any temporary files are freed as soon as the quotes
+        # have been inserted (or an error happens), rather than when the
+        # QuoteParser is garbage-collected
+        try:
+            quote_file.seek(0)
+            quote_parser.load_file(quote_file, file_name, matrix_format)
+            quote_parser.validate()
+            self._insert_batches(supplier, matrix_format, file_name,
+                                 self._generate_batches(quote_parser,
+                                                        company_id))
+        finally:
+            quote_parser.close()
+        return quote_parser
+
+    def _prepare_file(self, supplier, file_name, quote_file,
+                      match_email_body):
+        """Do everything that comes before reading a quote file: identify
+        its format, upload it, and reject it if it does not match the
+        format's fingerprint.
+        :return: MatrixFormat of the file
+        """
+        # find the MatrixFormat corresponding to this file
+        # (may raise UnknownFormatError)
+        matrix_format, sniff_score = self._identify_matrix_format(
+            supplier, file_name, quote_file, match_email_body)
 
-        # read and insert quotes in groups of 'BATCH_SIZE'
+        # upload files after identifying the format, but before parsing,
+        # so even invalid files get uploaded
+        self._store_quote_file(file_name, quote_file)
+
+        # the file would fail validation anyway, so don't load it
+        if sniff_score is not None and sniff_score < 1:
+            raise ValidationError(
+                'File "%s" does not match the fingerprint of format "%s" '
+                '(%.0f%% of checks passed)' % (
+                    file_name, matrix_format.name, sniff_score * 100))
+        return matrix_format
+
+    def _generate_batches(self, quote_parser, supplier_id):
+        """Extract quotes from a validated QuoteParser and validate them in
+        groups of 'BATCH_SIZE'.
+        :param supplier_id: primary key of the supplier's Company in the
+        Altitude database, or None if it is unknown
+        :return: iterator of lists of dictionaries of column values (the last
+        one is always empty)
+        """
         generator = quote_parser.extract_quotes()
         while True:
             quote_list = []
             for quote in islice(generator, self.BATCH_SIZE):
-                if altitude_supplier is not None:
-                    quote.supplier_id = altitude_supplier.company_id
-                quote.validate()
+                if supplier_id is not None:
+                    quote.supplier_id = supplier_id
                 quote_list.append(quote)
-            self._quote_dao.insert_quotes(quote_list)
+            MatrixQuoteValidator.validate_batch(quote_list)
+            # quotes go straight into insert parameters; no ORM objects
+            # are created for them
+            yield [quote.raw_column_dict() for quote in quote_list]
             count = quote_parser.get_count()
             self.logger.debug('%s quotes so far' % count)
             if quote_list == []:
-                return quote_parser
+                break
+
+    def _insert_batches(self, supplier, matrix_format, file_name, batches):
+        """Insert all quotes from one file, in the current transaction. The
+        quotes are inserted in another thread while the next batches are
+        generated, unless INSERT_QUEUE_SIZE is 0.
+        :param batches: iterator of lists of dictionaries of column values,
+        as returned by _generate_batches
+        """
+        inserter = self._quote_dao
+        if self._snapshot_dir is not None:
+            snapshot_path = self._get_snapshot_path(supplier, matrix_format)
+            inserter = IncrementalInserter(
+                self._quote_dao, self._load_snapshot(snapshot_path))
+
+        if self.INSERT_QUEUE_SIZE > 0:
+            _insert_in_thread(inserter.insert_quotes, batches,
+                              self.INSERT_QUEUE_SIZE)
+        else:
+            for quote_dicts in batches:
+                inserter.insert_quotes(quote_dicts)
+
+        if self._snapshot_dir is not None:
+            self._pending_snapshot = snapshot_path, inserter.finish()
+            self.logger.info(
+                'Inserted %s new or changed quotes, extended %s unchanged '
+                'quotes from "%s"' % (inserter.inserted_count,
+                                      inserter.unchanged_count, file_name))
+
+    def _read_file(self, put_batch, matrix_format, supplier_id, file_name,
+                   quote_file):
+        """Read and validate all quotes from a file whose format has been
+        identified, without inserting them. This is the part of
+        _process_quote_file that runs in a worker process when several files
+        are read at once.
+        :param put_batch: function called with each batch of quotes (as
+        generated by _generate_batches)
+        :return: FileResult
+        """
+        # daemonic worker processes can't start their own pools
+        quote_parser = self._classes_for_formats[
+            matrix_format.matrix_format_id](processes=1,
+                                            trace_dir=self._trace_dir,
+                                            max_memory=self._max_file_memory)
+        try:
+            quote_file.seek(0)
+            quote_parser.load_file(quote_file, file_name, matrix_format)
+            quote_parser.validate()
+            for batch in self._generate_batches(quote_parser, supplier_id):
+                put_batch(batch)
+        finally:
+            quote_parser.close()
+        return FileResult(quote_parser.NAME, quote_parser.stats,
+                          quote_parser.get_count())
+
+    def _read_files_in_pool(self, supplier, company_id, files):
+        """Read all the given files at the same time in a pool of worker
+        processes, so an email with several attachments takes about as long
+        as its slowest one. Formats are identified and files are uploaded in
+        this process first, and the quotes are sent back to be inserted here
+        (see _insert_read_file), so database access stays in one process.
+        Files on disk share their position with the workers, so they must
+        not be used here while the pool is running.
+
+        :param files: list of (file name, file, match_email_body)
+        :return: iterator of (MatrixFormat, WorkerQueue) for each file, in
+        the same order, where the WorkerQueue receives the file's batches of
+        quotes and then its FileResult or a WorkerError (see
+        _read_file_in_worker). instead of a WorkerQueue, there is the
+        exc_info tuple of the exception raised by _prepare_file.
+        """
+        global _pool_processor, _pool_files, _pool_queues, _pool_pids
+        prepared = []
+        for file_name, quote_file, match_email_body in files:
+            try:
+                prepared.append((self._prepare_file(
+                    supplier, file_name, quote_file, match_email_body),
+                                 None))
+            except Exception:
+                prepared.append((None, sys.exc_info()))
+        pool_files = [(matrix_format, company_id, file_name,
+                       quote_file) for (matrix_format, exc_info),
+                      (file_name, quote_file, _) in zip(prepared, files)
+                      if exc_info is None]
+        if pool_files == []:
+            for matrix_format, exc_info in prepared:
+                yield matrix_format, exc_info
+            return
+
+        # the queues are bounded, so only a few batches from each file are
+        # in memory at once
+        queues = [ProcessQueue(maxsize=self.READ_QUEUE_SIZE)
+                  for _ in pool_files]
+        pids = Array('i', len(pool_files), lock=False)
+        with _pool_lock:
+            _pool_processor, _pool_files, _pool_queues, _pool_pids = \
+                self, pool_files, queues, pids
+            try:
+                pool = Pool(processes=min(self._attachment_processes,
+                                          len(pool_files)))
+            finally:
+                _pool_processor, _pool_files, _pool_queues, _pool_pids = \
+                    None, None, None, None
+        try:
+            # the files are started in order, so the one whose quotes are
+            # being inserted is always being read, while the workers reading
+            # later ones wait when their queues are full
+            worker_queues = [WorkerQueue(queue, pool.apply_async(
+                _read_file_in_worker, (index,)), pids, index)
+                             for index, queue in enumerate(queues)]
+            worker_queue_iter = iter(worker_queues)
+            for matrix_format, exc_info in prepared:
+                if exc_info is None:
+                    yield matrix_format, next(worker_queue_iter)
+                else:
+                    yield matrix_format, exc_info
+        finally:
+            pool.terminate()
+            pool.join()
+            for queue in queues:
+                queue.close()
+
+    def _insert_read_file(self, supplier, file_name, read_file):
+        """Insert the quotes from one of the files read by
+        _read_files_in_pool, or raise the exception that happened while
+        preparing or reading it.
+        :param read_file: one of the values generated by _read_files_in_pool
+        :return: FileResult
+        """
+        matrix_format, worker_queue = read_file
+        if isinstance(worker_queue, tuple):
+            raise worker_queue[0], worker_queue[1], worker_queue[2]
+        results = []
+
+        def generate():
+            while True:
+                try:
+                    item = worker_queue.get()
+                except WorkerError as e:
+                    item = e
+                if isinstance(item, list):
+                    yield item
+                    continue
+                results.append(item)
+                if isinstance(item, Exception):
+                    raise item
+                return
+
+        try:
+            self._insert_batches(supplier, matrix_format, file_name,
+                                 generate())
+        finally:
+            # if inserting failed, the rest of the file is discarded, so the
+            # worker reading it is free to read another one
+            try:
+                while results == []:
+                    item = worker_queue.get()
+                    if not isinstance(item, list):
+                        results.append(item)
+            except WorkerError:
+                # the worker stopped; the error from inserting is reported
+                pass
+        result = results[0]
+        result.matrix_format = matrix_format
+        return result
+
+    def _get_snapshot_path(self, supplier, matrix_format):
+        return os.path.join(self._snapshot_dir, '%s_%s.json' % (
+            supplier.id, matrix_format.matrix_format_id))
+
+    def _load_snapshot(self, path):
+        """
+        :return: the QuoteSnapshot saved at 'path', or an empty one if there
+        is none or some of its quotes no longer exist in the database
+        """
+        snapshot = QuoteSnapshot.load(path)
+        if snapshot is None:
+            return QuoteSnapshot()
+        if self._quote_dao.count_quotes(snapshot.get_ids()) != len(snapshot):
+            self.logger.warn('Quotes in snapshot "%s" are missing from the '
+                             'database; inserting all quotes' % path)
+            return QuoteSnapshot()
+        return snapshot
+
+    def _identify_matrix_format(self, supplier, file_name, quote_file,
+                                match_email_body):
+        """Choose the MatrixFormat for a file: the one whose name matches the
+        file name, unless the file's content (see QuoteParser.sniff) shows
+        that it does not have that format and does have another one of the
+        supplier's formats. If no format's name matches, or more than one
+        does, the content alone can determine the format.
+
+        Raise UnknownFormatError if the format could not be determined.
+
+        :return: the MatrixFormat and the result of QuoteParser.sniff for it
+        (None if the content could not be checked, less than 1 if the file
+        would fail validation).
+        """
+        scores = {}
+        def sniff(matrix_format):
+            format_id = matrix_format.matrix_format_id
+            if format_id not in scores:
+                parser_class = self._classes_for_formats.get(format_id)
+                # sniff leaves the file at the start again
+                quote_file.seek(0)
+                scores[format_id] = None if parser_class is None else \
+                    parser_class.sniff(quote_file)
+            return scores[format_id]
+
+        def find_by_content(excluded_format_id):
+            matches = [f for f in self._quote_dao.get_matrix_formats(
+                supplier, match_email_body) if
+                f.matrix_format_id != excluded_format_id and sniff(f) == 1]
+            if len(matches) == 1:
+                self.logger.info('Format of file "%s" identified by content: '
+                                 '%s' % (file_name, matches[0].name))
+                return matches[0]
+            return None
 
-    def _store_quote_file(self, file_name, file_content):
-        """Upload the file content to the S3 bucket as a key with the given
-        name.
+        try:
+            matrix_format = self._quote_dao.get_matrix_format_for_file(
+                supplier, file_name, match_email_body)
+        except UnknownFormatError:
+            matrix_format = find_by_content(None)
+            if matrix_format is None:
+                raise
+            return matrix_format, 1.
+
+        score = sniff(matrix_format)
+        if score is None or score == 1:
+            return matrix_format, score
+        other_format = find_by_content(matrix_format.matrix_format_id)
+        if other_format is not None:
+            return other_format, 1.
+        return matrix_format, score
+
+    def _report_stats(self, quote_parser, file_name):
+        """Log performance measurements from reading a file and submit them
+        to StatsD: times as timers and Reader calls as counters, all under
+        the metric name for the parser's quotes.
+        :param quote_parser: QuoteParser that read the file
+        :param file_name: name of the file (for the log message)
+        """
+        stats = quote_parser.stats
+        self.logger.info('Performance of %s for "%s": %s' % (
+            quote_parser.NAME, file_name, stats))
+        metric_name = QUOTE_METRIC_FORMAT % dict(
+            suppliername=quote_parser.NAME)
+        timer = statsd.Timer(metric_name)
+        for timer_name, seconds in stats.get_timers().iteritems():
+            timer.send(timer_name, seconds)
+        calls_counter = statsd.Counter('%s.reader_calls' % metric_name)
+        for call_name, count in stats.reader_calls.iteritems():
+            calls_counter.increment(call_name, count)
+
+    def _store_quote_file(self, file_name, quote_file):
+        """Start uploading the file to the S3 bucket as a key with the given
+        name. process_email waits for the upload to finish before returning.
         :param file_name: name of the file (string)
-        :param file_content: content of the file (string)
+        :param quote_file: seekable file object
+        """
+        self._uploader.upload(file_name, quote_file)
+
+    def _skip_duplicates(self, supplier, files):
+        """Remove files that are exact copies of files from the same
+        supplier that were processed successfully before (according to the
+        AttachmentIndex), or of other files in the same email. Each one is
+        logged and counted in StatsD.
+        :param files: list of (file name, file, match_email_body)
+        :return: list of the remaining files, list of their content hashes,
+        and list of AttachmentOutcomes of the files that were processed
+        before
         """
-        bucket = self._s3_connection.get_bucket(self._s3_bucket_name)
-        key = bucket.new_key(file_name)
-        key.set_contents_from_string(file_content)
+        new_files, content_hashes, outcomes = [], [], []
+        duplicate_counter = statsd.Counter(DUPLICATE_METRIC_NAME)
+        for file_name, quote_file, match_email_body in files:
+            content_hash = get_content_hash(quote_file)
+            if content_hash in content_hashes:
+                self.logger.info(
+                    'Skipped attachment from %s: "%s" is the same as another '
+                    'attachment of this email' % (supplier.name, file_name))
+                duplicate_counter += 1
+                continue
+            outcome = self._attachment_index.get(supplier, content_hash)
+            if outcome is not None:
+                self.logger.info(
+                    'Skipped attachment from %s: "%s" is the same as a file '
+                    'processed at %s (format %s, %s quotes)' % (
+                        supplier.name, file_name, outcome.time,
+                        outcome.matrix_format_id, outcome.quote_count))
+                duplicate_counter += 1
+                outcomes.append(outcome)
+                continue
+            new_files.append((file_name, quote_file, match_email_body))
+            content_hashes.append(content_hash)
+        return new_files, content_hashes, outcomes
 
     def process_email(self, email_file):
         """Read an email from the given file, which should be an email from a
@@ -299,30 +1081,39 @@ class QuoteEmailProcessor(object):
         email_counter = statsd.Counter(EMAIL_METRIC_NAME)
         email_counter += 1
 
-        message = email.message_from_file(email_file)
+        # attachments are decoded into their own files while reading the
+        # email, so only one of them needs to be in memory at a time
+        message, files = read_email(email_file)
+        try:
+            self._process_message(message, files)
+        finally:
+            for _, quote_file, _ in files:
+                quote_file.close()
+
+    def _process_message(self, message, files):
+        """Do the work of process_email after the email has been read.
+        :param message: email.message.Message with the email's headers
+        :param files: list of (file name, file, match_email_body) for its
+        attachments
+        """
         from_addr, to_addr = message['From'], message['Delivered-To']
         subject = message['Subject']
         if None in (from_addr, to_addr, subject):
             raise EmailError('Invalid email format')
 
-        supplier, altitude_supplier = \
+        supplier, company_id = \
             self._quote_dao.get_supplier_objects_for_message(to_addr)
 
         # load quotes from the file into the database
         self.logger.info('Matched email with supplier: %s' % supplier.name)
 
-        body = get_body(message)
-        #if body:
-        #    files = [(subject, body, True)] + get_attachments(message)
-        #    self.logger.info('Found email body in message for supplier:'
-        #                     ' %s' % supplier.name)
-        #else:
+        # the body is not read, since quotes in the email body are not
+        # supported (see util.email_util.get_body)
         self.logger.info('Extracting attachments from message for '
                              'supplier: %s' % supplier.name)
-        files = get_attachments(message)
         self.logger.info('Found %s attachments', len(files))
         count = 0
-        for file_name, file_content, match_email_body in files:
+        for file_name, quote_file, match_email_body in files:
             count += 1
             self.logger.info('File %s name: %s' % (count, file_name))
 
@@ -332,41 +1123,105 @@ class QuoteEmailProcessor(object):
         # to avoid complexity this is done even if there was only one error.
         errors = []
 
+        # files that were skipped because they were processed before count
+        # as if they had been read again
         files_count, quotes_count = 0, 0
-        for file_name, file_content, match_email_body in files:
-            self.logger.info('Processing attachment from %s: "%s" of size: %s' % (
-                supplier.name, file_name, len(file_content)))
-            self._quote_dao.begin()
-            try:
-                quote_parser = self._process_quote_file(
-                    supplier, altitude_supplier, file_name, file_content,
-                    match_email_body)
-            except UnknownFormatError:
-                self._quote_dao.rollback()
-                self.logger.warn(('Skipped attachment from %s with unexpected '
-                                 'name: "%s"') % (supplier.name, file_name))
-                continue
-            except Exception as e:
-                self._quote_dao.rollback()
-                self.logger.error(message)
-                # modify the error message so it includes the supplier name
-                # and file name, for use in bounce emails
-                # TODO: this can go away when we stop bouncing
-                # emails MultipleErrors is removed
-                e.message = 'Error when processing attachment "%s" from ' \
-                            '%s:\n%s' % (
-                            file_name, supplier.name, traceback.format_exc())
-                errors.append(e)
-                continue
-            self._quote_dao.commit()
-            quotes_count = quote_parser.get_count()
-            self.logger.info('Read %s quotes for %s from "%s"' % (
-                quotes_count, supplier.name, file_name))
-            quotes_counter = statsd.Counter(QUOTE_METRIC_FORMAT % dict(
-                suppliername=quote_parser.NAME))
-            # submit metric
-            quotes_counter += quotes_count
-            files_count += 1
+        new_files, content_hashes = files, None
+        # (file name, content hash, quote count, format id) of files to add
+        # to the AttachmentIndex once they have been uploaded
+        processed_files = []
+        if self._attachment_index is not None:
+            new_files, content_hashes, outcomes = self._skip_duplicates(
+                supplier, files)
+            for outcome in outcomes:
+                files_count += 1
+                quotes_count = outcome.quote_count
+
+        # worker processes share the position of each file on disk with this
+        # process, so the sizes are measured before any of them starts
+        sizes = [_get_file_size(quote_file) for _, quote_file, _ in new_files]
+
+        # with more than one file, they can all be read at once while the
+        # quotes are inserted here one file at a time
+        read_files = None
+        if self._attachment_processes > 1 and len(new_files) > 1:
+            read_files = self._read_files_in_pool(supplier, company_id,
+                                                  new_files)
+
+        try:
+            for i, (file_name, quote_file, match_email_body) in enumerate(
+                    new_files):
+                self.logger.info(
+                    'Processing attachment from %s: "%s" of size: %s' % (
+                        supplier.name, file_name, sizes[i]))
+                self._quote_dao.begin()
+                self._pending_snapshot = None
+                try:
+                    if read_files is None:
+                        quote_parser = self._process_quote_file(
+                            supplier, company_id, file_name, quote_file,
+                            match_email_body)
+                    else:
+                        quote_parser = self._insert_read_file(
+                            supplier, file_name, next(read_files))
+                except UnknownFormatError:
+                    self._quote_dao.rollback()
+                    self.logger.warn(('Skipped attachment from %s with '
+                                      'unexpected name: "%s"') % (
+                        supplier.name, file_name))
+                    continue
+                except Exception as e:
+                    self._quote_dao.rollback()
+                    self.logger.error(message)
+                    # modify the error message so it includes the supplier
+                    # name and file name, for use in bounce emails
+                    # TODO: this can go away when we stop bouncing
+                    # emails MultipleErrors is removed
+                    e.message = 'Error when processing attachment "%s" from ' \
+                                '%s:\n%s' % (
+                                file_name, supplier.name,
+                                getattr(e, 'worker_traceback', None) or
+                                traceback.format_exc())
+                    errors.append(e)
+                    continue
+                self._quote_dao.commit()
+                if self._pending_snapshot is not None:
+                    snapshot_path, snapshot = self._pending_snapshot
+                    snapshot.save(snapshot_path)
+                quotes_count = quote_parser.get_count()
+                self.logger.info('Read %s quotes for %s from "%s"' % (
+                    quotes_count, supplier.name, file_name))
+                quotes_counter = statsd.Counter(QUOTE_METRIC_FORMAT % dict(
+                    suppliername=quote_parser.NAME))
+                # submit metric
+                quotes_counter += quotes_count
+                self._report_stats(quote_parser, file_name)
+                if self._attachment_index is not None:
+                    processed_files.append((
+                        file_name, content_hashes[i], quotes_count,
+                        quote_parser.matrix_format.matrix_format_id))
+                files_count += 1
+        finally:
+            if read_files is not None:
+                # stops the worker processes
+                read_files.close()
+            # the email is not done until all its files are stored in S3.
+            # this also happens when an error stops the email, so its
+            # upload errors are not reported with the next one.
+            upload_errors = self._uploader.wait()
+
+        for file_name, e, traceback_text in upload_errors:
+            e.message = 'Error when uploading attachment "%s" from %s:\n%s' % (
+                file_name, supplier.name, traceback_text)
+            errors.append(e)
+
+        # files that were not uploaded will be processed again if they are
+        # sent again
+        not_uploaded = {file_name for file_name, _, _ in upload_errors}
+        for file_name, content_hash, count, format_id in processed_files:
+            if file_name not in not_uploaded:
+                self._attachment_index.add(supplier, content_hash, count,
+                                           format_id)
 
         if len(errors) > 0:
             raise MultipleErrors(len(files), errors)
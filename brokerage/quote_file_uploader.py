@@ -0,0 +1,134 @@
+"""Code for archiving quote files in S3 in the background, so reading a file
+does not have to wait for it to be uploaded.
+"""
+import os
+import traceback
+from Queue import Queue
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
+from threading import Lock, Thread
+
+from util.email_util import MAX_ATTACHMENT_MEMORY
+from util.file_utils import AttachmentFile
+
+
+class QuoteFileUploader(object):
+    """Uploads quote files to an S3 bucket in worker threads. Files wait in a
+    bounded queue, so 'upload' only blocks when the threads are far behind.
+    All threads share one Bucket, which is only looked up once.
+
+    The threads never log anything (because of the worker processes that
+    may be forked while they are running); errors are returned by 'wait'
+    instead.
+    """
+    # files at least this large are uploaded in parts of PART_SIZE bytes,
+    # so a failed request only has to be repeated for one part. (the
+    # minimum part size in S3 is 5 MB.)
+    MULTIPART_THRESHOLD = 16 * 2 ** 20
+    PART_SIZE = 8 * 2 ** 20
+
+    # maximum number of files waiting to be uploaded
+    MAX_QUEUED_FILES = 8
+
+    def __init__(self, s3_connection, bucket_name, threads=1):
+        """
+        :param s3_connection: boto.s3.S3Connection
+        :param bucket_name: name of S3 bucket where quote files will be
+        stored (string).
+        :param threads: number of worker threads (int), which are started
+        when the first file is uploaded.
+        """
+        assert threads >= 1
+        self._s3_connection = s3_connection
+        self._bucket_name = bucket_name
+        self._thread_count = threads
+        self._threads = []
+        self._queue = Queue(maxsize=self.MAX_QUEUED_FILES)
+        self._bucket = None
+        self._lock = Lock()
+
+        # (file name, exception, formatted traceback) for each file that
+        # could not be uploaded since the last call to 'wait'
+        self._errors = []
+
+    def upload(self, file_name, quote_file):
+        """Queue a file to be uploaded as a key with the given name. The
+        caller can keep using the file: an AttachmentFile is reopened, so the
+        upload reads its content without copying it, and any other file is
+        copied first (in memory if it is small, otherwise to a temporary
+        file).
+        :param file_name: name of the file (string)
+        :param quote_file: seekable file object, which is left at the start
+        """
+        if isinstance(quote_file, AttachmentFile):
+            copy = quote_file.reopen()
+        else:
+            copy = SpooledTemporaryFile(max_size=MAX_ATTACHMENT_MEMORY)
+            quote_file.seek(0)
+            copyfileobj(quote_file, copy)
+            quote_file.seek(0)
+            copy.seek(0)
+        if self._threads == []:
+            for _ in xrange(self._thread_count):
+                thread = Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put((file_name, copy))
+
+    def wait(self):
+        """Block until every file that was queued has been uploaded (or
+        failed).
+        :return: list of (file name, exception, formatted traceback) for
+        files that could not be uploaded since the last call
+        """
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def _run(self):
+        while True:
+            file_name, quote_file = self._queue.get()
+            try:
+                self._upload(file_name, quote_file)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(
+                        (file_name, e, traceback.format_exc()))
+            finally:
+                quote_file.close()
+                self._queue.task_done()
+
+    def _get_bucket(self):
+        # get_bucket makes a request to check that the bucket exists, so it
+        # is only done once
+        with self._lock:
+            if self._bucket is None:
+                self._bucket = self._s3_connection.get_bucket(
+                    self._bucket_name)
+            return self._bucket
+
+    def _upload(self, file_name, quote_file):
+        bucket = self._get_bucket()
+        quote_file.seek(0, os.SEEK_END)
+        size = quote_file.tell()
+        quote_file.seek(0)
+        if size < self.MULTIPART_THRESHOLD:
+            key = bucket.new_key(file_name)
+            key.set_contents_from_file(quote_file)
+            return
+        multipart_upload = bucket.initiate_multipart_upload(file_name)
+        try:
+            for part_number, start in enumerate(
+                    xrange(0, size, self.PART_SIZE), start=1):
+                # each part is read directly from the file
+                quote_file.seek(start)
+                multipart_upload.upload_part_from_file(
+                    quote_file, part_number,
+                    size=min(self.PART_SIZE, size - start))
+            multipart_upload.complete_upload()
+        except Exception:
+            # otherwise S3 keeps the parts that were uploaded
+            multipart_upload.cancel_upload()
+            raise
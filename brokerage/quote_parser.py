@@ -1,17 +1,23 @@
 """Framework code for parsing matrix quote files, and related tools. Code for
 specific suppliers' matrix formats should go in separate files.
 """
-from abc import ABCMeta, abstractmethod
+from abc import ABCMeta
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import Pool
 import os
 import re
 from datetime import datetime, timedelta
+from threading import Lock
+from time import time, clock
 
 from tablib import Databook, formats
 
 from testfixtures import TempDirectory
 
 from brokerage import model
-from brokerage.reader import Reader
+from brokerage.exceptions import FileTooLargeError
+from brokerage.reader import Reader, ReaderTrace, NOT_FOUND
 from brokerage.validation import ValidationError, _assert_true, _assert_match, \
     _assert_equal
 from brokerage.spreadsheet_reader import SpreadsheetReader
@@ -138,6 +144,208 @@ class FileNameDateGetter(DateGetter):
         return valid_from, valid_from + timedelta(days=1)
 
 
+class ParserStats(object):
+    """Performance measurements for reading one file with a QuoteParser:
+    wall-clock and CPU time of each phase, number of Reader calls, file size
+    before and after conversion, and number of quotes.
+
+    CPU time is only for the current process, so it does not include
+    external conversion programs or worker processes.
+    """
+    # phases in the order they happen
+    PHASES = ['preprocess_file', 'load_file', 'validate', 'extract_quotes']
+
+    def __init__(self):
+        # seconds for each phase
+        self.wall_times = dict.fromkeys(self.PHASES, 0.0)
+        self.cpu_times = dict.fromkeys(self.PHASES, 0.0)
+
+        # calls of each kind (see Reader.call_counts)
+        self.reader_calls = {}
+
+        # size of the file before and after QuoteParser._preprocess_file, or
+        # None if unknown
+        self.bytes_in = None
+        self.bytes_out = None
+
+        # increase in the process's memory usage from preprocessing and
+        # loading the file, or None if unknown
+        self.memory_used = None
+
+        self.quote_count = 0
+
+    @contextmanager
+    def measure(self, phase):
+        """Context manager that adds the time spent inside it to the given
+        phase.
+        """
+        start_wall, start_cpu = time(), clock()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time() - start_wall, clock() - start_cpu)
+
+    def add_time(self, phase, wall_time, cpu_time):
+        self.wall_times[phase] += wall_time
+        self.cpu_times[phase] += cpu_time
+
+    def get_quotes_per_second(self):
+        """:return: quotes extracted per second of wall-clock time spent in
+        extract_quotes (float), or None if no time has been spent.
+        """
+        if self.wall_times['extract_quotes'] == 0:
+            return None
+        return self.quote_count / self.wall_times['extract_quotes']
+
+    def get_timers(self):
+        """:return: dictionary mapping metric names like "load_file.wall"
+        and "load_file.cpu" to seconds (float)
+        """
+        result = {}
+        for phase in self.PHASES:
+            result['%s.wall' % phase] = self.wall_times[phase]
+            result['%s.cpu' % phase] = self.cpu_times[phase]
+        return result
+
+    def __str__(self):
+        return ', '.join(
+            ['%s %.3fs wall %.3fs cpu' % (
+                phase, self.wall_times[phase], self.cpu_times[phase])
+             for phase in self.PHASES] +
+            ['reader calls %s' % self.reader_calls,
+             'bytes in %s out %s' % (self.bytes_in, self.bytes_out),
+             'memory used %s' % self.memory_used,
+             '%s quotes (%s/s)' % (self.quote_count,
+                                   self.get_quotes_per_second())])
+
+
+class ValidationPlan(object):
+    """Expected sheet titles and cell values, in the form of
+    QuoteParser.EXPECTED_SHEET_TITLES and EXPECTED_CELLS, prepared once so
+    they can be checked quickly in many files: column letters are converted
+    to indices and regular expressions are compiled. Every check is done
+    even if some fail, so all problems with a file are reported together.
+    """
+    def __init__(self, expected_sheet_titles, expected_cells):
+        """
+        :param expected_sheet_titles: list of titles of sheets that must
+        exist, or None
+        :param expected_cells: list of (sheet number or title, row, col,
+        value) tuples. if value is a string it is a regex that the cell's
+        text must match; otherwise the cell must equal it. sheet can be None
+        to mean the sheet passed to get_failures.
+        """
+        self._sheet_titles = expected_sheet_titles
+        # sheet -> list of (row, col index, compiled regex or None, value),
+        # so each sheet only has to be found once
+        self._cells_by_sheet = OrderedDict()
+        for sheet, row, col, value in expected_cells:
+            if isinstance(col, basestring):
+                col = SpreadsheetReader.col_letter_to_index(col)
+            regex = re.compile(value) if isinstance(value, basestring) \
+                else None
+            self._cells_by_sheet.setdefault(sheet, []).append(
+                (row, col, regex, value))
+
+    def get_check_count(self):
+        """:return: number of separate checks (each expected title or cell)
+        """
+        return len(self._sheet_titles or []) + sum(
+            len(cells) for cells in self._cells_by_sheet.itervalues())
+
+    def get_failures(self, reader, sheet=None):
+        """Check everything in the plan.
+        :param reader: Reader with a file loaded
+        :param sheet: sheet number or title to use for cells whose sheet is
+        None
+        :return: list of error messages for the checks that failed, one for
+        each check (empty if all passed)
+        """
+        failures = []
+        titles = None
+        if self._sheet_titles is not None:
+            titles = reader.get_sheet_titles()
+            actual_titles = set(titles)
+            failures.extend('Expected sheet title "%s"' % title for title in
+                            self._sheet_titles if title not in actual_titles)
+
+        for sheet_specifier, cells in self._cells_by_sheet.iteritems():
+            if sheet_specifier is None:
+                sheet_specifier = sheet
+            if isinstance(sheet_specifier, basestring):
+                # look up the title once instead of for every cell
+                if titles is None:
+                    titles = reader.get_sheet_titles()
+                if sheet_specifier not in titles:
+                    failures.extend('No sheet named "%s"' % sheet_specifier
+                                    for _ in cells)
+                    continue
+                sheet_specifier = titles.index(sheet_specifier)
+            for row, col, regex, value in cells:
+                if regex is None:
+                    actual = reader.try_get(sheet_specifier, row, col, object)
+                    if actual != value:
+                        failures.append('At (%s, %s, %s), expected %s, found '
+                                        '%s' % (sheet_specifier, row, col,
+                                                value, actual))
+                    continue
+                text = reader.try_get(sheet_specifier, row, col, basestring)
+                if text is NOT_FOUND or not regex.match(text):
+                    failures.append('At (%s, %s, %s), no match for "%s" in '
+                                    '"%s"' % (sheet_specifier, row, col,
+                                              value, text))
+        return failures
+
+    def run(self, reader, sheet=None):
+        """Raise ValidationError listing all failed checks, if there were any.
+        Arguments are the same as for get_failures.
+        """
+        failures = self.get_failures(reader, sheet=sheet)
+        if failures != []:
+            raise ValidationError('. '.join(failures))
+
+
+def _get_file_size(f):
+    """:return: size of the given file object in bytes, or None if it can't
+    be determined (for example if the file is not seekable).
+    """
+    try:
+        position = f.tell()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(position)
+    except (AttributeError, IOError):
+        return None
+    return size
+
+
+def _get_memory_usage():
+    """:return: resident memory size of the current process in bytes, or
+    None if it can't be determined (only works on Linux).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+# QuoteParser whose work units are being extracted by a new pool of worker
+# processes. it is set while the pool is created, so the workers inherit the
+# parser (including its already-loaded file) when they are forked, instead of
+# having it pickled and sent to them. the lock is for creating pools from
+# multiple threads at once.
+_pool_parser = None
+_pool_lock = Lock()
+
+def _extract_quotes_from_unit_in_worker(unit):
+    """Runs in a worker process created by QuoteParser._extract_quotes_in_pool.
+    :return: list of all quotes in the given work unit
+    """
+    return list(_pool_parser._extract_quotes_from_unit(unit))
+
+
 class QuoteParser(object):
     """Superclass for classes representing particular matrix file formats.
     """
@@ -148,8 +356,11 @@ class QuoteParser(object):
     # with no spaces or punctuation, like "directenergy". avoid changing this!
     NAME = None
 
-    # a Reader instance to use for this file type (subclasses should set this)
-    reader = None
+    # callable returning a new Reader instance to use for this file type,
+    # such as functools.partial(SpreadsheetReader, formats.xlsx) (subclasses
+    # should set this). every QuoteParser instance has its own Reader, so
+    # separate instances can parse files of the same format at the same time.
+    reader_factory = None
 
     # subclasses can set this to use sheet titles to validate the file
     EXPECTED_SHEET_TITLES = None
@@ -159,30 +370,66 @@ class QuoteParser(object):
     # interpreted as a regex (so remember to escape characters like '$').
     EXPECTED_CELLS = []
 
+    # cheap "fingerprint" that 'sniff' uses to recognize files of this
+    # format. FINGERPRINT_CELLS has the same form as EXPECTED_CELLS and
+    # defaults to the first FINGERPRINT_CELL_COUNT of them (set it to [] if
+    # those can't be checked without _after_load). FINGERPRINT_ANCHORS is
+    # for PDFs: (page number, regex) tuples for text that must appear
+    # anywhere on the page. all of these must also be checked by 'validate'.
+    FINGERPRINT_CELLS = None
+    FINGERPRINT_CELL_COUNT = 3
+    FINGERPRINT_ANCHORS = []
+
     # energy unit that the supplier uses: convert from this. subclass should
     # specify it.
     # this is only used for volume ranges (but should also be used for prices)
     EXPECTED_ENERGY_UNIT = None
 
-    # energy unit for resulting quotes: convert to this
-    TARGET_ENERGY_UNIT = unit_registry.kWh
+    # energy unit for resulting quotes: convert to this. None means kWh
+    # (the UnitRegistry isn't used here because it is created lazily).
+    TARGET_ENERGY_UNIT = None
 
     # a DateGetter instance that determines the validity/expiration dates of
     # all quotes. not required, because some some suppliers could have
     # different dates for some quotes than for others.
     date_getter = None
 
+    # (sheet, column, first row) of columns where dates may be stored as
+    # Excel date numbers, for example because the file is an xls file. all
+    # numbers in them from the first row down are converted to datetimes at
+    # once when the file is loaded, so they can be read as datetimes.
+    DATE_COLUMNS = []
+
     # The number of digits to which quote price is rounded.
     # subclasses can fill in this value to round the price to a certain
     # number of digits
     ROUNDING_DIGITS = None
 
-    def __init__(self):
+    def __init__(self, processes=1, trace_dir=None, max_memory=None):
+        """
+        :param processes: maximum number of worker processes to use for
+        extracting quotes, if the subclass supports it (see _get_work_units).
+        1 means everything happens in the current process.
+        :param trace_dir: optional directory where a ReaderTrace of the
+        parts of each file that were read is saved (one file for each NAME).
+        when a file of the same format is loaded later, the Reader uses the
+        trace to skip the rest.
+        :param max_memory: optional maximum number of bytes that the process
+        can use for preprocessing and loading one file. it is checked after
+        the file is loaded, and FileTooLargeError is raised if it was
+        exceeded.
+        """
         # name should be defined
         assert isinstance(self.NAME, basestring)
-
-        # reader should be set to a Reader instance by subclass
-        assert self.reader is not None
+        assert processes >= 1
+        self._processes = processes
+        self._trace_dir = trace_dir
+        self._max_memory = max_memory
+
+        # reader_factory should be set by subclass
+        assert self.reader_factory is not None
+        self.reader = self.reader_factory()
+        self.reader.set_date_columns(self.DATE_COLUMNS)
         # TODO: remove '_reader' variable used in subclasses
         self._reader = self.reader
 
@@ -200,10 +447,125 @@ class QuoteParser(object):
         # number of quotes read so far
         self._count = 0
 
+        # performance measurements for the current file
+        self._stats = ParserStats()
+
+        # trace that was used to load the current file (if trace_dir is set)
+        self._pruning_trace = None
+
         # set when load_file is called
         self.file_name = None
         self.matrix_format = None
 
+        # file returned by _preprocess_file if it was a new one, and
+        # Converters used to make it, which are closed by 'close'
+        self._preprocessed_file = None
+        self._converters = []
+
+    def close(self):
+        """Free the loaded file and remove any temporary files that were
+        made while loading it. Another file can be loaded afterwards (which
+        also does this). A QuoteParser can also be used as a context manager
+        that calls this at the end.
+        """
+        self.reader.close()
+        if self._preprocessed_file is not None:
+            self._preprocessed_file.close()
+            self._preprocessed_file = None
+        for converter in self._converters:
+            converter.close()
+        self._converters = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def stats(self):
+        """ParserStats for the file that was most recently loaded.
+        """
+        self._stats.reader_calls = dict(self.reader.call_counts)
+        self._stats.quote_count = self._count
+        return self._stats
+
+    @classmethod
+    def sniff(cls, quote_file):
+        """Estimate whether 'quote_file' has this format by checking its
+        fingerprint (EXPECTED_SHEET_TITLES, FINGERPRINT_CELLS and
+        FINGERPRINT_ANCHORS), reading only metadata or a few pages if
+        possible. Since 'validate' checks the same things, a file that
+        fails any of these checks would also fail validation.
+        :param quote_file: file to read from (its position is reset to the
+        beginning afterwards).
+        :return: fraction of the checks that passed (between 0 and 1), or
+        None if nothing could be checked without loading the whole file.
+        """
+        if cls._preprocess_file.__func__ is not \
+                QuoteParser._preprocess_file.__func__:
+            # the file would have to be converted before reading it
+            return None
+        cells_plan, pages = cls._get_fingerprint_plan()
+        results = []
+        reader = cls.reader_factory()
+        reader.set_date_columns(cls.DATE_COLUMNS)
+        try:
+            if cls.EXPECTED_SHEET_TITLES:
+                titles = reader.sniff_sheet_titles(quote_file)
+                quote_file.seek(0)
+                if titles is not None:
+                    results.extend(title in titles for title in
+                                   cls.EXPECTED_SHEET_TITLES)
+            if pages and reader.load_file_partially(quote_file, pages):
+                failure_count = len(cells_plan.get_failures(reader))
+                results.extend(
+                    [True] * (cells_plan.get_check_count() - failure_count) +
+                    [False] * failure_count)
+                results.extend(reader.contains_match(page, regex) for
+                               page, regex in cls.FINGERPRINT_ANCHORS)
+        except Exception:
+            # a file that the Reader can't even open does not have this
+            # format (there is no telling what libraries like xlrd raise)
+            return 0.
+        finally:
+            reader.close()
+            quote_file.seek(0)
+        if results == []:
+            return None
+        return sum(results) / float(len(results))
+
+    @classmethod
+    def _get_validation_plan(cls):
+        """:return: ValidationPlan for EXPECTED_SHEET_TITLES and
+        EXPECTED_CELLS, which is created the first time it's used (for each
+        class separately).
+        """
+        plan = cls.__dict__.get('_validation_plan')
+        if plan is None:
+            plan = ValidationPlan(cls.EXPECTED_SHEET_TITLES,
+                                  cls.EXPECTED_CELLS)
+            cls._validation_plan = plan
+        return plan
+
+    @classmethod
+    def _get_fingerprint_plan(cls):
+        """:return: ValidationPlan for the fingerprint cells used by 'sniff'
+        (FINGERPRINT_CELLS, or the first FINGERPRINT_CELL_COUNT of
+        EXPECTED_CELLS), and the set of pages that must be loaded to check
+        them and FINGERPRINT_ANCHORS. Like _get_validation_plan, these are
+        created the first time they're used, for each class separately.
+        """
+        result = cls.__dict__.get('_fingerprint_plan')
+        if result is None:
+            cells = cls.EXPECTED_CELLS[:cls.FINGERPRINT_CELL_COUNT] if \
+                cls.FINGERPRINT_CELLS is None else cls.FINGERPRINT_CELLS
+            pages = {cell[0] for cell in cells}.union(
+                page for page, _ in cls.FINGERPRINT_ANCHORS)
+            result = ValidationPlan(None, cells), pages
+            cls._fingerprint_plan = result
+        return result
+
     def get_name(self):
         """Rerturn the short standardized name of the format or supplier that
         this parser is for.
@@ -219,6 +581,15 @@ class QuoteParser(object):
         """
         return quote_file
 
+    def _convert_file(self, converter, quote_file, file_name):
+        """Helper for _preprocess_file: convert the file with a Converter
+        that will be closed along with this QuoteParser.
+        :param converter: brokerage.file_utils.Converter
+        :return: converted file
+        """
+        self._converters.append(converter)
+        return converter.convert_file(quote_file, file_name)
+
     def load_file(self, quote_file, file_name, matrix_format):
         """Read from 'quote_file'. May be very slow and take a huge amount of
         memory.
@@ -228,14 +599,49 @@ class QuoteParser(object):
         :param matrix_format: MatrixFormat object containing format-specific
         data used for parsing the file
         """
-        quote_file = self._preprocess_file(quote_file, file_name)
-        self.reader.load_file(quote_file)
+        # the previous file is freed before loading the new one
+        self.close()
+        self._stats = ParserStats()
+        self.reader.call_counts.clear()
+        memory_before = _get_memory_usage()
+        self._stats.bytes_in = _get_file_size(quote_file)
+        with self._stats.measure('preprocess_file'):
+            preprocessed_file = self._preprocess_file(quote_file, file_name)
+        if preprocessed_file is not quote_file:
+            self._preprocessed_file = preprocessed_file
+        self._stats.bytes_out = _get_file_size(preprocessed_file)
+        if self._trace_dir is not None:
+            self._pruning_trace = ReaderTrace.load(self._get_trace_path())
+            self.reader.set_pruning_trace(self._pruning_trace)
+            self.reader.start_trace()
+        with self._stats.measure('load_file'):
+            self.reader.load_file(preprocessed_file)
+        self._check_memory(memory_before, file_name)
         self._validated = False
         self._count = 0
         self.file_name = file_name
         self.matrix_format = matrix_format
         self._after_load()
 
+    def _check_memory(self, memory_before, file_name):
+        """Record how much memory was used to load the file, and if it was
+        more than the maximum, free it and raise FileTooLargeError.
+        :param memory_before: result of _get_memory_usage before the file
+        was loaded
+        """
+        memory_after = _get_memory_usage()
+        if memory_before is None or memory_after is None:
+            return
+        self._stats.memory_used = memory_after - memory_before
+        if self._max_memory is not None and \
+                self._stats.memory_used > self._max_memory:
+            self.close()
+            raise FileTooLargeError(
+                'Loading file "%s" used %.0f MB of memory, more than the '
+                'maximum of %.0f MB' % (
+                    file_name, self._stats.memory_used / 2. ** 20,
+                    self._max_memory / 2. ** 20))
+
     def _after_load(self):
         """This method is executed after the file is loaded, and before it is
         validated. Subclasses can override it to add extra behavior such
@@ -249,38 +655,34 @@ class QuoteParser(object):
         reading the wrong file by accident, not to find all possible
         problems the contents in advance.
         """
+        with self._stats.measure('validate'):
+            self._validate_file()
+        self._validated = True
+
+    def _validate_file(self):
         assert self.reader.is_loaded()
-        if self.EXPECTED_SHEET_TITLES is not None:
-            actual_titles = self.reader.get_sheet_titles()
-            if not set(self.EXPECTED_SHEET_TITLES).issubset(set(actual_titles)):
-                raise ValidationError('Expected sheet tiles %s, actual %s' % (
-                    self.EXPECTED_SHEET_TITLES, actual_titles))
-        for sheet_number_or_title, row, col, expected_value in \
-                self.EXPECTED_CELLS:
-            if isinstance(expected_value, basestring):
-                text = self.reader.get(sheet_number_or_title, row, col,
-                                       basestring)
-                _assert_match(expected_value, text)
-            else:
-                actual_value = self.reader.get(sheet_number_or_title, row, col,
-                                               object)
-                _assert_equal(expected_value, actual_value)
+        self._get_validation_plan().run(self.reader)
         self._validate()
-        self._validated = True
 
     def _validate(self):
         # subclasses can override this to do additional validation
         pass
 
     def extract_quotes(self):
-        """Yield Quotes extracted from the file. Raise ValidationError if the
-        quote file is malformed (no other exceptions should not be raised).
-        The Quotes are not associated with a supplier, so this must be done
+        """Yield quotes extracted from the file (usually
+        MatrixQuoteRecords, which can be converted into MatrixQuotes if
+        necessary). Raise ValidationError if the quote file is malformed (no
+        other exceptions should not be raised).
+        The quotes are not associated with a supplier, so this must be done
         by the caller.
         """
         if not self._validated:
             self.validate()
 
+        # time is measured only while this generator is running, not while
+        # the caller is using the quotes
+        start_wall, start_cpu = time(), clock()
+
         if self.date_getter is not None:
             self._valid_from, self._valid_until = self.date_getter.get_dates(
                 self)
@@ -288,19 +690,101 @@ class QuoteParser(object):
                 self._valid_until = self._valid_from + timedelta(days=8)
 
 
-        for quote in self._extract_quotes():
+        # all quotes from the same file are received at the same time
+        date_received = datetime.utcnow()
+
+        work_units = self._get_work_units()
+        use_pool = self._processes > 1 and work_units is not None and \
+                   len(work_units) > 1
+        if use_pool:
+            quotes = self._extract_quotes_in_pool(work_units)
+        else:
+            quotes = self._extract_quotes()
+
+        for quote in quotes:
+            if quote.date_received is None:
+                quote.date_received = date_received
             if self.ROUNDING_DIGITS is not None:
                 quote.price = round(quote.price, self.ROUNDING_DIGITS)
-            self._count += 1
+            # a record with several start months counts as that many quotes
+            self._count += quote.start_month_count
+            self._stats.add_time('extract_quotes', time() - start_wall,
+                                 clock() - start_cpu)
             yield quote
+            start_wall, start_cpu = time(), clock()
+        self._stats.add_time('extract_quotes', time() - start_wall,
+                             clock() - start_cpu)
+
+        # reads in worker processes are not in the trace, so it is only
+        # complete if all quotes were extracted in this process
+        if self._trace_dir is not None and not use_pool:
+            self._save_trace()
+
+    def _get_trace_path(self):
+        return os.path.join(self._trace_dir, '%s.json' % self.NAME)
+
+    def _save_trace(self):
+        """Save the ReaderTrace for the current file, combined with the one
+        used to load it, so the traced region never shrinks.
+        """
+        trace = self.reader.trace
+        if self._pruning_trace is not None:
+            trace.update(self._pruning_trace)
+        trace.save(self._get_trace_path())
 
-    @abstractmethod
     def _extract_quotes(self):
         """Subclasses do extraction here. Should be implemented as a generator
         so consumers can control how many quotes get read at one time.
+        The default implementation extracts quotes from each work unit in
+        order; subclasses that don't override _get_work_units must override
+        this.
+        """
+        work_units = self._get_work_units()
+        if work_units is None:
+            raise NotImplementedError
+        for unit in work_units:
+            for quote in self._extract_quotes_from_unit(unit):
+                yield quote
+
+    def _get_work_units(self):
+        """Subclasses can override this (together with
+        _extract_quotes_from_unit) if the file consists of independent parts
+        that can be read in parallel, such as sheets.
+        :return: list of picklable values (such as sheet titles) that
+        identify the parts of the file, in the order their quotes should be
+        returned, or None if the file can't be divided.
+        """
+        return None
+
+    def _extract_quotes_from_unit(self, unit):
+        """Generate quotes from one of the work units returned by
+        _get_work_units. This may run in a different process, so it must
+        not change any state that is used outside of that unit.
         """
         raise NotImplementedError
 
+    def _extract_quotes_in_pool(self, work_units):
+        """Generate quotes from all the given work units, using a pool of
+        worker processes. Quotes are in the same order as if the work units
+        were read one at a time.
+        """
+        global _pool_parser
+        with _pool_lock:
+            _pool_parser = self
+            try:
+                pool = Pool(processes=min(self._processes, len(work_units)))
+            finally:
+                _pool_parser = None
+        try:
+            # imap preserves the order of the work units
+            for quotes in pool.imap(_extract_quotes_from_unit_in_worker,
+                                    work_units):
+                for quote in quotes:
+                    yield quote
+        finally:
+            pool.terminate()
+            pool.join()
+
     def get_count(self):
         """
         :return: number of quotes read so far
@@ -361,6 +845,8 @@ class QuoteParser(object):
             expected_unit = self.EXPECTED_ENERGY_UNIT
         if target_unit is None:
             target_unit = self.TARGET_ENERGY_UNIT
+        if target_unit is None:
+            target_unit = unit_registry.kWh
 
         if low is not None:
             if fudge_low:
@@ -1,56 +1,75 @@
 """This module should contain subclasses of QuoteParser for specific
 suppliers, each one in a separate file.
+
+The modules are not imported here, because importing all of them (and the
+libraries they use) takes much longer than reading an email, which only
+needs one or two of them. Use CLASSES_FOR_FORMATS to get a parser class, or
+import it from its own module.
 """
-from brokerage.quote_parsers.agera_electric import AgeraElectricMatrixParser
-from brokerage.quote_parsers.agera_gas import AgeraGasMatrixParser
-from brokerage.quote_parsers.direct_portal import DirectPortalMatrixParser
-from brokerage.quote_parsers.source import SourceMatrixParser
-from .aep import AEPMatrixParser
-from .amerigreen import AmerigreenMatrixParser
-from brokerage.quote_parsers.guttman_electric import GuttmanElectric
-from brokerage.quote_parsers.guttman_gas import GuttmanGas
-from .champion import ChampionMatrixParser
-from .constellation import ConstellationMatrixParser
-from .direct_energy import DirectEnergyMatrixParser
-from .liberty import LibertyMatrixParser
-from .entrust import EntrustMatrixParser
-from .major_energy import MajorEnergyMatrixParser
-from .usge_gas import USGEGasMatrixParser
-from .usge_electric import USGEElectricMatrixParser
-from .sfe import SFEMatrixParser
-from .gee_electric import GEEMatrixParser
-from .volunteer import VolunteerMatrixParser
-from .gee_gas_nj import GEEGasNJParser
-from .gee_gas_ny import GEEGasNYParser
-from .spark import SparkMatrixParser
-from .suez_electric import SuezElectricParser
-
-# mapping of each matrix format's primary key in the database to its
-# QuoteParser subclass. each time a subclass is written for a new format,
-# add it to this dictionary.
-CLASSES_FOR_FORMATS = {
-    6: AEPMatrixParser,
-    11: AmerigreenMatrixParser,
-    7: ChampionMatrixParser,
-    3: ConstellationMatrixParser,
-    8: DirectEnergyMatrixParser,
-    1: LibertyMatrixParser,
-    2: EntrustMatrixParser,
-    10: MajorEnergyMatrixParser,
-    9: SFEMatrixParser,
-    4: USGEGasMatrixParser,
-    14: USGEElectricMatrixParser,
-    13: GEEMatrixParser,
-    12: VolunteerMatrixParser,
-    17: GuttmanGas,
-    18: GuttmanElectric,
-    19: SparkMatrixParser,
-    20: GEEGasNYParser,
-    21: GEEGasNJParser,
-    22: SourceMatrixParser,
-    23: SuezElectricParser,
-    24: DirectPortalMatrixParser,
-    25: AgeraElectricMatrixParser,
-    26: AgeraGasMatrixParser
+from collections import Mapping
+from importlib import import_module
+
+# mapping of each matrix format's primary key in the database to the
+# QuoteParser subclass for it, as "module:class", where the module is in
+# this package. each time a subclass is written for a new format, add it to
+# this dictionary.
+PARSER_PATHS = {
+    6: 'aep:AEPMatrixParser',
+    11: 'amerigreen:AmerigreenMatrixParser',
+    7: 'champion:ChampionMatrixParser',
+    3: 'constellation:ConstellationMatrixParser',
+    8: 'direct_energy:DirectEnergyMatrixParser',
+    1: 'liberty:LibertyMatrixParser',
+    2: 'entrust:EntrustMatrixParser',
+    10: 'major_energy:MajorEnergyMatrixParser',
+    9: 'sfe:SFEMatrixParser',
+    4: 'usge_gas:USGEGasMatrixParser',
+    14: 'usge_electric:USGEElectricMatrixParser',
+    13: 'gee_electric:GEEMatrixParser',
+    12: 'volunteer:VolunteerMatrixParser',
+    17: 'guttman_gas:GuttmanGas',
+    18: 'guttman_electric:GuttmanElectric',
+    19: 'spark:SparkMatrixParser',
+    20: 'gee_gas_ny:GEEGasNYParser',
+    21: 'gee_gas_nj:GEEGasNJParser',
+    22: 'source:SourceMatrixParser',
+    23: 'suez_electric:SuezElectricParser',
+    24: 'direct_portal:DirectPortalMatrixParser',
+    25: 'agera_electric:AgeraElectricMatrixParser',
+    26: 'agera_gas:AgeraGasMatrixParser'
 }
 
+
+class ParserRegistry(Mapping):
+    """Read-only dictionary mapping matrix format ids to QuoteParser
+    subclasses, where each class is imported the first time it is looked up.
+    """
+    def __init__(self, package, paths):
+        """
+        :param package: name of the package that contains the modules
+        :param paths: dictionary mapping each key to "module:class", where
+        the module name is relative to 'package'
+        """
+        self._package = package
+        self._paths = paths
+        self._classes = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._classes[key]
+        except KeyError:
+            pass
+        module_name, class_name = self._paths[key].split(':')
+        module = import_module('.' + module_name, self._package)
+        the_class = getattr(module, class_name)
+        self._classes[key] = the_class
+        return the_class
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+CLASSES_FOR_FORMATS = ParserRegistry(__name__, PARSER_PATHS)
@@ -1,16 +1,16 @@
 import datetime
 import time
 from decimal import Decimal
+from functools import partial
 from tablib import formats
 from brokerage.file_utils import LibreOfficeFileConverter
 
-from brokerage.quote_parser import QuoteParser, \
-    excel_number_to_datetime, SimpleCellDateGetter
+from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.validation import _assert_true
 from util.dateutils import date_to_datetime
 from util.monthmath import Month
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from util.units import unit_registry
 
 
@@ -18,7 +18,7 @@ class AEPMatrixParser(QuoteParser):
     """Parser for AEP Energy spreadsheet.
     """
     NAME = 'aep'
-    reader = SpreadsheetReader(formats.xls)
+    reader_factory = partial(SpreadsheetReader, formats.xls)
 
     EXPECTED_SHEET_TITLES = [
         'Price Finder', 'Customer Information', 'Matrix Table-FPAI',
@@ -62,6 +62,9 @@ class AEPMatrixParser(QuoteParser):
     START_MONTH_COL = 'G'
     ROUNDING_DIGITS = 5
 
+    # the file is converted to xls, where dates are numbers
+    DATE_COLUMNS = [(SHEET, START_MONTH_COL, QUOTE_START_ROW)]
+
     EXPECTED_ENERGY_UNIT = unit_registry.MWh
     TARGET_ENERGY_UNIT = unit_registry.kWh
 
@@ -73,8 +76,9 @@ class AEPMatrixParser(QuoteParser):
     date_getter = SimpleCellDateGetter(SHEET, 3, 'W', None)
 
     def _preprocess_file(self, quote_file, file_name):
-        return LibreOfficeFileConverter(
-            'xls', 'xls:"MS Excel 97"').convert_file(quote_file, file_name)
+        return self._convert_file(
+            LibreOfficeFileConverter('xls', 'xls:"MS Excel 97"'), quote_file,
+            file_name)
 
     def _extract_quotes(self):
         for row in xrange(self.QUOTE_START_ROW,
@@ -96,9 +100,9 @@ class AEPMatrixParser(QuoteParser):
             rate_class_alias = 'AEP-electric-%s' % '-'.join([state, utility, rate_codes,rate_class])
 
             # TODO use time zone here
-            start_from = excel_number_to_datetime(
-                self.reader.get(self.SHEET, row, self.START_MONTH_COL,
-                                float))
+            start_from = self.reader.get(self.SHEET, row,
+                                         self.START_MONTH_COL,
+                                         datetime.datetime)
             start_until = date_to_datetime((Month(start_from) + 1).first)
 
             for i, vol_col in enumerate(self.VOLUME_RANGE_COLS):
@@ -132,7 +136,7 @@ class AEPMatrixParser(QuoteParser):
                         continue
                     _assert_true(type(price) is float)
 
-                    yield MatrixQuote(
+                    yield MatrixQuoteRecord(
                         start_from=start_from, start_until=start_until,
                         term_months=term, valid_from=self._valid_from,
                         valid_until=self._valid_until,
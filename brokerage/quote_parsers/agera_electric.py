@@ -1,11 +1,12 @@
 from datetime import datetime, timedelta
+from functools import partial
 from dateutil.relativedelta import relativedelta
 from monthdelta import monthdelta
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
+from brokerage.model import MatrixQuoteRecord
 from brokerage.validation import ELECTRIC, GAS
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
     FileNameDateGetter
@@ -15,7 +16,7 @@ from util.units import unit_registry
 
 class AgeraElectricMatrixParser(QuoteParser):
     NAME = 'agera-electric'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     EXPECTED_SHEET_TITLES = [
         'Matrix'
@@ -89,7 +90,7 @@ class AgeraElectricMatrixParser(QuoteParser):
             #                        self.NON_CONSOLIDATED_PRICE_COL,
             #                        float)
 
-            yield MatrixQuote(
+            yield MatrixQuoteRecord(
                 start_from=start_from, start_until=start_until,
                 term_months=term, dual_billing=False,
                 min_volume=self.MIN_VOLUME, limit_volume = self.MAX_VOLUME,
@@ -100,7 +101,7 @@ class AgeraElectricMatrixParser(QuoteParser):
 
             # We only want consolidated price
 
-            # yield MatrixQuote(
+            # yield MatrixQuoteRecord(
             #     start_from=start_from, start_until=start_until,
             #     term_months=term, dual_billing=True,
             #     min_volume=self.MIN_VOLUME, limit_volume = self.MAX_VOLUME,
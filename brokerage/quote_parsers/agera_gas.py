@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
+from brokerage.model import MatrixQuoteRecord
 from brokerage.validation import ELECTRIC, GAS
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
     FileNameDateGetter
@@ -13,7 +14,7 @@ from util.units import unit_registry
 
 class AgeraGasMatrixParser(QuoteParser):
     NAME = 'agera-gas'
-    reader = SpreadsheetReader(formats.csv)
+    reader_factory = partial(SpreadsheetReader, formats.csv)
 
     EXPECTED_SHEET_TITLES = [
 
@@ -77,7 +78,7 @@ class AgeraGasMatrixParser(QuoteParser):
             dual_billing = self.reader.get(self.SHEET, row, self.BILLING_TYPE,
                                            basestring)
             dual_billing = True if dual_billing == 'dual' else False
-            yield MatrixQuote(
+            yield MatrixQuoteRecord(
                 start_from=start_from, start_until=start_until,
                 term_months=term, valid_from=valid_from,
                 valid_until=valid_until, dual_billing=dual_billing,
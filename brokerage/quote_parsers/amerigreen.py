@@ -1,10 +1,10 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, FileNameDateGetter
-from brokerage.quote_parser import excel_number_to_datetime
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.file_utils import LibreOfficeFileConverter
 from brokerage.validation import _assert_true
@@ -18,7 +18,7 @@ class AmerigreenMatrixParser(QuoteParser):
     # tablib.formats.xls gives this error from openpyxl:
     # "ValueError: Negative dates (-0.007) are not supported"
     # solution: open in Excel and re-save in "xls" format.
-    reader = SpreadsheetReader(formats.xls)
+    reader_factory = partial(SpreadsheetReader, formats.xls)
 
     HEADER_ROW = 28
     QUOTE_START_ROW = 29
@@ -30,6 +30,8 @@ class AmerigreenMatrixParser(QuoteParser):
     PRICE_COL = 'O'
     ROUNDING_DIGITS = 4
 
+    DATE_COLUMNS = [(0, START_MONTH_COL, QUOTE_START_ROW)]
+
     # Amerigreen builds in the broker fee to the prices, so it must be
     # subtracted from the prices shown
     BROKER_FEE_CELL = (25, 'F')
@@ -56,8 +58,9 @@ class AmerigreenMatrixParser(QuoteParser):
     date_getter = FileNameDateGetter()
 
     def _preprocess_file(self, quote_file, file_name):
-        return LibreOfficeFileConverter(
-            'xls', 'xls:"MS Excel 97"').convert_file(quote_file, file_name)
+        return self._convert_file(
+            LibreOfficeFileConverter('xls', 'xls:"MS Excel 97"'), quote_file,
+            file_name)
 
     def _extract_quotes(self):
         broker_fee = self.reader.get(0, self.BROKER_FEE_CELL[0],
@@ -78,14 +81,14 @@ class AmerigreenMatrixParser(QuoteParser):
             term_months = int(self.reader.get(0, row, self.TERM_COL,
                                               (int, float)))
 
-            start_from = excel_number_to_datetime(
-                self.reader.get(0, row, self.START_MONTH_COL, float))
+            start_from = self.reader.get(0, row, self.START_MONTH_COL,
+                                         datetime)
 
             start_until = start_from + timedelta(days=1)
 
             price = self.reader.get(0, row, self.PRICE_COL, float) - broker_fee
 
-            yield MatrixQuote(
+            yield MatrixQuoteRecord(
                 start_from=start_from, start_until=start_until,
                 term_months=term_months, valid_from=self._valid_from,
                 valid_until=self._valid_until, min_volume=min_volume,
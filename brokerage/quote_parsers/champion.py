@@ -1,9 +1,11 @@
+from functools import partial
+
 from tablib import formats
 from brokerage.spreadsheet_reader import SpreadsheetReader
 
 from util.dateutils import date_to_datetime, parse_datetime
 from util.monthmath import Month
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import excel_number_to_datetime, QuoteParser, \
     SimpleCellDateGetter
 from util.units import unit_registry
@@ -13,7 +15,7 @@ class ChampionMatrixParser(QuoteParser):
     """ Parser for Champion Matrix Rates
     """
     NAME = 'champion'
-    reader = SpreadsheetReader(formats.xls)
+    reader_factory = partial(SpreadsheetReader, formats.xls)
 
     HEADER_ROW = 13
     VOLUME_RANGE_COL = 'H'
@@ -83,7 +85,7 @@ class ChampionMatrixParser(QuoteParser):
                                             sheet, self.HEADER_ROW, col,
                                             '(\d+) mths', int)
 
-                    yield MatrixQuote(
+                    yield MatrixQuoteRecord(
                         start_from=start_from, start_until=start_until,
                         term_months=term, valid_from=self._valid_from,
                         valid_until=self._valid_until,
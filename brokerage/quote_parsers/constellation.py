@@ -1,8 +1,9 @@
 from datetime import datetime
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.validation import ELECTRIC
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
     FileNameDateGetter
@@ -17,7 +18,7 @@ class ConstellationMatrixParser(QuoteParser):
     if it becomes used again!
     """
     NAME = 'constellation'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     START_FROM_ROW = 6
     VOLUME_RANGE_ROW = 8
@@ -88,7 +89,7 @@ class ConstellationMatrixParser(QuoteParser):
                 start_until = date_to_datetime((Month(start_from) + 1).first)
 
                 min_vol, max_vol = volume_ranges[col - self.PRICE_START_COL]
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term_months, valid_from=self._valid_from,
                     valid_until=self._valid_until,
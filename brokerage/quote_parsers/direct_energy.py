@@ -1,12 +1,14 @@
+from datetime import datetime
+from functools import partial
+
 from tablib import formats
 
-from brokerage.quote_parser import QuoteParser, excel_number_to_datetime, \
-    SimpleCellDateGetter
+from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.validation import _assert_true
 from util.dateutils import date_to_datetime
 from util.monthmath import Month
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from util.units import unit_registry
 
 
@@ -14,7 +16,7 @@ class DirectEnergyMatrixParser(QuoteParser):
     """Parser for Direct Energy spreadsheet.
     """
     NAME = 'directenergy'
-    reader = SpreadsheetReader(formats.xls)
+    reader_factory = partial(SpreadsheetReader, formats.xls)
 
     HEADER_ROW = 51
     VOLUME_RANGE_ROW = 51
@@ -29,6 +31,8 @@ class DirectEnergyMatrixParser(QuoteParser):
     PRICE_START_COL = 8
     PRICE_END_COL = 13
 
+    DATE_COLUMNS = [(0, 0, QUOTE_START_ROW)]
+
     EXPECTED_SHEET_TITLES = [
         'Daily Matrix Price',
     ]
@@ -56,8 +60,7 @@ class DirectEnergyMatrixParser(QuoteParser):
 
         for row in xrange(self.QUOTE_START_ROW, self.reader.get_height(0) + 1):
             # TODO use time zone here
-            start_from = excel_number_to_datetime(
-                self.reader.get(0, row, 0, (int, float)))
+            start_from = self.reader.get(0, row, 0, datetime)
             start_until = date_to_datetime((Month(start_from) + 1).first)
             term_months = int(self.reader.get(0, row, self.TERM_COL,
                                               (int, float)))
@@ -78,7 +81,7 @@ class DirectEnergyMatrixParser(QuoteParser):
             for col in xrange(self.PRICE_START_COL, self.PRICE_END_COL + 1):
                 min_vol, max_vol = volume_ranges[col - self.PRICE_START_COL]
                 price = self.reader.get(0, row, col, (int, float)) / 1000.
-                yield MatrixQuote(start_from=start_from,
+                yield MatrixQuoteRecord(start_from=start_from,
                     start_until=start_until, term_months=term_months,
                     valid_from=self._valid_from, valid_until=self._valid_until,
                     min_volume=min_vol, limit_volume=max_vol,
@@ -1,8 +1,9 @@
 from datetime import timedelta
+from functools import partial
 from tablib import formats
 
 from brokerage.exceptions import ValidationError
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, FileNameDateGetter
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.validation import ELECTRIC, GAS, _assert_equal
@@ -16,7 +17,7 @@ class DirectPortalMatrixParser(QuoteParser):
     confused with the main Direct Energy matrixf format.
     """
     NAME = 'directportal'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     HEADER_ROW = 1
     QUOTE_START_ROW = 2
@@ -29,6 +30,9 @@ class DirectPortalMatrixParser(QuoteParser):
     THM_SUBTRACT_AMOUNT = .04
     SHEET = 'Prices'
 
+    # number of consecutive start months each price is offered for
+    START_MONTH_COUNT = 4
+
     SHEET = 'Prices'
     EXPECTED_SHEET_TITLES = ['Prices', 'Utility Abbreviations']
     EXPECTED_CELLS = [
@@ -97,19 +101,15 @@ class DirectPortalMatrixParser(QuoteParser):
             price = price - subtract_amount
             # TODO: quotes are temporarily duplicated 4 times as a workaround
             # for a bug where Team Portal cannot show quotes that started
-            # before the current month
+            # before the current month. one record stands for all 4; they
+            # are only expanded when inserted into the database.
             start = Month(self._valid_from).first
-            for start_from, start_until in [
-                (start, (Month(start) + 1).first),
-                ((Month(start) + 1).first, (Month(start) + 2).first),
-                ((Month(start) + 2).first, (Month(start) + 3).first),
-                ((Month(start) + 3).first, (Month(start) + 4).first),
-            ]:
-                yield MatrixQuote(
-                    start_from=date_to_datetime(start_from),
-                    start_until=date_to_datetime(start_until),
-                    term_months=term, valid_from=self._valid_from,
-                    valid_until=self._valid_until, min_volume=min_vol,
-                    limit_volume=limit_vol, rate_class_alias=rca, price=price,
-                    service_type=service_type, file_reference='%s %s,%s,%s' % (
-                        self.file_name, 0, row, self.PRICE_COL))
+            yield MatrixQuoteRecord(
+                start_from=date_to_datetime(start),
+                start_until=date_to_datetime((Month(start) + 1).first),
+                term_months=term, valid_from=self._valid_from,
+                valid_until=self._valid_until, min_volume=min_vol,
+                limit_volume=limit_vol, rate_class_alias=rca, price=price,
+                service_type=service_type, file_reference='%s %s,%s,%s' % (
+                    self.file_name, 0, row, self.PRICE_COL),
+                start_month_count=self.START_MONTH_COUNT)
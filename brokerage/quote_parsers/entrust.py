@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta
+from functools import partial
 import re
 from time import mktime, strptime
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.exceptions import ValidationError
 from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter, \
     SpreadsheetReader
@@ -18,7 +19,7 @@ class EntrustMatrixParser(QuoteParser):
     """Parser for Entrust spreadsheet.
     """
     NAME = 'entrust'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     EXPECTED_SHEET_TITLES = [
         'IL - ComEd Matrix',
@@ -64,16 +65,15 @@ class EntrustMatrixParser(QuoteParser):
 
 
     RATE_START_ROW = 9
+    # default table size. some tables are shorter; the actual size for each
+    # sheet is kept in instance variables while the sheet is being read.
     TABLE_ROWS = 18
-    ORIGINAL_TABLE_ROWS = TABLE_ROWS
     START_DATE_COL = 3
     NO_OF_TERM_COLS = 4
     VOLUME_RANGE_COL = 2
     COL_INCREMENT = 7
     TABLE_HEIGHT = 21  # the expected number of rows in a table
-    ORIGINAL_TABLE_HEIGHT = TABLE_HEIGHT
     UTILITY_ROW = 6
-    CHANGED_TABLE_PARMS = False
 
 
     DATE_ROW = 4
@@ -113,15 +113,14 @@ class EntrustMatrixParser(QuoteParser):
         :return yield a quote object
         """
 
-        for table_row in xrange(row, row + self.TABLE_ROWS):
+        for table_row in xrange(row, row + self._table_rows):
             start_from = self._reader.get(sheet, table_row,
                                           self.START_DATE_COL, (datetime, type(None), unicode))
             if start_from is None:
                 # table is shorter
-                # change table rows and height
-                self.CHANGED_TABLE_PARMS = True
-                self.TABLE_ROWS = table_row - self.RATE_START_ROW
-                self.TABLE_HEIGHT = self.TABLE_ROWS + 3
+                # change table rows and height for the rest of the sheet
+                self._table_rows = table_row - self.RATE_START_ROW
+                self._table_height = self._table_rows + 3
                 return
             elif isinstance(start_from, unicode):
                 return
@@ -131,7 +130,7 @@ class EntrustMatrixParser(QuoteParser):
                 price = self._reader.get(sheet, table_row, price_col, (float, type(None), unicode))
                 if price is None or isinstance(price, unicode):
                     continue
-                yield MatrixQuote(start_from=start_from,
+                yield MatrixQuoteRecord(start_from=start_from,
                     start_until=start_until, term_months=term,
                     valid_from=valid_from, valid_until=valid_until,
                     min_volume=min_volume, limit_volume=limit_volume,
@@ -167,7 +166,7 @@ class EntrustMatrixParser(QuoteParser):
 
         for table_start_row in xrange(self.RATE_START_ROW,
                                       self._reader.get_height(sheet),
-                                      self.TABLE_HEIGHT):
+                                      self._table_height):
             term_row = table_start_row - 1
             for col in xrange(self.VOLUME_RANGE_COL,
                               self._reader.get_width(sheet),
@@ -195,11 +194,12 @@ class EntrustMatrixParser(QuoteParser):
                 for quote in quotes:
                         yield quote
 
-    def _extract_quotes(self):
-        for sheet in self.reader.get_sheet_titles():
-            if self.CHANGED_TABLE_PARMS:
-                self.TABLE_HEIGHT = self.ORIGINAL_TABLE_HEIGHT
-                self.TABLE_ROWS = self.ORIGINAL_TABLE_ROWS
-                self.CHANGED_TABLE_PARMS = False
-            for quote in self._process_sheet(sheet):
-                yield quote
+    def _get_work_units(self):
+        # every sheet is independent of the others
+        return self.reader.get_sheet_titles()
+
+    def _extract_quotes_from_unit(self, sheet):
+        self._table_rows = self.TABLE_ROWS
+        self._table_height = self.TABLE_HEIGHT
+        for quote in self._process_sheet(sheet):
+            yield quote
@@ -6,15 +6,17 @@ format, so only one parser needs to be used.
 """
 
 import datetime
+from functools import partial
 import re
 
 from dateutil.relativedelta import relativedelta
 from tablib import formats
 
 from brokerage.exceptions import ValidationError
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader
-from brokerage.validation import ElectricValidator, ELECTRIC
+from brokerage.reader import NOT_FOUND
+from brokerage.validation import ELECTRIC
 from util.units import unit_registry
 
 
@@ -42,7 +44,7 @@ class GEEPriceQuote(object):
         except ValueError as e:
             raise ValidationError(e.message)
 
-        return MatrixQuote(
+        return MatrixQuoteRecord(
             price=self.fetch_price(),
             start_from=start_from,
             start_until=start_until,
@@ -75,11 +77,11 @@ class GEEPriceQuote(object):
 
     def fetch_term(self):
         return self.reader.get(self.sheet,
-            self.row, self.matrix_parser.LAYOUT['TERM_COL'], int)
+            self.row, self.matrix_parser._layout['TERM_COL'], int)
 
     def fetch_rate_sch(self):
         rate_sch = self.reader.get(self.sheet, self.row,
-            self.matrix_parser.LAYOUT['RATE_SCH_COL'], basestring)
+            self.matrix_parser._layout['RATE_SCH_COL'], basestring)
         return rate_sch.replace('Sweet Spot', '').strip()
 
     def fetch_zone(self):
@@ -88,23 +90,21 @@ class GEEPriceQuote(object):
         # * If Zone contains "Custom" - ignore everythign in that row.
         # BUT - This probably should not be done here.
         return self.reader.get(self.sheet, self.row, 
-            self.matrix_parser.LAYOUT['ZONE_COL'], basestring)
+            self.matrix_parser._layout['ZONE_COL'], basestring)
 
     def fetch_start_dates(self):
         # Search for the start date row
         for row_offset in xrange(0, self.MAX_SEARCH_CNT):
-            try:
-                start_date = self.reader.get(
-                    self.sheet,
-                    max(0, self.row - row_offset),
-                    self.col,
-                    datetime.datetime)
+            start_date = self.reader.try_get(
+                self.sheet,
+                max(0, self.row - row_offset),
+                self.col,
+                datetime.datetime)
+            if start_date is not NOT_FOUND:
                 start_from = datetime.datetime(start_date.year,
                     start_date.month, 1)
                 start_until = start_from + relativedelta(months=1)
                 return (start_from, start_until)
-            except ValidationError as e:
-                pass
         else:
             # After going through MAX_SEARCH_CNT cells - could not find a date.
             raise ValueError('Cannot find start date for quote (%s, %d, %d)' %
@@ -113,7 +113,7 @@ class GEEPriceQuote(object):
     def fetch_volume_range(self):
         if self.is_onr_sheet:
             vol_kwh_str = self.reader.get(self.sheet, self.row,
-                self.matrix_parser.LAYOUT['RATE_SCH_COL'], basestring)
+                self.matrix_parser._layout['RATE_SCH_COL'], basestring)
 
             single_limit = re.search(r'<([\d]+)mWh', vol_kwh_str)
             multiple_limit = re.search(r'([\d]+)-([\d]+)mWh', vol_kwh_str)
@@ -127,7 +127,7 @@ class GEEPriceQuote(object):
             else:
                 raise ValidationError("Invalid O&R volume range @(%s, %d, %d): %s"
                     % (self.sheet, self.row,
-                    self.matrix_parser.LAYOUT['RATE_SCH_COL']))
+                    self.matrix_parser._layout['RATE_SCH_COL']))
 
         else:
             # This is mostly located in the sheet title.
@@ -142,7 +142,7 @@ class GEEMatrixParser(QuoteParser):
     """Parser class for Great Electric Energy (GEE) spreadsheets."""
 
     NAME = 'gee_electric'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     EXPECTED_ENERGY_UNIT = unit_registry.kWh
 
@@ -150,6 +150,8 @@ class GEEMatrixParser(QuoteParser):
     # Certain sheets start at column B instead of A, in which case all expected columns
     # need to be shifted by 1. The easiest way to manage this is to throw them in a dict
     # and increase all cols by one.
+    # This is never modified: each sheet gets its own shifted copy in
+    # self._layout.
     LAYOUT = {
         # Expected rows
         'ZONE_COL': 0,  #'A'
@@ -231,16 +233,9 @@ class GEEMatrixParser(QuoteParser):
         self._valid_from = effective_date
         self._valid_until = effective_date + datetime.timedelta(days=1)
 
-        # Indicates whether col indices have been shifted
-        modified = False
-
         for sheet in self.reader.get_sheet_titles():
-
-            if modified:
-                # Reset to originals for next sheet if previous one was shifted.
-                for key in [k for k in self.LAYOUT.keys() if "_COL" in k]:
-                    self.LAYOUT[key] -= 1
-                modified = False
+            # Start from the original layout for each sheet
+            self._layout = dict(self.LAYOUT)
 
             # We extract the volume ranges from the sheet title.
             # If no ranges are listed, skip the sheet.
@@ -253,16 +248,15 @@ class GEEMatrixParser(QuoteParser):
 
             for i in [0, 1]:
                 try:
-                    start_row = self._find_start_row(sheet, self.LAYOUT['ZONE_COL'])
+                    start_row = self._find_start_row(sheet, self._layout['ZONE_COL'])
                     break
                 except ValueError:
                     # Shift all column keys over by one
-                    modified = True
-                    for key in [k for k in self.LAYOUT.keys() if "_COL" in k]:
-                        self.LAYOUT[key] += 1
+                    for key in [k for k in self._layout.keys() if "_COL" in k]:
+                        self._layout[key] += 1
 
             for price_row in xrange(start_row, self.reader.get_height(sheet)):
-                for price_col in xrange(self.LAYOUT['FIRST_QUOTE_COL'],
+                for price_col in xrange(self._layout['FIRST_QUOTE_COL'],
                     self.reader.get_width(sheet)):
 
                     # We don't know where the first price cell starts, so we give
@@ -279,9 +273,6 @@ class GEEMatrixParser(QuoteParser):
                             continue
 
                         if 'custom' not in quote.rate_class_alias.lower():
-                            quote = quote.clone()
-                            quote._validator = ElectricValidator()
-                            quote.service_type = ELECTRIC
                             yield quote
                     elif isinstance(price, type(None)):
                         # Break if we're at the first blank cell
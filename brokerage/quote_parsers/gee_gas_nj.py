@@ -1,8 +1,10 @@
 import datetime
+from functools import partial
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.exceptions import ValidationError
 from brokerage.pdf_reader import PDFReader
+from brokerage.reader import NOT_FOUND
 from brokerage.quote_parser import QuoteParser
 from util.dateutils import date_to_datetime
 from util.monthmath import Month
@@ -47,7 +49,13 @@ class QuoteNotFoundException(Exception):
 class GEEGasNJParser(QuoteParser):
     NAME = 'geegas'
 
-    reader = PDFReader(tolerance=5)
+    reader_factory = partial(PDFReader, tolerance=5)
+
+    FINGERPRINT_ANCHORS = [
+        (1, 'NJ Commercial'),
+        (1, '0 - 999 Dth'),
+        (1, 'Term \(Months\)'),
+    ]
 
     INDEX_NJ_PAGE1 = {
         'Page': 1,
@@ -94,15 +102,14 @@ class GEEGasNJParser(QuoteParser):
         """
 
         # If there is no price at the assumed coordinates, raise the relevant exception
-        # This function should always return a MatrixQuote, and if it can't then it should
+        # This function should always return a MatrixQuoteRecord, and if it can't then it should
         # raise an exception. Returning None is not a good way out here.
-        try:
-            price = self._reader.get_matches(info_dict['Page'],
-                                            data_start_offset,
-                                            info_dict[context.month_duration],
-                                            '(\d+\.\d+)',
-                                            str)
-        except ValidationError:
+        price = self._reader.try_match(info_dict['Page'],
+                                       data_start_offset,
+                                       info_dict[context.month_duration],
+                                       '(\d+\.\d+)',
+                                       str)
+        if price is NOT_FOUND:
             raise QuoteNotFoundException
 
         # Find a date string in the format of, eg., Mar-15
@@ -141,7 +148,7 @@ class GEEGasNJParser(QuoteParser):
                 self.file_name, context.state_and_type, utility, load_type,
                 start_from_date.strftime('%Y-%m-%d'), context.month_duration, price),
 
-        quote = MatrixQuote(
+        quote = MatrixQuoteRecord(
             start_from=start_from_date,
             start_until=start_until_date,
             term_months=context.month_duration,
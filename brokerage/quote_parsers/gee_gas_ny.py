@@ -1,12 +1,14 @@
 import calendar
 import re
 from datetime import datetime
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.file_utils import TabulaConverter
 from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter
+from brokerage.reader import NOT_FOUND
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.validation import ValidationError, GAS
 from util.dateutils import date_to_datetime
@@ -19,7 +21,7 @@ class GEEGasNYParser(QuoteParser):
     changed.
     """
     NAME = 'geegasny'
-    reader = SpreadsheetReader(formats.csv)
+    reader_factory = partial(SpreadsheetReader, formats.csv)
 
     SHEET = 0
 
@@ -56,7 +58,7 @@ class GEEGasNYParser(QuoteParser):
 
     def _preprocess_file(self, quote_file, file_name):
         # convert PDF file to a CSV file to make it easier to parse
-        return TabulaConverter().convert_file(quote_file, file_name)
+        return self._convert_file(TabulaConverter(), quote_file, file_name)
 
     def _get_joined_row_text(self, sheet, columns, row):
         """
@@ -92,14 +94,15 @@ class GEEGasNYParser(QuoteParser):
                 continue
 
             # extract rate class alias and date from columns A and/or B
-            try:
-                # in rows 5-47, rate class alias and start date are smashed
-                # together in the same column
-                rca, month_name, year = self.reader.get_matches(
-                    self.SHEET, row, self.RCA_COL, '(.*) (\w+)-(\d\d)\s*',
-                    (unicode, unicode, int))
+            # in rows 5-47, rate class alias and start date are smashed
+            # together in the same column
+            match = self.reader.try_match(
+                self.SHEET, row, self.RCA_COL, '(.*) (\w+)-(\d\d)\s*',
+                (unicode, unicode, int))
+            if match is not NOT_FOUND:
+                rca, month_name, year = match
                 price_cols = self.reader.column_range('B', 'J')
-            except ValidationError:
+            else:
                 # in rows 53-68, rate class alias and start date are in
                 # separate columns, so all other columns are shifted to the
                 # right by 1.
@@ -146,7 +149,7 @@ class GEEGasNYParser(QuoteParser):
                 zip(prices_2, terms) + [(ss_price_2, ss_term_2)])
 
             for price, term in all_prices_and_terms:
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term, valid_from=self._valid_from,
                     valid_until=self._valid_until, rate_class_alias=rca,
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
+from functools import partial
 from time import strptime, mktime
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.validation import ELECTRIC
 from brokerage.quote_parser import QuoteParser
 from brokerage.spreadsheet_reader import SpreadsheetReader
@@ -17,7 +18,7 @@ class GuttmanElectric(QuoteParser):
     time along the columns.
     """
     NAME = 'guttmanelectric'
-    reader = SpreadsheetReader(file_format=formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, file_format=formats.xlsx)
 
     EXPECTED_ENERGY_UNIT = unit_registry.kWh
 
@@ -55,7 +56,7 @@ class GuttmanElectric(QuoteParser):
             for price_col in xrange(col + 2, col + 2 + self.NO_OF_TERM_COLS):
                 term = self._reader.get(sheet, term_row, price_col, int)
                 price = self._reader.get(sheet, table_row, price_col, float)
-                yield MatrixQuote(start_from=start_from,
+                yield MatrixQuoteRecord(start_from=start_from,
                     start_until=start_until, term_months=term,
                     valid_from=valid_from, valid_until=valid_until,
                     min_volume=min_volume, limit_volume=limit_volume,
@@ -1,10 +1,11 @@
 import re
 from datetime import timedelta
+from functools import partial
 from itertools import chain
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.file_utils import LibreOfficeFileConverter
 from brokerage.quote_parser import QuoteParser
 from brokerage.spreadsheet_reader import SpreadsheetReader
@@ -18,7 +19,7 @@ class GuttmanGas(QuoteParser):
     time along the columns.
     """
     NAME = 'guttmangas'
-    reader = SpreadsheetReader(file_format=formats.xls)
+    reader_factory = partial(SpreadsheetReader, file_format=formats.xls)
 
     HEADER_ROW = 6
     RATE_START_ROW = 7
@@ -49,8 +50,9 @@ class GuttmanGas(QuoteParser):
 
 
     def _preprocess_file(self, quote_file, file_name):
-        return LibreOfficeFileConverter(
-            'xls', 'xls:"MS Excel 97"').convert_file(quote_file, file_name)
+        return self._convert_file(
+            LibreOfficeFileConverter('xls', 'xls:"MS Excel 97"'), quote_file,
+            file_name)
 
 
     def _extract_quotes(self):
@@ -99,7 +101,7 @@ class GuttmanGas(QuoteParser):
             elif isinstance(price, float) and unit=='MCF':
                 # the unit is $/mcf
                 price /= 10.
-            yield MatrixQuote(start_from=start_from,
+            yield MatrixQuoteRecord(start_from=start_from,
                 start_until=start_until, term_months=int(term),
                 valid_from=valid_from, valid_until=valid_until,
                 min_volume=min_volume, limit_volume=limit_volume,
@@ -1,11 +1,16 @@
+from functools import partial
+import re
+
 from tablib import formats
 
 from brokerage.exceptions import ValidationError
 from brokerage.file_utils import LibreOfficeFileConverter
-from brokerage.model import MatrixQuote
-from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter
+from brokerage.model import MatrixQuoteRecord
+from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter, \
+    ValidationPlan
+from brokerage.reader import NOT_FOUND
 from brokerage.spreadsheet_reader import SpreadsheetReader
-from brokerage.validation import _assert_equal, ELECTRIC
+from brokerage.validation import ELECTRIC
 from util.dateutils import date_to_datetime, parse_date
 from util.monthmath import Month
 from util.units import unit_registry
@@ -67,7 +72,7 @@ class SuperSaverPriceCell(PriceQuoteCell):
                             self.matrix_parser.START_COL, basestring)))
         start_until = date_to_datetime((Month(start_from) + 1).first)
 
-        yield MatrixQuote(
+        yield MatrixQuoteRecord(
             start_from=start_from, start_until=start_until,
             term_months=term_months, valid_from=self.matrix_parser._valid_from,
             valid_until=self.matrix_parser._valid_until, min_volume=min_vol,
@@ -128,7 +133,7 @@ class NormalPriceCell(PriceQuoteCell):
                             self.matrix_parser.START_COL, basestring)))
         start_until = date_to_datetime((Month(start_from) + 1).first)
 
-        yield MatrixQuote(
+        yield MatrixQuoteRecord(
             start_from=start_from, start_until=start_until,
             term_months=term_months, valid_from=self.matrix_parser._valid_from,
             valid_until=self.matrix_parser._valid_until, min_volume=min_vol,
@@ -143,7 +148,7 @@ class LibertyMatrixParser(QuoteParser):
     NAME = 'liberty'
     # TODO: we couldn't open this in its original xlsx format
     # (might be fixed by upgrading openpyxl)
-    reader = SpreadsheetReader(formats.xls)
+    reader_factory = partial(SpreadsheetReader, formats.xls)
 
     START_COL = 'A'
     UTILITY_COL = 'B'
@@ -208,26 +213,41 @@ class LibertyMatrixParser(QuoteParser):
         (6, 'B', 'Size Tier'),
         (6, 'D', 'FIXED PRICE:  Term in Months'),
     ]
+    # the cells must equal these strings exactly, so they are converted to
+    # regular expressions that match only the whole string
+    LIBERTY_VALIDATION_PLAN = ValidationPlan(None, [
+        (None, row, col, re.escape(text) + r'\Z') for row, col, text in
+        LIBERTY_EXPECTED_CELLS])
+
+    # text that every sheet must have somewhere in row 3
+    SIZE_LIMIT_TEXT = '%s kWh' % '{:,}'.format(LIBERTY_KWH_LIMIT)
 
     EXPECTED_ENERGY_UNIT = unit_registry.MWh
     date_getter = SimpleCellDateGetter(0, 2, 'D', '(\d\d?/\d\d?/\d\d\d\d)')
 
     def _preprocess_file(self, quote_file, file_name):
-        return LibreOfficeFileConverter(
-            'xls', 'xls:"MS Excel 97"').convert_file(quote_file, file_name)
+        return self._convert_file(
+            LibreOfficeFileConverter('xls', 'xls:"MS Excel 97"'), quote_file,
+            file_name)
 
     def _validate(self):
-        for sheet in self.reader.get_sheet_titles():
-            if not self._is_sheet_green(sheet):
-                for (row, col, regexp) in self.LIBERTY_EXPECTED_CELLS:
-                    _assert_equal(regexp,
-                                  self.reader.get(sheet, row, col, basestring))
-
-                # Make sure every sheet maintains the limit KWH of 2,000,000
-                if not any(['%s kWh' % '{:,}'.format(self.LIBERTY_KWH_LIMIT)
-                in (self.reader.get(sheet, 3, col, object) or '')
-                    for col in xrange(0, self.reader.get_width(sheet))]):
-                    raise ValidationError('Size requirements has changed.')
+        # all problems in all sheets are reported together
+        failures = []
+        for index, sheet in enumerate(self.reader.get_sheet_titles()):
+            if self._is_sheet_green(sheet):
+                continue
+            failures.extend('%s: %s' % (sheet, failure) for failure in
+                            self.LIBERTY_VALIDATION_PLAN.get_failures(
+                                self.reader, sheet=index))
+
+            # Make sure every sheet maintains the limit KWH of 2,000,000
+            row_texts = (self.reader.try_get(index, 3, col, basestring) for
+                         col in xrange(self.reader.get_width(index)))
+            if not any(text is not NOT_FOUND and self.SIZE_LIMIT_TEXT in text
+                       for text in row_texts):
+                failures.append('%s: Size requirements has changed' % sheet)
+        if failures != []:
+            raise ValidationError('. '.join(failures))
 
     def _scan_for_tables(self, sheet):
         """
@@ -298,25 +318,26 @@ class LibertyMatrixParser(QuoteParser):
         else:
             return False
 
-    def _extract_quotes(self):
-        """Go ahead and extract every quote from the spreadsheet"""
-
-        for sheet in [s for s in self.EXPECTED_SHEET_TITLES if
-            not self._is_sheet_green(s)]:
-            for table_start_row, rate_class_alias in self._scan_for_tables(
-                    sheet):
-                for col, price_type in self._scan_table_headers(
-                        sheet, table_start_row):
-                    # row_offset indicates how many rows between start of table and first row
-                    # of price data.
-                    row_offset = 4
-                    while self.reader.get(sheet, table_start_row + row_offset,
-                                          col, basestring) != '':
-                        row = table_start_row + row_offset
-                        for quote in price_type(
-                                self, self.reader, sheet, row, col,
-                                rate_class_alias).generate_quote():
-                            quote.file_reference = '%s %s,%s,%s' % (
-                                self.file_name, sheet, row, col)
-                            yield quote
-                        row_offset += 1
+    def _get_work_units(self):
+        # every sheet is independent of the others
+        return [s for s in self.EXPECTED_SHEET_TITLES if
+                not self._is_sheet_green(s)]
+
+    def _extract_quotes_from_unit(self, sheet):
+        for table_start_row, rate_class_alias in self._scan_for_tables(
+                sheet):
+            for col, price_type in self._scan_table_headers(
+                    sheet, table_start_row):
+                # row_offset indicates how many rows between start of table and first row
+                # of price data.
+                row_offset = 4
+                while self.reader.get(sheet, table_start_row + row_offset,
+                                      col, basestring) != '':
+                    row = table_start_row + row_offset
+                    for quote in price_type(
+                            self, self.reader, sheet, row, col,
+                            rate_class_alias).generate_quote():
+                        quote.file_reference = '%s %s,%s,%s' % (
+                            self.file_name, sheet, row, col)
+                        yield quote
+                    row_offset += 1
@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import partial
 
 from tablib import formats
 from brokerage.spreadsheet_reader import SpreadsheetReader
@@ -6,7 +7,7 @@ from brokerage.validation import _assert_true
 
 from util.dateutils import date_to_datetime
 from util.monthmath import Month
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, StartEndCellDateGetter
 from util.units import unit_registry
 
@@ -16,7 +17,7 @@ class MajorEnergyElectricSheetParser(QuoteParser):
     electricity quotes.
     """
     NAME = ''
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     HEADER_ROW = 20
     QUOTE_START_ROW = 21
@@ -82,7 +83,7 @@ class MajorEnergyElectricSheetParser(QuoteParser):
                 # (this could be done one instead of in a loop)
                 min_vol, max_vol = volume_ranges[col - self.PRICE_START_COL]
                 price = self.reader.get(self.SHEET, row, col, (int, float))
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term_months, valid_from=self._valid_from,
                     valid_until=self._valid_until, min_volume=min_vol,
@@ -97,7 +98,7 @@ class MajorEnergyGasSheetParser(QuoteParser):
     gas quotes.
     """
     NAME = ''
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     HEADER_ROW = 17
     QUOTE_START_ROW = 18
@@ -150,7 +151,7 @@ class MajorEnergyGasSheetParser(QuoteParser):
                     continue
                 _assert_true(isinstance(price, (float, int)))
 
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from,
                     start_until=start_until, term_months=term_months,
                     valid_from=self._valid_from, valid_until=self._valid_until,
@@ -172,7 +173,7 @@ class MajorEnergyMatrixParser(QuoteParser):
     classes that should be eliminated. But it works well enough.
     """
     NAME = 'major'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     # only validation that applies to the entire file goes in this class.
     # beware of hidden sheet that contains similar data
@@ -1,15 +1,16 @@
 import re
 from calendar import weekday
 from datetime import datetime, time, timedelta
+from functools import partial
 
 from pytz import timezone, UTC
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.exceptions import ValidationError
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader
 from brokerage.validation import _assert_true
-from util.dateutils import date_to_datetime, excel_number_to_datetime, excel_datetime_to_number
+from util.dateutils import date_to_datetime, excel_datetime_to_number
 from util.monthmath import Month
 from util.units import unit_registry
 
@@ -18,7 +19,7 @@ class SFEMatrixParser(QuoteParser):
     """Parser for SFE spreadsheet.
     """
     NAME = 'sfe'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     HEADER_ROW = 22
     STATE_COL = 'B'
@@ -29,6 +30,9 @@ class SFEMatrixParser(QuoteParser):
     TERM_COL_RANGE = SpreadsheetReader.column_range('G', 'K')
     ROUNDING_DIGITS = 4
 
+    # some start dates are encoded as numbers instead of dates
+    DATE_COLUMNS = [(0, START_DATE_COL, HEADER_ROW + 1)]
+
     EXPECTED_SHEET_TITLES = [
         'Pricing Worksheet',
     ]
@@ -113,11 +117,7 @@ class SFEMatrixParser(QuoteParser):
                                            basestring)
             _assert_true(service_type in self._SERVICE_NAMES)
             start_from = self.reader.get(0, row, self.START_DATE_COL, object)
-            if isinstance(start_from, datetime):
-                pass
-            elif isinstance(start_from, int):
-                start_from = excel_number_to_datetime(start_from)
-            else:
+            if not isinstance(start_from, datetime):
                 raise ValidationError("start_from has unxpected type: %s %s" % (
                     type( start_from), start_from))
             # some number-encoded start dates are late in the month, but
@@ -192,7 +192,7 @@ class SFEMatrixParser(QuoteParser):
                     raise ValidationError(
                         'Price at (%s, %s) has unexpected type %s: "%s"' % (
                             row, col, type(price), price))
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term, valid_from=valid_from,
                     valid_until=valid_until, min_volume=min_vol,
@@ -1,9 +1,10 @@
 import re
 from datetime import timedelta
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.file_utils import extract_zip
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader
 from util.dateutils import date_to_datetime, parse_datetime
@@ -13,7 +14,7 @@ from util.units import unit_registry
 
 class SourceMatrixParser(QuoteParser):
     NAME = 'source'
-    reader = SpreadsheetReader(formats.csv)
+    reader_factory = partial(SpreadsheetReader, formats.csv)
 
     HEADER_ROW = 1
     VALID_DATE_COL = 'A'
@@ -77,7 +78,7 @@ class SourceMatrixParser(QuoteParser):
                 price = self.reader.get_matches(self.SHEET, row, col,
                                                 r'\s*\$?(.+)\s*', float)
 
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term, valid_from=valid_from,
                     valid_until=valid_from + timedelta(days=1),
@@ -1,8 +1,9 @@
 from datetime import datetime
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
     SimpleCellDateGetter
 from util.dateutils import date_to_datetime
@@ -12,13 +13,13 @@ from util.units import unit_registry
 
 class SparkMatrixParser(QuoteParser):
     NAME = 'spark'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     HEADER_ROW = 7
     RCA_COLS = ['A', 'B', 'C', 'E']
     START_COL = 'F'
     VOLUME_RANGE_COL = 'H'
-    PRICE_COLS = reader.column_range('I', 'M')
+    PRICE_COLS = SpreadsheetReader.column_range('I', 'M')
 
     EXPECTED_SHEET_TITLES = [ 'LED Matrix' ]
     SHEET = 'LED Matrix'
@@ -55,7 +56,7 @@ class SparkMatrixParser(QuoteParser):
                 term = self.reader.get_matches(
                     self.SHEET, self.HEADER_ROW, col, '(\d+) MTHS', int)
                 price = self.reader.get(self.SHEET, row, col, float)
-                yield MatrixQuote(start_from=start_from,
+                yield MatrixQuoteRecord(start_from=start_from,
                     start_until=start_until, term_months=term,
                     valid_from=self._valid_from, valid_until=self._valid_until,
                     min_volume=min_vol, limit_volume=limit_vol,
@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
+from functools import partial
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
     SimpleCellDateGetter
 from util.dateutils import date_to_datetime
@@ -12,7 +13,7 @@ from util.units import unit_registry
 
 class SuezElectricParser(QuoteParser):
     NAME = 'suez'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     ROUNDING_DIGITS = 5
     SHEET_DEFAULT = 'Price Matrix'
@@ -33,19 +34,19 @@ class SuezElectricParser(QuoteParser):
         start_date_str = self.reader.get(self.SHEET_DEFAULT, row,
             self.COL_START_MONTH, basestring)
         term_months = self.reader.get(self.SHEET_DEFAULT, row,
-            self.COL_TERM, int)
+            self._col_term, int)
         volume_range_str = self.reader.get(self.SHEET_DEFAULT,
             self.ROW_LABEL, col, basestring)
         valid_from_str = self.file_name.split('_')[-1].replace('.xlsx', '')
         state_str = self.reader.get(self.SHEET_DEFAULT, row,
             self.COL_STATE, basestring)
-        desc_str = str(self.reader.get(self.SHEET_DEFAULT, row, self.COL_DESC,
+        desc_str = str(self.reader.get(self.SHEET_DEFAULT, row, self._col_desc,
             (int, basestring)))
         utility_str = self.reader.get(self.SHEET_DEFAULT, row,
             self.COL_UTILITY, basestring)
         zone_str = self.reader.get(self.SHEET_DEFAULT, row,
             self.COL_ZONE, basestring) if self.has_zone else ''
-        notes_str = self.reader.get(self.SHEET_DEFAULT, row, self.COL_NOTES,
+        notes_str = self.reader.get(self.SHEET_DEFAULT, row, self._col_notes,
                 basestring) if has_notes else ''
 
         alias_elts = '-'.join([x.strip() for x in
@@ -62,7 +63,7 @@ class SuezElectricParser(QuoteParser):
         valid_until = valid_from + timedelta(days=1)
         has_por = True if 'por' in notes_str.lower() else False
 
-        quote = MatrixQuote(
+        quote = MatrixQuoteRecord(
             start_from=start_from, start_until=start_until,
             term_months=term_months, valid_from=valid_from,
             valid_until=valid_until,
@@ -76,31 +77,37 @@ class SuezElectricParser(QuoteParser):
         return quote
 
     def _extract_quotes(self):
+        # columns after the zone column are shifted if there is a zone
+        # column, so their positions for this file are instance variables
+        self._col_desc = self.COL_DESC
+        self._col_term = self.COL_TERM
+        self._col_notes = self.COL_NOTES
+        col_quote_start = self.COL_QUOTE_START
         if self.reader.get(self.SHEET_DEFAULT, self.ROW_LABEL, self.COL_ZONE,
             basestring).strip() == 'Zone':
-            self.COL_DESC += 1
-            self.COL_TERM += 1
-            self.COL_NOTES += 1
-            self.COL_QUOTE_START += 1
+            self._col_desc += 1
+            self._col_term += 1
+            self._col_notes += 1
+            col_quote_start += 1
             self.has_zone = True
         else:
             self.has_zone = False
        
         # This took me a little while to get right, hence the assertions
         expected_note = self.reader.get(self.SHEET_DEFAULT, self.ROW_LABEL, 
-            self.COL_NOTES, basestring)
+            self._col_notes, basestring)
         has_notes = True
         if 'notes' not in expected_note.strip().lower():
-            self.COL_QUOTE_START -= 1
-            assert self.COL_QUOTE_START == self.COL_NOTES
+            col_quote_start -= 1
+            assert col_quote_start == self._col_notes
             has_notes = False
         else:
-            assert self.COL_QUOTE_START - 1 == self.COL_NOTES
+            assert col_quote_start - 1 == self._col_notes
 
 
         for current_row in xrange(self.ROW_LABEL + 1,
             self.reader.get_height(self.SHEET_DEFAULT)):
-            for current_col in xrange(self.COL_QUOTE_START,
+            for current_col in xrange(col_quote_start,
                 self.reader.get_width(self.SHEET_DEFAULT)):
                 
                 col_hdr = self.reader.get(self.SHEET_DEFAULT, self.ROW_LABEL,
@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta
+from functools import partial
 from itertools import chain
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
-from brokerage.exceptions import ValidationError
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser
-from brokerage.reader import parse_number
+from brokerage.reader import parse_number, NOT_FOUND
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from brokerage.validation import _assert_true, _assert_equal, _assert_match
 from util.dateutils import date_to_datetime
@@ -19,7 +19,7 @@ class USGEElectricMatrixParser(QuoteParser):
     time along the columns.
     """
     NAME = 'usgeelectric'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     TERM_HEADER_ROW = 4
     HEADER_ROW = 5
@@ -78,14 +78,13 @@ class USGEElectricMatrixParser(QuoteParser):
     def _extract_volume_range(self, sheet, row, col):
         below_regex = r'Below ([\d,]+) [kK][wW][hH]'
         normal_regex = r'([\d,]+)-([\d,]+) [kK][wW][hH]'
-        try:
-            low, high = self.reader.get_matches(sheet, row, col, normal_regex,
-                                                (parse_number, parse_number))
-        except ValidationError:
-            high = self.reader.get_matches(sheet, row, col, below_regex,
-                                           parse_number)
-            low = 0
-        return low, high
+        result = self.reader.try_match(sheet, row, col, normal_regex,
+                                       (parse_number, parse_number))
+        if result is not NOT_FOUND:
+            return result
+        high = self.reader.get_matches(sheet, row, col, below_regex,
+                                       parse_number)
+        return 0, high
     # TODO: can't use superclass method here because there's more than one
     # regex to use, with different behavior for each one.
 
@@ -164,7 +163,7 @@ class USGEElectricMatrixParser(QuoteParser):
                         if price is None or price in ('', 'N/A', 'NA'):
                             continue
 
-                        yield MatrixQuote(
+                        yield MatrixQuoteRecord(
                             start_from=start_from, start_until=start_until,
                             term_months=term, valid_from=valid_from,
                             valid_until=valid_until,
@@ -1,12 +1,12 @@
 from datetime import datetime
+from functools import partial
 from itertools import chain
 
 from tablib import formats
 
-from brokerage.model import MatrixQuote
-from brokerage.exceptions import ValidationError
+from brokerage.model import MatrixQuoteRecord
 from brokerage.quote_parser import QuoteParser, SimpleCellDateGetter
-from brokerage.reader import parse_number
+from brokerage.reader import parse_number, NOT_FOUND
 from brokerage.spreadsheet_reader import SpreadsheetReader
 from util.dateutils import date_to_datetime
 from util.monthmath import Month
@@ -17,7 +17,7 @@ class USGEGasMatrixParser(QuoteParser):
     time along the columns.
     """
     NAME = 'usgegas'
-    reader = SpreadsheetReader(formats.xlsx)
+    reader_factory = partial(SpreadsheetReader, formats.xlsx)
 
     FILE_FORMAT = formats.xlsx
 
@@ -60,16 +60,16 @@ class USGEGasMatrixParser(QuoteParser):
     def _extract_volume_range(self, sheet, row, col):
         below_regex = r'Below ([\d,]+) ccf/therms'
         normal_regex = r'([\d,]+) to ([\d,]+) ccf/therms'
-        try:
-            low, high = self.reader.get_matches(sheet, row, col, normal_regex,
-                                                (parse_number, parse_number))
+        result = self.reader.try_match(sheet, row, col, normal_regex,
+                                       (parse_number, parse_number))
+        if result is not NOT_FOUND:
+            low, high = result
             if low > 0 :
                 low -= 1
-        except ValidationError:
-            high = self.reader.get_matches(sheet, row, col, below_regex,
-                                           parse_number)
-            low = 0
-        return low, high
+            return low, high
+        high = self.reader.get_matches(sheet, row, col, below_regex,
+                                       parse_number)
+        return 0, high
     # TODO: can't use superclass method here because there's more than one
     # regex to use, with different behavior for each one.
 
@@ -125,7 +125,7 @@ class USGEGasMatrixParser(QuoteParser):
                         if price is None:
                             continue
 
-                        yield MatrixQuote(
+                        yield MatrixQuoteRecord(
                             start_from=start_from, start_until=start_until,
                             term_months=term, valid_from=self._valid_from,
                             valid_until=self._valid_until,
@@ -1,9 +1,10 @@
 import calendar
 import re
 from datetime import datetime
+from functools import partial
 
 from brokerage.exceptions import ValidationError
-from brokerage.model import MatrixQuote
+from brokerage.model import MatrixQuoteRecord
 from brokerage.pdf_reader import PDFReader
 from brokerage.quote_parser import QuoteParser, StartEndCellDateGetter
 from brokerage.validation import _assert_equal, GAS
@@ -15,7 +16,7 @@ from util.units import unit_registry
 class VolunteerMatrixParser(QuoteParser):
     NAME = 'volunteer'
 
-    reader = PDFReader(tolerance=40)
+    reader_factory = partial(PDFReader, tolerance=40)
 
     # used for validation and setting PDFReader offset to account for varying
     # positions of elements in each file, as well as extracting the volume
@@ -40,6 +41,15 @@ class VolunteerMatrixParser(QuoteParser):
         (1, 422, 70, 'MARKET ULTRA'),
     ]
 
+    # EXPECTED_CELLS depend on the offset set in _after_load, so only look
+    # for text anywhere on the page
+    FINGERPRINT_CELLS = []
+    FINGERPRINT_ANCHORS = [
+        (1, PRICING_LEVEL_PATTERN),
+        (1, 'MARKET ULTRA'),
+        (1, re.compile('.*Indicative Price Offers', re.DOTALL)),
+    ]
+
     START_ROW, START_COL = (539, 521)
     PRICE_ROWS = [487, 455, 422]
     TERM_ROW = 520
@@ -150,7 +160,7 @@ class VolunteerMatrixParser(QuoteParser):
                     1, self.TERM_ROW, term_col, term_regex, int)
                 price = self._reader.get_matches(
                     1, row, price_col, self.PRICE_PATTERN, float, tolerance=20)
-                yield MatrixQuote(
+                yield MatrixQuoteRecord(
                     start_from=start_from, start_until=start_until,
                     term_months=term, valid_from=self._valid_from,
                     valid_until=self._valid_until, min_volume=min_vol,
@@ -0,0 +1,171 @@
+"""Code for inserting only the quotes in a matrix file that are new or
+different from the ones in the previous file of the same supplier and
+format. Suppliers send nearly identical files every day, so most quotes can
+be kept by extending the validity of the rows that are already in the
+database instead of inserting them again.
+"""
+import hashlib
+import json
+import os
+from decimal import Decimal
+
+from brokerage.model import MatrixQuote, expand_column_dict
+
+# names of Rate_Matrix columns that are not part of a quote's identity: a
+# quote that is only different in these is considered unchanged
+IGNORED_COLUMN_NAMES = {
+    MatrixQuote.valid_from.property.columns[0].name,
+    MatrixQuote.valid_until.property.columns[0].name,
+    MatrixQuote.date_received.property.columns[0].name,
+}
+
+
+def _normalize(value):
+    # values read back from the database may have different types than the
+    # ones that were inserted, such as Decimal instead of float for prices,
+    # float instead of int for volumes, or unicode instead of str
+    if isinstance(value, (int, long, float, Decimal)) and \
+            not isinstance(value, bool):
+        # the most digits stored for any column
+        return '%.7f' % value
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def get_digest(quote_dict):
+    """
+    :param quote_dict: dictionary of column values of a quote with a single
+    start month
+    :return: short string that identifies the quote by all of its values
+    except those in IGNORED_COLUMN_NAMES
+    """
+    items = sorted((name, _normalize(value)) for name, value in
+                   quote_dict.iteritems() if name not in IGNORED_COLUMN_NAMES)
+    return hashlib.md5(repr(items)).hexdigest()[:16]
+
+
+class QuoteSnapshot(object):
+    """The quotes from the last file of one supplier and format that was
+    inserted, in compact form: the digest of each quote (see get_digest)
+    and the primary key of the row in Rate_Matrix that contains it.
+    """
+    def __init__(self):
+        # digest -> Rate_Matrix id
+        self._quote_ids = {}
+
+    def __len__(self):
+        return len(self._quote_ids)
+
+    def get_id(self, digest):
+        """:return: Rate_Matrix id of the quote with the given digest, or
+        None if it is not in the snapshot.
+        """
+        return self._quote_ids.get(digest)
+
+    def get_ids(self):
+        """:return: list of Rate_Matrix ids of all quotes in the snapshot
+        """
+        return self._quote_ids.values()
+
+    def add(self, digest, quote_id):
+        self._quote_ids[digest] = quote_id
+
+    def save(self, path):
+        """Write the snapshot to a JSON file (atomically, so a concurrent
+        load never sees a partial file).
+        """
+        temp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(temp_path, 'w') as snapshot_file:
+            json.dump(self._quote_ids, snapshot_file)
+        os.rename(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """:return: QuoteSnapshot read from a file written by 'save', or None
+        if the file does not exist.
+        """
+        try:
+            with open(path) as snapshot_file:
+                quote_ids = json.load(snapshot_file)
+        except IOError:
+            return None
+        snapshot = cls()
+        snapshot._quote_ids = {str(digest): quote_id for digest, quote_id
+                               in quote_ids.iteritems()}
+        return snapshot
+
+
+class IncrementalInserter(object):
+    """Replaces QuoteDAO.insert_quotes for one quote file. Quotes that are
+    in the previous file's QuoteSnapshot are not inserted; instead, the
+    valid_until of their existing rows is set to the new value with one
+    UPDATE statement at the end of the file (see 'finish'). New or changed
+    quotes are inserted as usual.
+    """
+    def __init__(self, quote_dao, old_snapshot):
+        """
+        :param quote_dao: QuoteDAO
+        :param old_snapshot: QuoteSnapshot of the previous file (may be
+        empty). it should be checked with QuoteDAO.count_quotes first,
+        because rows that have been deleted can't be extended.
+        """
+        self._quote_dao = quote_dao
+        self._old_snapshot = old_snapshot
+        self._new_snapshot = QuoteSnapshot()
+        self._max_id = quote_dao.get_max_quote_id()
+
+        # valid_until -> ids of unchanged quotes that will get that value
+        self._unchanged_ids = {}
+
+        # digests and column names of quotes that were inserted, for
+        # finding their ids afterward
+        self._inserted_digests = set()
+        self._column_names = None
+
+        self.inserted_count = 0
+        self.unchanged_count = 0
+
+    def insert_quotes(self, quote_list):
+        """Insert the quotes that are not in the old snapshot.
+        :param quote_list: list of dictionaries of column values, as
+        returned by MatrixQuoteRecord.raw_column_dict
+        """
+        valid_until_name = MatrixQuote.valid_until.property.columns[0].name
+        changed_quotes = []
+        for quote_dict in quote_list:
+            digests = [get_digest(d) for d in expand_column_dict(quote_dict)]
+            ids = [self._old_snapshot.get_id(d) for d in digests]
+            if None in ids:
+                changed_quotes.append(quote_dict)
+                self._inserted_digests.update(digests)
+                self.inserted_count += len(digests)
+                continue
+            self._unchanged_ids.setdefault(
+                quote_dict[valid_until_name], []).extend(ids)
+            for digest, quote_id in zip(digests, ids):
+                self._new_snapshot.add(digest, quote_id)
+            self.unchanged_count += len(digests)
+        if changed_quotes != []:
+            if self._column_names is None:
+                self._column_names = set(expand_column_dict(
+                    changed_quotes[0])[0])
+            self._quote_dao.insert_quotes(changed_quotes)
+
+    def finish(self):
+        """Extend the validity of unchanged quotes, and find the ids of the
+        inserted ones. This must be called in the same transaction as
+        insert_quotes.
+        :return: QuoteSnapshot of all the quotes in the file
+        """
+        for valid_until, ids in self._unchanged_ids.iteritems():
+            self._quote_dao.extend_quotes(ids, valid_until)
+        if self._column_names is not None:
+            # rows inserted by other processes may be included, but they
+            # are ignored unless they are the same as one of these quotes
+            for quote_id, quote_dict in self._quote_dao.get_quotes_after(
+                    self._max_id, self._column_names):
+                digest = get_digest(quote_dict)
+                if digest in self._inserted_digests:
+                    self._new_snapshot.add(digest, quote_id)
+        return self._new_snapshot
@@ -1,10 +1,122 @@
+import json
+import os
 import re
 from abc import ABCMeta
+from collections import Counter
 
 from brokerage.exceptions import ValidationError
 from brokerage.validation import _assert_match
 
 
+class _NotFound(object):
+    """Type of the NOT_FOUND sentinel.
+    """
+    def __repr__(self):
+        return 'NOT_FOUND'
+
+# returned by Reader.try_get and Reader.try_match instead of raising
+# ValidationError, so callers that expect failures (e.g. when searching for
+# a value) don't pay for creating an exception and its message
+NOT_FOUND = _NotFound()
+
+# regular expression strings passed to Reader methods -> compiled patterns,
+# shared by all Readers. the "re" module has its own cache, but looking
+# patterns up in it is slower, and it's cleared whenever it has 100
+# patterns, which a few parsers together can exceed.
+_compiled_patterns = {}
+MAX_COMPILED_PATTERNS = 1000
+
+# "types" argument of get_matches -> tuple of functions for converting the
+# matched strings
+_converters = {}
+
+
+def _compile_regex(regex):
+    """:return: compiled pattern for 'regex', which may be a string or
+    already compiled.
+    """
+    if not isinstance(regex, basestring):
+        return regex
+    pattern = _compiled_patterns.get(regex)
+    if pattern is None:
+        if len(_compiled_patterns) >= MAX_COMPILED_PATTERNS:
+            # the patterns come from parser code, so this only happens if
+            # some of them are generated from file contents
+            _compiled_patterns.clear()
+        pattern = _compiled_patterns[regex] = re.compile(regex)
+    return pattern
+
+
+class ReaderTrace(object):
+    """Record of which parts of a file were read: for each page or sheet,
+    the bounding box of all coordinates that were read from it. Can be saved
+    in a file and used to skip the unused parts of other files with the same
+    format.
+    """
+    def __init__(self):
+        # page or sheet specifier -> [min_y, max_y, min_x, max_x]
+        self._bounds = {}
+
+    def record(self, page_specifier, y, x):
+        bounds = self._bounds.get(page_specifier)
+        if bounds is None:
+            self._bounds[page_specifier] = [y, y, x, x]
+            return
+        if y < bounds[0]:
+            bounds[0] = y
+        elif y > bounds[1]:
+            bounds[1] = y
+        if x < bounds[2]:
+            bounds[2] = x
+        elif x > bounds[3]:
+            bounds[3] = x
+
+    def get_bounds(self, page_specifier):
+        """:return: (min_y, max_y, min_x, max_x) of all coordinates read from
+        the given page or sheet, or None if nothing was read from it.
+        """
+        bounds = self._bounds.get(page_specifier)
+        return None if bounds is None else tuple(bounds)
+
+    def get_page_specifiers(self):
+        """:return: list of all pages or sheets that something was read from
+        """
+        return self._bounds.keys()
+
+    def update(self, other):
+        """Expand the bounds in this trace to include those in 'other'.
+        """
+        for page_specifier, (min_y, max_y, min_x, max_x) in \
+                other._bounds.iteritems():
+            self.record(page_specifier, min_y, min_x)
+            self.record(page_specifier, max_y, max_x)
+
+    def save(self, path):
+        """Write the trace to a JSON file (atomically, so a concurrent load
+        never sees a partial file).
+        """
+        temp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(temp_path, 'w') as trace_file:
+            json.dump([[page_specifier] + bounds for page_specifier, bounds
+                       in self._bounds.iteritems()], trace_file)
+        os.rename(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """:return: ReaderTrace read from a file written by 'save', or None
+        if the file does not exist.
+        """
+        try:
+            with open(path) as trace_file:
+                rows = json.load(trace_file)
+        except IOError:
+            return None
+        trace = cls()
+        for page_specifier, min_y, max_y, min_x, max_x in rows:
+            trace._bounds[page_specifier] = [min_y, max_y, min_x, max_x]
+        return trace
+
+
 def parse_number(string):
     """Convert number string into a number.
     :param string: number string formatted for American humans (with commas)
@@ -26,16 +138,87 @@ class Reader(object):
     def __init__(self):
         self._file_name = None
 
+        # number of calls of each kind ("get", "get_matches", and
+        # "nearest_box" for searches in PDFs), for performance measurement.
+        # QuoteParser resets this when it loads a file.
+        self.call_counts = Counter()
+
+        # ReaderTrace recording everything read from the file, if
+        # start_trace was called
+        self.trace = None
+
+        # ReaderTrace from another file of the same format that subclasses
+        # can use in load_file to skip parts of the file that won't be read.
+        # if anything outside those parts is read, the whole file must be
+        # loaded.
+        self._pruning_trace = None
+
+        # (page specifier, column, first row) of columns that contain dates,
+        # which subclasses can convert all at once when a file is loaded
+        self._date_columns = []
+
+    def start_trace(self):
+        """Start recording the coordinates of everything read from the file
+        in self.trace.
+        """
+        self.trace = ReaderTrace()
+
+    def set_pruning_trace(self, trace):
+        """Set a ReaderTrace that is used to load only the needed parts of
+        files loaded after this is called (if the subclass supports it).
+        :param trace: ReaderTrace or None to load whole files
+        """
+        self._pruning_trace = trace
+
+    def set_date_columns(self, date_columns):
+        """Mark columns that contain dates, so files loaded afterwards have
+        them converted in one step if the subclass supports it (see
+        SpreadsheetReader), rather than one value at a time when they are
+        read.
+        :param date_columns: list of (page specifier, column, first row)
+        tuples; the column contains dates from the first row to the end.
+        """
+        self._date_columns = date_columns
+
     def load_file(self, quote_file):
         """Read from 'quote_file'.
         """
         raise NotImplementedError
 
+    def close(self):
+        """Free all data from the loaded file, so is_loaded returns False.
+        Another file can be loaded afterwards. A Reader can also be used as
+        a context manager that calls this at the end.
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def is_loaded(self):
         """:return: True if file has been loaded, False otherwise.
         """
         raise NotImplementedError
 
+    def load_file_partially(self, quote_file, page_specifiers):
+        """Load only the given pages or sheets of 'quote_file', if that can
+        be done much faster than loading the whole file. This is used to
+        check a few values before deciding to load the whole file.
+        :param page_specifiers: set of pages or sheets that will be read
+        :return: True if the file was loaded, False if the subclass can't do
+        this (and nothing was loaded)
+        """
+        return False
+
+    def sniff_sheet_titles(self, quote_file):
+        """Return titles of all sheets in 'quote_file' without loading it,
+        or None if the subclass can't do this.
+        """
+        return None
+
     def get(self, page_specifier, y, x, the_type):
         """Return a value extracted from the file at the given coordinates,
         and expect the given type (e.g. int, float, basestring, datetime).
@@ -49,6 +232,23 @@ class Reader(object):
         """
         raise NotImplementedError
 
+    def try_get(self, page_specifier, y, x, the_type):
+        """Same as get, but return NOT_FOUND instead of raising
+        ValidationError if the value does not exist or has the wrong type.
+        """
+        raise NotImplementedError
+
+    def try_match(self, page_specifier, y, x, regex, types):
+        """Same as get_matches, but return NOT_FOUND instead of raising
+        ValidationError if there is no value, it doesn't match, or it can't
+        be converted.
+        """
+        self.call_counts['get_matches'] += 1
+        text = self.try_get(page_specifier, y, x, basestring)
+        if text is NOT_FOUND:
+            return NOT_FOUND
+        return self._try_convert_text(regex, text, types)
+
     def get_matches(self, page_specifier, y, x, regex, types):
         """Get list of values extracted from the file cell at the given
         coordinates, using groups (parentheses) in a regular expression. Values
@@ -72,31 +272,72 @@ class Reader(object):
         >>> self.get_matches(1, 2, '(\d+/\d+/\d+)', parse_date)
         >>> self.get_matches(3, 4, r'(\d+) ([A-Za-z])', (int, str))
         """
+        self.call_counts['get_matches'] += 1
         text = self.get(page_specifier, y, x, basestring)
         return self._validate_and_convert_text(regex, text, types)
 
+    @staticmethod
+    def _get_converters(types):
+        """Return tuple of callables for converting matched strings, given the
+        'types' argument of get_matches.
+        """
+        key = tuple(types) if isinstance(types, list) else types
+        converters = _converters.get(key)
+        if converters is None:
+            if not isinstance(types, (list, tuple)):
+                types = [types]
+            # substitute 'parse_number' function for regular int/float
+            converters = _converters[key] = tuple(
+                parse_number if t in (int, float) else t for t in types)
+        return converters
+
     def _validate_and_convert_text(self, regex, text, types):
         """Helper method for get_matches. Subclasses can use this by itself
         if they override get_matches to get the text in a different way.
         """
-        if not isinstance(types, (list, tuple)):
-            types = [types]
-        # substitute 'parse_number' function for regular int/float
-        types = [{int: parse_number, float: parse_number}.get(t, t)
-                 for t in types]
-        _assert_match(regex, text)
-        m = re.match(regex, text)
-        if len(m.groups()) != len(types):
-            raise ValidationError
+        result = self._try_convert_text(regex, text, types)
+        if result is NOT_FOUND:
+            # the error message is only created when there is an error
+            self._raise_conversion_error(regex, text, types)
+        return result
+
+    def _try_convert_text(self, regex, text, types):
+        """Helper method for try_match: same as _validate_and_convert_text
+        but return NOT_FOUND instead of raising ValidationError.
+        """
+        types = self._get_converters(types)
+        m = _compile_regex(regex).match(text)
+        if m is None:
+            return NOT_FOUND
+        groups = m.groups()
+        if len(groups) != len(types):
+            return NOT_FOUND
         results = []
-        for group, the_type in zip(m.groups(), types):
+        for group, the_type in zip(groups, types):
             try:
                 value = the_type(group)
             except ValueError:
-                raise ValidationError('String "%s" couldn\'t be converted to '
-                                      'type %s' % (group, the_type))
+                return NOT_FOUND
             results.append(value)
         if len(results) == 1:
             return results[0]
         return results
 
+    def _raise_conversion_error(self, regex, text, types):
+        """Raise ValidationError explaining why _try_convert_text failed for
+        the given arguments (with the same messages that
+        _validate_and_convert_text always had).
+        """
+        types = self._get_converters(types)
+        _assert_match(regex, text)
+        m = _compile_regex(regex).match(text)
+        if len(m.groups()) != len(types):
+            raise ValidationError
+        # the first group that can't be converted is reported
+        for group, the_type in zip(m.groups(), types):
+            try:
+                the_type(group)
+            except ValueError:
+                break
+        raise ValidationError('String "%s" couldn\'t be converted to '
+                              'type %s' % (group, the_type))
@@ -1,9 +1,16 @@
 """Code related to getting quotes out of Excel spreadsheets.
 """
+from cStringIO import StringIO
+from xml.etree import ElementTree
+from zipfile import ZipFile
+
 from tablib import formats, Databook, Dataset
+import xlrd
 
 from brokerage.exceptions import MatrixError, ValidationError
-from brokerage.reader import Reader
+from brokerage.reader import Reader, NOT_FOUND
+from util.dateutils import excel_numbers_to_datetimes
+from util.file_utils import AttachmentFile, get_content
 
 
 class SpreadsheetReader(Reader):
@@ -11,6 +18,13 @@ class SpreadsheetReader(Reader):
     """
     LETTERS = ''.join(chr(ord('A') + i) for i in xrange(26))
 
+    # when a file is loaded using a pruning trace, this many rows and columns
+    # beyond the traced region of each sheet are kept
+    PRUNING_MARGIN = 10
+
+    # XML namespace of the list of sheets in an xlsx file's "workbook.xml"
+    XLSX_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
     @classmethod
     def column_range(cls, start, stop, step=1, inclusive=True):
         """Return a list of column numbers numbers between the given column
@@ -62,12 +76,13 @@ class SpreadsheetReader(Reader):
         :return: tablib.Databook
         """
         # tablib's "xls" format takes the file contents as a string as its
-        # argument, but "xlsx" and others take a file object
+        # argument (which xlrd also accepts as an mmap), but "xlsx" and
+        # others take a file object
         result = Databook()
         if file_format in [formats.xlsx]:
             file_format.import_book(result, quote_file)
         elif file_format in [formats.xls]:
-            file_format.import_book(result, quote_file.read())
+            file_format.import_book(result, get_content(quote_file))
         elif file_format in [formats.csv]:
             # TODO: this only works on one sheet. how to handle multiple sheets?
             dataset = Dataset()
@@ -89,6 +104,16 @@ class SpreadsheetReader(Reader):
         # respectively
         self._databook = None
 
+        # when the file was loaded with a pruning trace: file for loading
+        # the whole file later, sheet title -> (height, width) of
+        # the full sheet (None if the sheet was not decoded), and sheet
+        # title -> (last row number, last column index) that was kept, with
+        # None meaning all, or None instead of the tuple if the sheet was
+        # dropped
+        self._full_file = None
+        self._full_dimensions = None
+        self._pruned_limits = None
+
     def _get_sheet(self, sheet_number_or_title):
         """
         :param sheet_number_or_title: 0-based index (int) or title (string)
@@ -106,16 +131,178 @@ class SpreadsheetReader(Reader):
     def load_file(self, quote_file):
         """Read from 'quote_file'. May be very slow and take a huge amount of
         memory.
+
+        If there is a pruning trace and the file is an xls file, only the
+        parts of the sheets within the trace are decoded (see
+        _load_pruned). Other formats are always loaded completely, because
+        tablib can only decode them all at once.
         :param quote_file: file to read from.
         """
-        self._databook = self.get_databook_from_file(quote_file,
+        self._full_file = None
+        self._full_dimensions = None
+        self._pruned_limits = None
+        if self._pruning_trace is None or \
+                self._file_format is not formats.xls:
+            self._databook = self.get_databook_from_file(quote_file,
+                                                         self._file_format)
+            self._convert_date_columns()
+            return
+
+        # keep the file so the whole file can be loaded again if needed. an
+        # AttachmentFile stays open while the file is being read, so it can
+        # be used itself. for any other file, the string that xlrd reads is
+        # wrapped in a StringIO, which does not copy it.
+        content = get_content(quote_file)
+        if isinstance(quote_file, AttachmentFile):
+            self._full_file = quote_file
+        else:
+            self._full_file = StringIO(content)
+        self._load_pruned(content)
+        self._convert_date_columns()
+
+    def _convert_date_columns(self):
+        """Replace all numbers in the columns given to set_date_columns with
+        datetimes, treating them as Excel date numbers (which is how some
+        formats, like xls, represent dates). Other values are not changed.
+        """
+        for sheet_number_or_title, col, first_row in self._date_columns:
+            try:
+                sheet = self._get_sheet(sheet_number_or_title)
+            except (IndexError, ValueError):
+                # missing sheets are reported by validation
+                continue
+            x = self.col_letter_to_index(col)
+            first_index = max(self._row_number_to_index(first_row), 0)
+            rows = []
+            for i in xrange(first_index, sheet.height):
+                row = sheet[i]
+                if x < len(row) and isinstance(
+                        row[x], (int, long, float)) and \
+                        not isinstance(row[x], bool):
+                    rows.append((i, list(row)))
+            dates = excel_numbers_to_datetimes([row[x] for _, row in rows])
+            # tablib has no way to modify a cell, so each row that contains
+            # a date is replaced
+            for (i, row), date in zip(rows, dates):
+                row[x] = date
+                sheet[i] = row
+
+    def _load_pruned(self, content):
+        """Load a Databook that contains only the parts of each sheet of an
+        xls file within the pruning trace plus PRUNING_MARGIN, using xlrd
+        directly so sheets that are not in the trace are never decoded, and
+        rows and columns outside it are never converted.
+        Sheets are never removed (so sheet numbers stay the same), only
+        emptied. Rows and columns are only removed after the end of the
+        traced region, so coordinates stay the same; if negative coordinates
+        were read (which count backwards from the end) they are not removed
+        at all.
+        :param content: content of the file (string or mmap)
+        """
+        self._full_dimensions, self._pruned_limits = {}, {}
+        self._databook = Databook()
+        book = xlrd.open_workbook(file_contents=content, on_demand=True)
+        try:
+            for index, title in enumerate(book.sheet_names()):
+                dataset = Dataset()
+                dataset.title = title
+                self._databook.add_sheet(dataset)
+                bounds = self._pruning_trace.get_bounds(title)
+                if bounds is None:
+                    self._full_dimensions[title] = None
+                    self._pruned_limits[title] = None
+                    continue
+                min_row, max_row, min_col, max_col = bounds
+                row_limit = None if min_row < 1 else \
+                    max_row + self.PRUNING_MARGIN
+                col_limit = None if min_col < 0 else \
+                    max_col + self.PRUNING_MARGIN
+                self._pruned_limits[title] = (row_limit, col_limit)
+                sheet = book.sheet_by_index(index)
+                self._full_dimensions[title] = (sheet.nrows, sheet.ncols)
+                row_end = sheet.nrows if row_limit is None else min(
+                    row_limit, sheet.nrows)
+                col_end = sheet.ncols if col_limit is None else min(
+                    col_limit + 1, sheet.ncols)
+                # the first row is the "header", like in tablib's xls import
+                for i in xrange(row_end):
+                    values = sheet.row_values(i, 0, col_end)
+                    if i == 0:
+                        dataset.headers = values
+                    else:
+                        dataset.append(values)
+                book.unload_sheet(index)
+        finally:
+            book.release_resources()
+
+    def _get_full_dimensions(self, sheet):
+        """:return: (height, width) of the whole sheet, loading the whole
+        file if that sheet was not decoded
+        """
+        dimensions = self._full_dimensions[sheet.title]
+        if dimensions is None:
+            self._load_full()
+            sheet = self._get_sheet(sheet.title)
+            return sheet.height + 1, sheet.width
+        return dimensions
+
+    def _is_in_pruned_region(self, sheet_title, row, x):
+        limits = self._pruned_limits[sheet_title]
+        if limits is None:
+            return False
+        row_limit, col_limit = limits
+        return (row_limit is None or 1 <= row <= row_limit) and (
+            col_limit is None or 0 <= x <= col_limit)
+
+    def close(self):
+        self._databook = None
+        self._full_file = None
+        self._full_dimensions = None
+        self._pruned_limits = None
+
+    def _load_full(self):
+        """Replace the pruned Databook with the whole file.
+        """
+        self.call_counts['full_load'] += 1
+        self._full_file.seek(0)
+        self._databook = self.get_databook_from_file(self._full_file,
                                                      self._file_format)
+        self._convert_date_columns()
+        self._full_file = None
+        self._full_dimensions = None
+        self._pruned_limits = None
 
     def is_loaded(self):
         """:return: True if file has been loaded, False otherwise.
         """
         return self._databook is not None
 
+    def load_file_partially(self, quote_file, page_specifiers):
+        # CSV files are small and have only one sheet, so they are loaded
+        # completely. other formats can't be loaded one sheet at a time.
+        if self._file_format is not formats.csv:
+            return False
+        self.load_file(quote_file)
+        return True
+
+    def sniff_sheet_titles(self, quote_file):
+        # the titles are in a small part of the file, separate from the
+        # sheets' contents
+        if self._file_format is formats.xlsx:
+            with ZipFile(quote_file) as zip_file:
+                workbook = ElementTree.fromstring(
+                    zip_file.read('xl/workbook.xml'))
+            return [sheet.get('name') for sheet in
+                    workbook.iter('{%s}sheet' % self.XLSX_NAMESPACE)]
+        if self._file_format is formats.xls:
+            book = xlrd.open_workbook(file_contents=get_content(quote_file),
+                                      on_demand=True)
+            try:
+                return book.sheet_names()
+            finally:
+                book.release_resources()
+        return None
+
     def get_sheet_titles(self):
         """:return: list of titles of all sheets (strings)
         """
@@ -127,8 +314,11 @@ class SpreadsheetReader(Reader):
         of the sheet to use
         :return: int
         """
+        sheet = self._get_sheet(sheet_number_or_title)
+        if self._full_dimensions is not None:
+            return self._get_full_dimensions(sheet)[0]
         # tablib does not count the "header" as a row
-        return self._get_sheet(sheet_number_or_title).height + 1
+        return sheet.height + 1
 
     def get_width(self, sheet_number_or_title):
         """Return the number of columns in the given sheet.
@@ -136,7 +326,10 @@ class SpreadsheetReader(Reader):
         of the sheet to use
         :return: int
         """
-        return self._get_sheet(sheet_number_or_title).width
+        sheet = self._get_sheet(sheet_number_or_title)
+        if self._full_dimensions is not None:
+            return self._get_full_dimensions(sheet)[1]
+        return sheet.width
 
     def _get_cell(self, sheet, x, y):
         if y == -1:
@@ -144,6 +337,28 @@ class SpreadsheetReader(Reader):
             return sheet.headers[x]
         return sheet[y][x]
 
+    def try_get(self, sheet_number_or_title, row, col, the_type):
+        """Same as get, but return NOT_FOUND instead of raising
+        ValidationError if the cell does not exist or has the wrong type.
+        """
+        self.call_counts['get'] += 1
+        sheet = self._get_sheet(sheet_number_or_title)
+        y = self._row_number_to_index(row)
+        x = col if isinstance(col, int) else self.col_letter_to_index(col)
+        if self.trace is not None:
+            self.trace.record(sheet.title, row, x)
+        if self._pruned_limits is not None and not self._is_in_pruned_region(
+                sheet.title, row, x):
+            self._load_full()
+            sheet = self._get_sheet(sheet_number_or_title)
+        try:
+            value = self._get_cell(sheet, x, y)
+        except IndexError:
+            return NOT_FOUND
+        if not isinstance(value, the_type):
+            return NOT_FOUND
+        return value
+
     def get(self, sheet_number_or_title, row, col, the_type):
         """Return a value extracted from the cell of the given sheet at (row,
         col), and expect the given type (e.g. int, float, basestring, datetime).
@@ -154,6 +369,17 @@ class SpreadsheetReader(Reader):
         :param col: column index (int) or letter (string)
         :param the_type: expected type of the cell contents
         """
+        value = self.try_get(sheet_number_or_title, row, col, the_type)
+        if value is NOT_FOUND:
+            # the error message (which is slow to create) is only created
+            # when there is an error
+            self._raise_get_error(sheet_number_or_title, row, col, the_type)
+        return value
+
+    def _raise_get_error(self, sheet_number_or_title, row, col, the_type):
+        """Raise ValidationError explaining why try_get failed for the given
+        arguments.
+        """
         sheet = self._get_sheet(sheet_number_or_title)
         y = self._row_number_to_index(row)
         x = col if isinstance(col, int) else self.col_letter_to_index(col)
@@ -174,13 +400,8 @@ class SpreadsheetReader(Reader):
                 result += '%s: %s ' % (direction, nvalue)
             return result
 
-        if not isinstance(value, the_type):
-            message = ('At (%s, %s, %s), expected type %s, found "%s" with '
-                       'type %s. neighbors are %s') % (
-                sheet_number_or_title, row, col, the_type, value, type(value),
-                get_neighbor_str())
-            raise ValidationError(message)
-        return value
-
-
-
+        message = ('At (%s, %s, %s), expected type %s, found "%s" with '
+                   'type %s. neighbors are %s') % (
+            sheet_number_or_title, row, col, the_type, value, type(value),
+            get_neighbor_str())
+        raise ValidationError(message)
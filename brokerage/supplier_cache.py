@@ -0,0 +1,106 @@
+"""Code for remembering which supplier each matrix email recipient address
+belongs to, so the main and Altitude databases are not queried for every
+email.
+"""
+import time
+
+from sqlalchemy import event
+
+from brokerage.format_matcher import copy_unattached, format_matcher_cache
+from brokerage.model import Company, Supplier
+
+
+class SupplierCache(object):
+    """Keeps the Supplier and the id of the Altitude Company for each email
+    recipient address, for up to 'ttl' seconds. The Suppliers are copies
+    that are not in any session, so using them never causes a database
+    query; their MatrixFormats come from format_matcher_cache.
+
+    All entries are discarded whenever a Supplier or Company is changed,
+    inserted or deleted through the ORM (see the event listeners below), and
+    a supplier's entries are discarded when its MatrixFormats change (which
+    is detected through format_matcher_cache). Changes made some other way,
+    such as by another process, are only seen when the entries expire
+    (which also reloads the supplier's formats) or after an explicit call
+    to 'invalidate'.
+    """
+    # time in seconds that entries are kept by default
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        """
+        :param ttl: time in seconds that each entry is kept
+        """
+        self.ttl = ttl
+
+        # recipient address -> (Supplier, company id, expiration time)
+        self._entries = {}
+
+    def get(self, recipient, now=None):
+        """
+        :param recipient: email recipient address
+        :param now: current time as returned by time.time() (for testing)
+        :return: (Supplier, company id) tuple for the recipient, or None if
+        it is not cached
+        """
+        if now is None:
+            now = time.time()
+        entry = self._entries.get(recipient)
+        if entry is None:
+            return None
+        supplier, company_id, expiration = entry
+        if now >= expiration:
+            # the formats may also have been changed by another process
+            format_matcher_cache.invalidate(supplier.id)
+            del self._entries[recipient]
+            return None
+        if not format_matcher_cache.has_matcher(supplier.id):
+            del self._entries[recipient]
+            return None
+        return supplier, company_id
+
+    def add(self, recipient, supplier, company_id, now=None):
+        """Cache the supplier for a recipient address. This also loads its
+        MatrixFormats into format_matcher_cache.
+        :param recipient: email recipient address
+        :param supplier: brokerage.model.Supplier that is in the database
+        :param company_id: id of the supplier's Company in the Altitude
+        database, or None
+        :param now: current time as returned by time.time() (for testing)
+        :return: the cached copy of 'supplier'
+        """
+        if now is None:
+            now = time.time()
+        format_matcher_cache.get_matcher(supplier, now=now)
+        copy = copy_unattached(supplier)
+        self._entries[recipient] = (copy, company_id, now + self.ttl)
+        return copy
+
+    def invalidate(self, recipient=None):
+        """Discard the entry for the given recipient address, or all entries
+        if 'recipient' is None.
+        """
+        if recipient is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(recipient, None)
+
+
+supplier_cache = SupplierCache()
+
+
+@event.listens_for(Supplier, 'after_insert')
+@event.listens_for(Supplier, 'after_update')
+@event.listens_for(Supplier, 'after_delete')
+@event.listens_for(Company, 'after_insert')
+@event.listens_for(Company, 'after_update')
+@event.listens_for(Company, 'after_delete')
+def _supplier_flushed(mapper, connection, target):
+    supplier_cache.invalidate()
+
+
+@event.listens_for(Supplier.matrix_email_recipient, 'set')
+@event.listens_for(Supplier.name, 'set')
+@event.listens_for(Company.name, 'set')
+def _supplier_attribute_set(target, value, oldvalue, initiator):
+    supplier_cache.invalidate()
@@ -8,6 +8,8 @@ import re
 from abc import ABCMeta
 from datetime import datetime
 
+import numpy as np
+
 from brokerage.exceptions import ValidationError
 
 
@@ -26,6 +28,12 @@ def _assert_match(regex, string):
         raise ValidationError('No match for "%s" in "%s"' % (regex, string))
 
 
+def _get_last_start_from(quote):
+    # a MatrixQuoteRecord may stand for quotes with several start months,
+    # whose start_from values are all between the first and the last one
+    return getattr(quote, 'last_start_from', quote.start_from)
+
+
 class MatrixQuoteValidator(object):
     """Checks MatrixQuotes for any obviously-wrong values, to prevent bad
     quotes from being stored.
@@ -49,72 +57,162 @@ class MatrixQuoteValidator(object):
     MIN_PRICE = 0
     MAX_PRICE = None
 
+    # validators have no state, so one shared instance of each class is
+    # enough. filled in by get_instance.
+    _instances = {}
+
     @classmethod
     def get_instance(cls, service_type):
         """Return an instance of MatrixQuoteValidator with a concrete class
         chosen according to service_type.
         :param service_type: string: or "electric" or "gas"
         """
-        return {
-            ELECTRIC: ElectricValidator,
-            GAS: GasValidator,
-        }[service_type]()
+        try:
+            return MatrixQuoteValidator._instances[service_type]
+        except KeyError:
+            instance = {
+                ELECTRIC: ElectricValidator,
+                GAS: GasValidator,
+            }[service_type]()
+            MatrixQuoteValidator._instances[service_type] = instance
+            return instance
+
+    @classmethod
+    def validate_batch(cls, quotes):
+        """Check a whole list of quotes at once, which is much faster than
+        calling validate on each one. The checks are done with array
+        comparisons over columns of values, so error messages are only
+        created for quotes that are actually invalid. Raise ValidationError
+        for the first invalid quote, with the same message that validate
+        would have given for that quote.
+        :param quotes: list of MatrixQuoteRecords or MatrixQuotes (may have
+        different service types)
+        """
+        if len(quotes) == 0:
+            return
+        rows_for_service_types = {}
+        for i, quote in enumerate(quotes):
+            rows_for_service_types.setdefault(quote.service_type, []).append(i)
+        invalid = np.zeros(len(quotes), dtype=bool)
+        for service_type, rows in rows_for_service_types.iteritems():
+            validator = cls.get_instance(service_type)
+            invalid[rows] = validator._get_invalid_rows(
+                [quotes[i] for i in rows])
+        for i in np.flatnonzero(invalid):
+            # this raises ValidationError with the usual message
+            cls.get_instance(quotes[i].service_type).validate(quotes[i])
+
+    def _get_invalid_rows(self, quotes):
+        """
+        :param quotes: list of quotes, all of which have the service type of
+        this validator
+        :return: numpy array of booleans: True for each quote that has at
+        least one wrong value
+        """
+        def column(name, dtype):
+            return np.array([getattr(q, name) for q in quotes], dtype=dtype)
+
+        def volume_column(name):
+            # None (no limit) becomes NaN, which is never checked
+            return np.array([np.nan if getattr(q, name) is None else
+                             getattr(q, name) for q in quotes], dtype=float)
+
+        start_from = column('start_from', 'datetime64[us]')
+        last_start_from = np.array(
+            [_get_last_start_from(q) for q in quotes], dtype='datetime64[us]')
+        start_until = column('start_until', 'datetime64[us]')
+        valid_from = column('valid_from', 'datetime64[us]')
+        valid_until = column('valid_until', 'datetime64[us]')
+        term_months = column('term_months', float)
+        price = column('price', float)
+        min_volume = volume_column('min_volume')
+        limit_volume = volume_column('limit_volume')
+
+        valid = (start_from < start_until) & \
+                (start_from >= np.datetime64(self.MIN_START_FROM)) & \
+                (last_start_from <= np.datetime64(self.MAX_START_FROM)) & \
+                (term_months >= self.MIN_TERM_MONTHS) & \
+                (term_months <= self.MAX_TERM_MONTHS) & \
+                (valid_from < valid_until) & \
+                (price >= self.MIN_PRICE) & (price <= self.MAX_PRICE)
+
+        # comparisons with NaN are always False, so missing volumes must be
+        # excluded explicitly
+        has_min, has_limit = ~np.isnan(min_volume), ~np.isnan(limit_volume)
+        difference = limit_volume - min_volume
+        valid &= ~has_min | ((min_volume >= self.MIN_MIN_VOLUME) &
+                             (min_volume <= self.MAX_MIN_VOLUME))
+        valid &= ~has_limit | ((limit_volume >= self.MIN_LIMIT_VOLUME) &
+                               (limit_volume <= self.MAX_LIMIT_VOLUME))
+        valid &= ~(has_min & has_limit) | (
+            (difference >= self.MIN_VOLUME_DIFFERENCE) &
+            (difference <= self.MAX_VOLUME_DIFFERENCE))
+        return ~valid
 
     def validate(self, quote):
         """Raise ValidationError if there are any wrong values in the given
         quote.
-        :param quote: MatrixQuote
+        :param quote: MatrixQuote or MatrixQuoteRecord
         """
-        conditions = {
-            quote.start_from < quote.start_until: 'start_from >= start_until',
-            quote.start_from >= self.MIN_START_FROM and quote.start_from <=
-                                                        self.MAX_START_FROM:
-                'start_from too early: %s' % quote.start_from,
-            quote.term_months >= self.MIN_TERM_MONTHS and quote.term_months <=
-                                                          self.MAX_TERM_MONTHS:
-                'Expected term_months between %s and %s, found %s' % (
-                    self.MIN_TERM_MONTHS, self.MAX_TERM_MONTHS,
-                    quote.term_months),
-            quote.valid_from < quote.valid_until:
-                'valid_from %s >= valid_until %s' % (quote.valid_from,
-                                                     quote.valid_until),
-            quote.price >= self.MIN_PRICE and quote.price <= self.MAX_PRICE:
-                'Expected price between %s and %s, found %s' % (
-                    self.MIN_PRICE, self.MAX_PRICE, quote.price)
-        }
-        all_errors = [error_message for value, error_message in
-                      conditions.iteritems() if not value]
-        if all_errors != []:
-            raise ValidationError('. '.join(all_errors))
-
-        # volume-range validation
+        # each condition is paired with a function that makes its error
+        # message, so a message is only formatted for the first condition
+        # that fails, which is the only one reported
+        conditions = [
+            (quote.start_from < quote.start_until,
+             lambda: 'start_from >= start_until'),
+            (self.MIN_START_FROM <= quote.start_from and
+             _get_last_start_from(quote) <= self.MAX_START_FROM,
+             lambda: 'start_from too early: %s' % quote.start_from),
+            (self.MIN_TERM_MONTHS <= quote.term_months <= self.MAX_TERM_MONTHS,
+             lambda: 'Expected term_months between %s and %s, found %s' % (
+                 self.MIN_TERM_MONTHS, self.MAX_TERM_MONTHS,
+                 quote.term_months)),
+            (quote.valid_from < quote.valid_until,
+             lambda: 'valid_from %s >= valid_until %s' % (
+                 quote.valid_from, quote.valid_until)),
+            (self.MIN_PRICE <= quote.price <= self.MAX_PRICE,
+             lambda: 'Expected price between %s and %s, found %s' % (
+                 self.MIN_PRICE, self.MAX_PRICE, quote.price)),
+        ]
+        for value, make_message in conditions:
+            if not value:
+                raise ValidationError(make_message())
+
+        # volume-range validation: only the first failure is reported
         # TODO: combine this code with above
-        try:
-            if quote.min_volume is not None:
-                assert quote.min_volume >= self.MIN_MIN_VOLUME, (
-                    'min_volume below %s: %s' % (
-                        self.MIN_MIN_VOLUME, quote.min_volume))
-                assert quote.min_volume <= self.MAX_MIN_VOLUME, (
-                    'min_volume above %s: %s' % (
-                        self.MAX_MIN_VOLUME, quote.min_volume))
-            if quote.limit_volume is not None:
-                assert quote.limit_volume >= self.MIN_LIMIT_VOLUME, (
-                    'limit_volume below %s: %s' % (
-                        self.MIN_LIMIT_VOLUME, quote.limit_volume))
-                assert quote.limit_volume <= self.MAX_LIMIT_VOLUME, (
-                    'limit_volume above %s: %s' % (
-                        self.MAX_LIMIT_VOLUME, quote.limit_volume))
-            if None not in (quote.min_volume, quote.limit_volume):
-                difference = quote.limit_volume - quote.min_volume
-                assert (difference >= self.MIN_VOLUME_DIFFERENCE), (
-                    'volume range difference < %s: %s' %
-                    (self.MIN_VOLUME_DIFFERENCE, difference))
-                assert (quote.limit_volume - quote.min_volume <=
-                        self.MAX_VOLUME_DIFFERENCE), (
-                    'volume range difference > %s: %s' % (
-                        self.MAX_VOLUME_DIFFERENCE, difference))
-        except AssertionError as e:
-            raise ValidationError(' '.join([quote.service_type, e.message]))
+        volume_conditions = []
+        if quote.min_volume is not None:
+            volume_conditions.extend([
+                (quote.min_volume >= self.MIN_MIN_VOLUME,
+                 lambda: 'min_volume below %s: %s' % (
+                     self.MIN_MIN_VOLUME, quote.min_volume)),
+                (quote.min_volume <= self.MAX_MIN_VOLUME,
+                 lambda: 'min_volume above %s: %s' % (
+                     self.MAX_MIN_VOLUME, quote.min_volume)),
+            ])
+        if quote.limit_volume is not None:
+            volume_conditions.extend([
+                (quote.limit_volume >= self.MIN_LIMIT_VOLUME,
+                 lambda: 'limit_volume below %s: %s' % (
+                     self.MIN_LIMIT_VOLUME, quote.limit_volume)),
+                (quote.limit_volume <= self.MAX_LIMIT_VOLUME,
+                 lambda: 'limit_volume above %s: %s' % (
+                     self.MAX_LIMIT_VOLUME, quote.limit_volume)),
+            ])
+        if None not in (quote.min_volume, quote.limit_volume):
+            difference = quote.limit_volume - quote.min_volume
+            volume_conditions.extend([
+                (difference >= self.MIN_VOLUME_DIFFERENCE,
+                 lambda: 'volume range difference < %s: %s' % (
+                     self.MIN_VOLUME_DIFFERENCE, difference)),
+                (difference <= self.MAX_VOLUME_DIFFERENCE,
+                 lambda: 'volume range difference > %s: %s' % (
+                     self.MAX_VOLUME_DIFFERENCE, difference)),
+            ])
+        for value, make_message in volume_conditions:
+            if not value:
+                raise ValidationError(
+                    ' '.join([quote.service_type, make_message()]))
 
 
 class ElectricValidator(MatrixQuoteValidator):
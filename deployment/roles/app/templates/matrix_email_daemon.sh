@@ -0,0 +1,54 @@
+#!/bin/sh
+#
+# chkconfig: - 87 13
+# description: processes matrix quote emails saved by receive_matrix_email.sh
+#
+### BEGIN INIT INFO
+# Provides: matrix_email_daemon
+# Required-Start: $local_fs $remote_fs $network
+# Required-Stop: $local_fs $remote_fs $network
+# Default-Start: 3
+# Default-Stop: 0 1 2 4 5 6
+# Short-Description: start and stop the matrix email daemon
+### END INIT INFO
+
+APP_ROOT=/home/{{ app_user }}/{{ deploy_dir }}
+pidfile=/home/{{ app_user }}/matrix_email_daemon.pid
+logfile=/home/{{ app_user }}/logs/matrix_email_daemon.log
+
+start() {
+    echo "Starting matrix email daemon"
+    su {{ app_user }} -c "cd $APP_ROOT && \
+        . /home/{{ app_user }}/{{ virtualenv }}/bin/activate && \
+        (nohup python bin/matrix_email_daemon.py >> $logfile 2>&1 &
+         echo \$! > $pidfile)"
+}
+
+stop() {
+    [ -f $pidfile ] || return 0
+    echo "Stopping matrix email daemon"
+    pid=$(cat $pidfile)
+    # the daemon finishes the emails it has already started before exiting,
+    # so this waits for it (otherwise a new daemon would process them again)
+    kill -TERM $pid 2>/dev/null
+    while kill -0 $pid 2>/dev/null; do
+        sleep 1
+    done
+    rm -f $pidfile
+}
+
+case "$1" in
+    start)
+        start
+        ;;
+    stop)
+        stop
+        ;;
+    restart)
+        stop
+        start
+        ;;
+    *)
+        echo "Usage: $0 {start|stop|restart}"
+        exit 2
+esac
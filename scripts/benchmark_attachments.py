@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""Memory benchmark for the handling of email attachments, before a quote
+file is parsed: decoding the email, uploading the attachment, giving it to
+a file converter, and getting its content as a string (as xlrd needs it).
+Compares the old way (email.message_from_file, with a copy of the content
+for each step) with read_email and AttachmentFile, using the largest
+example quote files.
+
+Memory is measured as the increase in peak resident memory of a process
+that does one email. Pages of an mmap'd file that have been read count
+toward this, even though they are not copies.
+"""
+import email
+import hashlib
+import os
+import resource
+from cStringIO import StringIO
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from multiprocessing import Process, Queue
+from shutil import rmtree
+from tempfile import mkdtemp, NamedTemporaryFile
+
+import click
+
+from brokerage import ROOT_PATH
+from brokerage.file_utils import Converter
+from brokerage.quote_file_uploader import QuoteFileUploader
+from util.email_util import get_attachments, read_email, \
+    MAX_ATTACHMENT_MEMORY
+from util.file_utils import get_content
+from util.shell import shell_quote
+
+QUOTE_FILE_DIR = os.path.join(ROOT_PATH, 'test', 'quote_files')
+
+
+class NullKey(object):
+    """Stands in for a boto Key and MultiPartUpload, reading the file
+    instead of sending it.
+    """
+    def set_contents_from_file(self, f):
+        for _ in iter(lambda: f.read(8192), ''):
+            pass
+
+    def upload_part_from_file(self, f, part_number, size):
+        f.read(size)
+
+    def complete_upload(self):
+        pass
+
+
+class NullBucket(object):
+    def new_key(self, name):
+        return NullKey()
+
+    def initiate_multipart_upload(self, name):
+        return NullKey()
+
+
+class NullConnection(object):
+    def get_bucket(self, name):
+        return NullBucket()
+
+
+class CopyConverter(Converter):
+    """Converter that only copies the file, so no other program is needed.
+    """
+    def get_converted_file_path(self, temp_file_path):
+        return temp_file_path + '.copy'
+
+    def get_command(self, temp_file_path, converted_file_path):
+        return 'cp %s %s' % (shell_quote(temp_file_path),
+                             shell_quote(converted_file_path))
+
+
+def old_way(email_path):
+    with open(email_path) as email_file:
+        message = email.message_from_file(email_file)
+    directory = mkdtemp()
+    try:
+        for file_name, content, _ in get_attachments(message):
+            # uploaded from the string (boto wraps it in a StringIO)
+            NullKey().set_contents_from_file(StringIO(content))
+            # copied into a StringIO to be read
+            quote_file = StringIO(content)
+            # written to a temporary file for a converter
+            with open(os.path.join(directory, file_name), 'wb') as temp_file:
+                temp_file.write(quote_file.read())
+            quote_file.seek(0)
+            # read into a string for xlrd
+            hashlib.sha1(quote_file.read())
+    finally:
+        rmtree(directory)
+
+
+def new_way(email_path, max_memory):
+    with open(email_path) as email_file:
+        _, files = read_email(email_file, max_memory=max_memory)
+    uploader = QuoteFileUploader(NullConnection(), 'bucket')
+    try:
+        for file_name, quote_file, _ in files:
+            uploader.upload(file_name, quote_file)
+            with CopyConverter() as converter:
+                converter.convert_file(quote_file, file_name).close()
+            hashlib.sha1(get_content(quote_file))
+        uploader.wait()
+    finally:
+        for _, quote_file, _ in files:
+            quote_file.close()
+
+
+def _measure_in_child(queue, function, args):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    function(*args)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes
+    queue.put((after - before) * 1024)
+
+
+def measure(function, *args):
+    """:return: increase in peak memory in bytes when 'function' is called
+    with 'args' in a new process
+    """
+    queue = Queue()
+    process = Process(target=_measure_in_child, args=(queue, function, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def write_email(quote_file_path):
+    """:return: NamedTemporaryFile containing an email with the given file as
+    its only attachment
+    """
+    message = MIMEMultipart()
+    message['From'] = 'supplier@example.com'
+    message['Delivered-To'] = 'matrix@example.com'
+    message['Subject'] = 'Matrix'
+    part = MIMEBase('application', 'octet-stream')
+    with open(quote_file_path, 'rb') as quote_file:
+        part.set_payload(quote_file.read())
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', 'attachment',
+                    filename=os.path.basename(quote_file_path))
+    message.attach(part)
+    email_file = NamedTemporaryFile(suffix='.txt')
+    email_file.write(message.as_string())
+    email_file.flush()
+    return email_file
+
+
+@click.command(help='Measure peak memory used to handle email attachments '
+                    'the old way and with AttachmentFile.')
+@click.option('--count', '-n', default=3,
+              help='Number of example quote files to use, largest first.')
+@click.option('--max-memory', '-m', default=MAX_ATTACHMENT_MEMORY,
+              help='Size in bytes of the largest attachment that is kept in '
+                   'memory instead of a temporary file.')
+def main(count, max_memory):
+    paths = sorted((os.path.join(QUOTE_FILE_DIR, name) for name in
+                    os.listdir(QUOTE_FILE_DIR) if not name.endswith('.txt')),
+                   key=os.path.getsize, reverse=True)[:count]
+    for path in paths:
+        with write_email(path) as email_file:
+            old_bytes = measure(old_way, email_file.name)
+            new_bytes = measure(new_way, email_file.name, max_memory)
+        print '%s (%.1f MB): old %.1f MB, new %.1f MB' % (
+            os.path.basename(path), os.path.getsize(path) / 2. ** 20,
+            old_bytes / 2. ** 20, new_bytes / 2. ** 20)
+
+
+if __name__ == '__main__':
+    main()
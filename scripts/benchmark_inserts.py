@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Throughput benchmark for QuoteDAO.insert_quotes against a real database
+(the Altitude database from the config file, or another one given by
+--uri). Compares the old way (one executemany INSERT) with multi-row
+INSERT ... VALUES statements and, if the database is PostgreSQL, COPY.
+
+Every insert is rolled back, so no quotes are left in the database. The
+Rate_Matrix table must already exist.
+"""
+from datetime import datetime
+from time import time
+
+import click
+
+from brokerage import init_altitude_db, init_config
+from brokerage.model import MatrixQuote, MatrixQuoteRecord
+from brokerage.quote_email_processor import QuoteDAO
+from brokerage.validation import ELECTRIC
+
+
+def make_quote_dicts(count):
+    """:return: list of 'count' dictionaries of column values of typical
+    quotes, like the ones QuoteEmailProcessor inserts
+    """
+    return [MatrixQuoteRecord(
+        start_from=datetime(2016, 1, 1), start_until=datetime(2016, 2, 1),
+        term_months=12, valid_from=datetime(2016, 1, 1),
+        valid_until=datetime(2016, 1, 2), price=0.05 + i * 1e-7,
+        rate_class_alias='Utility SC%d' % (i % 100), service_type=ELECTRIC,
+        min_volume=0, limit_volume=100000, file_reference='benchmark.xlsx',
+        date_received=datetime(2016, 1, 1)).raw_column_dict()
+            for i in xrange(count)]
+
+
+def old_way(dao, quote_dicts):
+    dao.altitude_session.execute(MatrixQuote.__table__.insert(), quote_dicts)
+
+
+def values(dao, quote_dicts):
+    dao.COPY_DRIVERS = ()
+    dao.insert_quotes(quote_dicts)
+
+
+def copy(dao, quote_dicts):
+    dao.insert_quotes(quote_dicts)
+
+
+def measure(function, quote_dicts, repeat):
+    """:return: greatest number of rows per second inserted by 'function'
+    in 'repeat' tries
+    """
+    best = None
+    for _ in xrange(repeat):
+        dao = QuoteDAO()
+        dao.begin()
+        start = time()
+        function(dao, quote_dicts)
+        seconds = time() - start
+        dao.rollback()
+        dao.altitude_session.close()
+        if best is None or seconds < best:
+            best = seconds
+    return len(quote_dicts) / best
+
+
+@click.command(help='Measure rows per second inserted into the Rate_Matrix '
+                    'table in each way.')
+@click.option('--count', '-n', default=10000,
+              help='Number of quotes to insert.')
+@click.option('--repeat', '-r', default=3,
+              help='Number of tries; the fastest one is reported.')
+@click.option('--uri', '-u', default=None,
+              help='SQLAlchemy URI of the database (default: altitude_uri '
+                   'in the config file).')
+def main(count, repeat, uri):
+    init_config()
+    init_altitude_db(uri=uri)
+    quote_dicts = make_quote_dicts(count)
+    functions = [('executemany', old_way), ('multi-row VALUES', values)]
+    driver = QuoteDAO().altitude_session.get_bind().dialect.driver
+    if driver in QuoteDAO.COPY_DRIVERS:
+        functions.append(('COPY', copy))
+    for name, function in functions:
+        print '%s: %.0f rows/s' % (name, measure(function, quote_dicts,
+                                                  repeat))
+
+
+if __name__ == '__main__':
+    main()
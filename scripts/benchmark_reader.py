@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Micro-benchmark for Reader.get_matches/try_match, the innermost call of
+most QuoteParsers. Compares the current implementation with the old one
+that called re.match with a regex string and rebuilt the list of
+converters on every call.
+"""
+import re
+from cStringIO import StringIO
+from timeit import timeit
+
+import click
+from tablib import formats
+
+from brokerage.reader import NOT_FOUND, parse_number
+from brokerage.spreadsheet_reader import SpreadsheetReader
+from util.dateutils import parse_datetime
+
+# (cell text, regex, types, whether try_match is used) taken from the
+# parsers and their test files
+CALLS = [
+    ('$0.0712', r'\s*\$?(.+)\s*', float, False),
+    ('12', '(\d+)', int, False),
+    ('Jan-2016', r'(\w+)-(\d\d\d\d)', (str, int), False),
+    ('24 mths', '(\d+) mths', int, False),
+    ('Con Ed SC2 Jan-16', '(.*) (\w+)-(\d\d)\s*', (unicode, unicode, int),
+     True),
+    ('Jan-16', '(\w+)-(\d\d)\s*', (unicode, int), False),
+    ('0.3591', '(\d+\.\d+)', str, True),
+    ('N/A', '(\d+\.\d+)', str, True),
+    ('36 Months', '(\d+) Months', int, False),
+    ('100-500 kWh', '(\d+)-(\d+) kWh', [int, int], True),
+    ('Published: 2/24/2016', 'Published: (.*)', parse_datetime, False),
+]
+
+
+class OldSpreadsheetReader(SpreadsheetReader):
+    """SpreadsheetReader with the conversion code as it was before the
+    pattern and converter caches.
+    """
+    def _try_convert_text(self, regex, text, types):
+        if not isinstance(types, (list, tuple)):
+            types = [types]
+        types = [{int: parse_number, float: parse_number}.get(t, t)
+                 for t in types]
+        m = re.match(regex, text)
+        if m is None or len(m.groups()) != len(types):
+            return NOT_FOUND
+        results = []
+        for group, the_type in zip(m.groups(), types):
+            try:
+                value = the_type(group)
+            except ValueError:
+                return NOT_FOUND
+            results.append(value)
+        if len(results) == 1:
+            return results[0]
+        return results
+
+
+def run_calls(reader):
+    for row, (_, regex, types, use_try) in enumerate(CALLS, start=2):
+        if use_try:
+            reader.try_match(0, row, 'A', regex, types)
+        else:
+            reader.get_matches(0, row, 'A', regex, types)
+
+
+@click.command(help='Time Reader.get_matches and try_match with a realistic '
+                    'mix of arguments.')
+@click.option('--number', '-n', default=10000,
+              help='Number of times to repeat the whole mix of calls.')
+def main(number):
+    content = 'header\n' + ''.join('"%s"\n' % text for text, _, _, _ in CALLS)
+    for reader_class in (OldSpreadsheetReader, SpreadsheetReader):
+        reader = reader_class(formats.csv)
+        reader.load_file(StringIO(content))
+        seconds = timeit(lambda: run_calls(reader), number=number)
+        print '%s: %.2f us per call' % (
+            reader_class.__name__, seconds / (number * len(CALLS)) * 1e6)
+
+if __name__ == '__main__':
+    main()
@@ -20,9 +20,9 @@ QUOTE_FILES_DIR = 'test/quote_files/'
 
 def get_parser_class_by_name(name):
     # TODO could also use module name
-    for attr_name, attr in quote_parsers.__dict__.iteritems():
-        if isinstance(attr, type) and attr.NAME == name:
-            return attr
+    for parser_class in quote_parsers.CLASSES_FOR_FORMATS.itervalues():
+        if parser_class.NAME == name:
+            return parser_class
     raise KeyError("No parser named %s" % name)
 
 def get_test_classes_for_parser_class(parser_class):
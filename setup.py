@@ -51,6 +51,7 @@ install_requires = [
     'testfixtures',
     'voluptuous==0.8.6',
     'Pint==0.6',
+    'numpy', # for validating batches of quotes at once
 
     'gunicorn==19.4.5',
 ]
@@ -77,6 +78,7 @@ setup(
     scripts=[
         'bin/check_matrix_file.py',
         'bin/receive_matrix_email.py',
+        'bin/matrix_email_daemon.py',
     ],
     # TODO: this can only be installed using
     # "pip install --process-dependency-links".
@@ -2,6 +2,8 @@ import os
 
 from sqlalchemy import create_engine
 
+from brokerage.format_matcher import format_matcher_cache
+from brokerage.supplier_cache import supplier_cache
 from brokerage.model import Session, Base, AltitudeBase, AltitudeSession
 from brokerage import import_all_model_modules, ROOT_PATH
 
@@ -59,6 +61,10 @@ def clear_db():
     """Remove all data from the test database. This should be called before and
     after running any test that inserts data.
     """
+    # rows are deleted without the ORM, so cached MatrixFormats and
+    # Suppliers don't know
+    format_matcher_cache.invalidate()
+    supplier_cache.invalidate()
     for S in [Session, AltitudeSession]:
         # OK to skip any database that is not initialized (in practice should
         # only apply to AltitudeSession)
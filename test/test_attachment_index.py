@@ -0,0 +1,51 @@
+from cStringIO import StringIO
+from datetime import datetime, timedelta
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from brokerage.attachment_index import AttachmentIndex, get_content_hash
+from brokerage.model import Supplier
+
+
+class AttachmentIndexTest(TestCase):
+    """Unit tests for AttachmentIndex.
+    """
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.index = AttachmentIndex(self.directory, timedelta(hours=1))
+        self.supplier = Supplier(id=1, name='a')
+        self.other_supplier = Supplier(id=2, name='b')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_get_add(self):
+        content_hash = get_content_hash(StringIO('file content'))
+        self.assertEqual(content_hash,
+                         get_content_hash(StringIO('file content')))
+        self.assertNotEqual(content_hash,
+                            get_content_hash(StringIO('file content 2')))
+        now = datetime(2000, 1, 1, 12)
+        self.assertIsNone(self.index.get(self.supplier, content_hash, now))
+
+        self.index.add(self.supplier, content_hash, 10, 3, now=now)
+        outcome = self.index.get(self.supplier, content_hash, now)
+        self.assertEqual((10, 3, now), (outcome.quote_count,
+                                        outcome.matrix_format_id,
+                                        outcome.time))
+        self.assertIsNone(self.index.get(self.other_supplier, content_hash,
+                                         now))
+
+        # files are forgotten after the window
+        later = now + timedelta(hours=1)
+        self.assertIsNotNone(self.index.get(self.supplier, content_hash,
+                                            later))
+        later += timedelta(seconds=1)
+        self.assertIsNone(self.index.get(self.supplier, content_hash, later))
+
+        # and removed when another one is added
+        other_hash = get_content_hash(StringIO('other'))
+        self.index.add(self.supplier, other_hash, 5, 3, now=later)
+        self.assertIsNone(self.index.get(self.supplier, content_hash, now))
+        self.assertIsNotNone(self.index.get(self.supplier, other_hash, later))
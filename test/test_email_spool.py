@@ -0,0 +1,81 @@
+import os
+from cStringIO import StringIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from brokerage.email_spool import EmailSpool, CUR, ERROR, ERROR_SUFFIX, \
+    NEW, make_bounce
+
+
+class EmailSpoolTest(TestCase):
+    """Unit tests for EmailSpool.
+    """
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.spool = EmailSpool(self.directory)
+        self.spool.create_directories()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def _list(self, subdirectory):
+        return sorted(os.listdir(os.path.join(self.directory, subdirectory)))
+
+    def test_deliver_claim_finish(self):
+        name = self.spool.deliver(StringIO('email'))
+        self.assertEqual([name], self._list(NEW))
+        self.assertEqual([], self._list('tmp'))
+
+        self.assertEqual([name], self.spool.claim())
+        self.assertEqual([], self._list(NEW))
+        with open(self.spool.get_path(CUR, name)) as email_file:
+            self.assertEqual('email', email_file.read())
+        # can't be claimed twice
+        self.assertEqual([], self.spool.claim())
+
+        self.spool.finish(name)
+        self.assertEqual([], self._list(CUR))
+
+    def test_claim_limit_and_recover(self):
+        names = []
+        for i in xrange(3):
+            names.append(self.spool.deliver(StringIO('email %s' % i)))
+        self.assertEqual(sorted(names)[:2], self.spool.claim(limit=2))
+        self.assertEqual(sorted(names)[:2], self._list(CUR))
+
+        self.assertEqual(sorted(names)[:2], self.spool.recover())
+        self.assertEqual(sorted(names), self._list(NEW))
+        self.assertEqual([], self._list(CUR))
+
+    def test_fail(self):
+        name = self.spool.deliver(StringIO('email'))
+        self.spool.claim()
+        self.spool.fail(name, 'error message')
+        self.assertEqual([], self._list(CUR))
+        self.assertEqual([name, name + ERROR_SUFFIX], self._list(ERROR))
+        with open(self.spool.get_path(ERROR, name + ERROR_SUFFIX)) as \
+                error_file:
+            self.assertEqual('error message', error_file.read())
+
+    def test_make_bounce(self):
+        email = ('Return-Path: <sender@example.com>\n'
+                 'From: Sender <from@example.com>\n'
+                 'Delivered-To: matrix@example.com\n'
+                 'Subject: Prices\n'
+                 '\n'
+                 'Return-Path: <body@example.com>\n')
+        recipient, bounce = make_bounce(StringIO(email), 'error message')
+        self.assertEqual('sender@example.com', recipient)
+        self.assertEqual('sender@example.com', bounce['To'])
+        self.assertEqual('matrix@example.com', bounce['From'])
+        self.assertIn('"Prices"', bounce.get_payload())
+        self.assertIn('error message', bounce.get_payload())
+
+        # without an envelope sender, the From address is used
+        recipient, _ = make_bounce(StringIO(email.split('\n', 1)[1]), '')
+        self.assertEqual('from@example.com', recipient)
+
+        # bounces are not bounced
+        self.assertIsNone(make_bounce(
+            StringIO('Return-Path: <>\nFrom: MAILER-DAEMON\n\n'), ''))
@@ -2,6 +2,7 @@
 import pytest
 
 from brokerage.pdf_reader import PDFReader
+from brokerage.reader import NOT_FOUND
 
 EXAMPLE_FILE_PATH = 'test/quote_files/Volunteer ' \
                     'Exchange_COH_2015 10-19-15.pdf'
@@ -32,3 +33,13 @@ def test_get(loaded_pdf_reader):
 def test_get_matches(loaded_pdf_reader):
     assert loaded_pdf_reader.get_matches(1, 477, 70, '(.*)', str) == 'PREMIUM'
     assert loaded_pdf_reader.get_matches(1, 487, 200, '(\d+.\d+)', float) == 4.8
+
+def test_try_get_try_match(loaded_pdf_reader):
+    assert loaded_pdf_reader.try_get(1, 477, 70, basestring) == 'PREMIUM'
+    assert loaded_pdf_reader.try_get(1, 10000, 10000, basestring) is NOT_FOUND
+    assert loaded_pdf_reader.try_match(
+        1, 487, 200, '(\d+.\d+)', float) == 4.8
+    assert loaded_pdf_reader.try_match(
+        1, 487, 200, 'no such text', []) is NOT_FOUND
+    assert loaded_pdf_reader.try_match(
+        1, 487, 200, '(\d+.\d+)', float, tolerance=-1) is NOT_FOUND
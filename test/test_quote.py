@@ -3,8 +3,8 @@ from unittest import TestCase
 
 from brokerage.model import Quote, MatrixQuote
 from brokerage.exceptions import ValidationError
-from brokerage.model import Quote, MatrixQuote
-from brokerage.validation import GAS, ELECTRIC
+from brokerage.model import Quote, MatrixQuote, MatrixQuoteRecord
+from brokerage.validation import GAS, ELECTRIC, MatrixQuoteValidator
 
 
 class QuoteTest(TestCase):
@@ -92,3 +92,64 @@ class MatrixQuoteTest(TestCase):
         self.quote.limit_volume = 10000
         self.quote.validate()
 
+
+class MatrixQuoteRecordTest(TestCase):
+    """Unit tests for MatrixQuoteRecord.
+    """
+    def setUp(self):
+        self.record = MatrixQuoteRecord(
+            service_type=GAS, start_from=datetime(2000, 3, 1),
+            start_until=datetime(2000, 4, 1), term_months=3,
+            valid_from=datetime(2000, 1, 1), valid_until=datetime(2000, 1, 2),
+            price=0.1, min_volume=0, limit_volume=10000,
+            rate_class_alias='a', date_received=datetime(2000, 1, 1),
+            file_reference='file 1,2,3')
+
+    def test_validate(self):
+        self.record.validate()
+        self.record.price = 10
+        with self.assertRaises(ValidationError):
+            self.record.validate()
+
+    def test_no_extra_attributes(self):
+        with self.assertRaises(AttributeError):
+            self.record.foo = 1
+
+    def test_raw_column_dict(self):
+        quote = self.record.to_matrix_quote()
+        self.assertIsInstance(quote, MatrixQuote)
+        self.assertEqual(self.record.price, quote.price)
+        self.assertEqual(self.record.file_reference, quote.file_reference)
+        self.assertEqual(GAS, quote.service_type)
+
+        # insert parameters are the same as for the equivalent ORM object
+        self.assertEqual(quote.raw_column_dict(),
+                         self.record.raw_column_dict())
+
+    def test_validate_batch(self):
+        electric_record = MatrixQuoteRecord(
+            service_type=ELECTRIC, start_from=datetime(2000, 3, 1),
+            start_until=datetime(2000, 4, 1), term_months=3,
+            valid_from=datetime(2000, 1, 1), valid_until=datetime(2000, 1, 2),
+            price=0.1, min_volume=None, limit_volume=None,
+            rate_class_alias='b')
+        records = [self.record, electric_record]
+        MatrixQuoteValidator.validate_batch(records)
+        MatrixQuoteValidator.validate_batch([])
+
+        # same error message as validating the quote by itself
+        electric_record.term_months = 100
+        with self.assertRaises(ValidationError) as context:
+            electric_record.validate()
+        with self.assertRaises(ValidationError) as batch_context:
+            MatrixQuoteValidator.validate_batch(records)
+        self.assertEqual(context.exception.message,
+                         batch_context.exception.message)
+
+        # volume errors
+        electric_record.term_months = 3
+        self.record.limit_volume = 1
+        with self.assertRaises(ValidationError) as context:
+            MatrixQuoteValidator.validate_batch(records)
+        self.assertEqual('gas limit_volume below 2000: 1',
+                         context.exception.message)
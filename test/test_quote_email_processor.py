@@ -1,23 +1,33 @@
 import os
+import signal
 from cStringIO import StringIO
+from datetime import datetime, timedelta
 from email.message import Message
+from shutil import rmtree
+from subprocess import CalledProcessError
+from tempfile import mkdtemp
+from time import time
 from unittest import TestCase, skip
 
 import statsd
 from boto.s3.bucket import Bucket
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
-from mock import Mock, DEFAULT
+from mock import Mock, DEFAULT, patch
 
 from brokerage import init_altitude_db, init_model, ROOT_PATH
 from brokerage.exceptions import ValidationError
-from brokerage.model import Company, Quote, MatrixQuote, MatrixFormat
+from brokerage.format_matcher import format_matcher_cache
+from brokerage.model import Company, Quote, MatrixQuote, MatrixFormat, \
+    MatrixQuoteRecord
 from brokerage.model import Supplier, Session, AltitudeSession
 from brokerage.quote_email_processor import QuoteEmailProcessor, EmailError, \
     UnknownSupplierError, QuoteDAO, MultipleErrors, NoFilesError, NoQuotesError, \
-    UnknownFormatError
-from brokerage.quote_parser import QuoteParser
+    UnknownFormatError, WorkerError, WorkerQueue, _insert_in_thread
+from brokerage.quote_parser import QuoteParser, ParserStats
 from brokerage.quote_parsers import CLASSES_FOR_FORMATS
+from brokerage.supplier_cache import supplier_cache
+from brokerage.validation import ELECTRIC
 from test import init_test_config, clear_db, create_tables
 from test.setup_teardown import FakeS3Manager
 
@@ -36,7 +46,7 @@ class TestQuoteEmailProcessor(TestCase):
         self.format_1 = MatrixFormat(matrix_format_id=1)
         self.quote_dao = Mock(autospec=QuoteDAO)
         self.quote_dao.get_supplier_objects_for_message.return_value = (
-            self.supplier, Company(company_id=2, name='The Supplier'))
+            self.supplier, 2)
 
         # def get_matrix_format(supplier, file_name, match_email_body):
         #     # matrix_attachment_name matches either an attachment name or an email
@@ -48,12 +58,18 @@ class TestQuoteEmailProcessor(TestCase):
         #
         self.quote_dao.get_matrix_format_for_file.return_value = self.format_1
 
-        self.quotes = [Mock(autospec=Quote), Mock(autospec=Quote)]
+        self.quotes = [MatrixQuoteRecord(
+            service_type=ELECTRIC, start_from=datetime(2016, 3, 1),
+            start_until=datetime(2016, 4, 1), term_months=12,
+            valid_from=datetime(2016, 1, 1), valid_until=datetime(2016, 1, 2),
+            price=0.1, min_volume=0, limit_volume=100000,
+            rate_class_alias='a') for _ in xrange(2)]
         self.quote_parser = Mock(autospec = QuoteParser)
         # QuoteEmailProcessor expects QuoteParser.extract_quotes to return a
         # generator, not a list
         self.quote_parser.extract_quotes.return_value = (q for q in self.quotes)
         self.quote_parser.get_count.return_value = len(self.quotes)
+        self.quote_parser.stats = ParserStats()
         QuoteParserClass1 = Mock()
         QuoteParserClass1.return_value = self.quote_parser
 
@@ -65,8 +81,17 @@ class TestQuoteEmailProcessor(TestCase):
         self.quote_parser_2.extract_quotes.return_value = (
             q for q in self.quotes)
         self.quote_parser_2.get_count.return_value = len(self.quotes)
+        self.quote_parser_2.stats = ParserStats()
         self.format_2 = MatrixFormat(matrix_format_id=2)
         self.supplier.matrix_formats = [self.format_1, self.format_2]
+        self.quote_dao.get_matrix_formats.return_value = [self.format_1,
+                                                          self.format_2]
+
+        # by default the parsers can't tell anything from the file contents
+        QuoteParserClass1.sniff.return_value = None
+        QuoteParserClass2.sniff.return_value = None
+        self.QuoteParserClass1 = QuoteParserClass1
+        self.QuoteParserClass2 = QuoteParserClass2
 
         # might as well use real objects for StatsD metrics; they don't need
         # to connect to a server
@@ -123,7 +148,7 @@ class TestQuoteEmailProcessor(TestCase):
         # nothing happens in S3
         self.assertEqual(0, self.s3_connection.get_bucket.call_count)
         self.assertEqual(0, self.s3_bucket.new_key.call_count)
-        self.assertEqual(0, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(0, self.s3_key.set_contents_from_file.call_count)
 
     def test_process_email_no_attachment(self):
         # email has no attachment in it
@@ -144,7 +169,7 @@ class TestQuoteEmailProcessor(TestCase):
         # nothing happens in S3
         self.assertEqual(0, self.s3_connection.get_bucket.call_count)
         self.assertEqual(0, self.s3_bucket.new_key.call_count)
-        self.assertEqual(0, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(0, self.s3_key.set_contents_from_file.call_count)
 
     def test_process_email_non_matching_attachment(self):
         self.message.add_header('Content-Disposition', 'attachment',
@@ -169,7 +194,7 @@ class TestQuoteEmailProcessor(TestCase):
         # nothing happens in S3
         self.assertEqual(0, self.s3_connection.get_bucket.call_count)
         self.assertEqual(0, self.s3_bucket.new_key.call_count)
-        self.assertEqual(0, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(0, self.s3_key.set_contents_from_file.call_count)
 
     def test_process_email_invalid_attachment(self):
         self.message.add_header('Content-Disposition', 'attachment',
@@ -193,7 +218,54 @@ class TestQuoteEmailProcessor(TestCase):
         # the file DOES get stored in S3
         self.assertEqual(1, self.s3_connection.get_bucket.call_count)
         self.assertEqual(1, self.s3_bucket.new_key.call_count)
-        self.assertEqual(1, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
+
+    def test_process_email_format_identified_by_content(self):
+        self.message.add_header('Content-Disposition', 'attachment',
+                                filename='filename.xls')
+        self.quote_dao.get_matrix_format_for_file.side_effect = \
+            UnknownFormatError
+        self.QuoteParserClass1.sniff.return_value = 0.5
+        self.QuoteParserClass2.sniff.return_value = 1
+        self.quote_parser_2.get_count.return_value = len(self.quotes)
+
+        self.qep.process_email(StringIO(self.message.as_string()))
+
+        self.assertEqual(0, self.quote_parser.load_file.call_count)
+        self.assertEqual(1, self.quote_parser_2.load_file.call_count)
+        self.assertEqual(1, self.quote_dao.commit.call_count)
+
+    def test_process_email_rejected_by_sniffing(self):
+        self.message.add_header('Content-Disposition', 'attachment',
+                                filename='filename.xls')
+        self.QuoteParserClass1.sniff.return_value = 0.5
+        self.QuoteParserClass2.sniff.return_value = 0
+
+        with self.assertRaises(MultipleErrors) as context:
+            self.qep.process_email(StringIO(self.message.as_string()))
+        self.assertIn('fingerprint', context.exception.exceptions[0].message)
+
+        # the file is stored but never loaded
+        self.assertEqual(0, self.quote_parser.load_file.call_count)
+        self.assertEqual(0, self.quote_parser_2.load_file.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
+        self.quote_dao.rollback.assert_called_once_with()
+
+    def test_process_email_invalid_quote(self):
+        self.message.add_header('Content-Disposition', 'attachment',
+                                filename='filename.xls')
+        email_file = StringIO(self.message.as_string())
+        self.quotes[1].price = 100
+
+        with self.assertRaises(MultipleErrors) as context:
+            self.qep.process_email(email_file)
+        self.assertIn('Expected price between',
+                      context.exception.exceptions[0].message)
+
+        # the batch containing the invalid quote is not inserted
+        self.assertEqual(0, self.quote_dao.insert_quotes.call_count)
+        self.quote_dao.rollback.assert_called_once_with()
+        self.assertEqual(0, self.quote_dao.commit.call_count)
 
     def test_process_email_base64encoded_attachment_name(self):
         '''
@@ -225,7 +297,7 @@ class TestQuoteEmailProcessor(TestCase):
         self.s3_connection.get_bucket.assert_called_once_with(
             self.s3_bucket_name)
         self.s3_bucket.new_key.assert_called_once_with(name)
-        self.assertEqual(1, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
 
     @skip("")
     def test_process_email_bad_and_good_attachments(self):
@@ -264,9 +336,10 @@ class TestQuoteEmailProcessor(TestCase):
 
         # 2 files should be uploaded to s3
         # (not checking file names or contents)
-        self.assertEqual(2, self.s3_connection.get_bucket.call_count)
+        # the same bucket is used for both
+        self.assertEqual(1, self.s3_connection.get_bucket.call_count)
         self.assertEqual(2, self.s3_bucket.new_key.call_count)
-        self.assertEqual(2, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
 
     def test_process_email_good_attachment(self):
         self.format_1.matrix_attachment_name = 'filename.xls'
@@ -294,7 +367,41 @@ class TestQuoteEmailProcessor(TestCase):
         self.s3_connection.get_bucket.assert_called_once_with(
             self.s3_bucket_name)
         self.s3_bucket.new_key.assert_called_once_with(name)
-        self.assertEqual(1, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
+
+    def test_process_email_upload_error(self):
+        """The quotes from a file are inserted even if it can't be uploaded,
+        but the email is not finished successfully.
+        """
+        self.format_1.matrix_attachment_name = 'filename.xls'
+        self.message.add_header('Content-Disposition', 'attachment',
+                                filename='filename.xls')
+        self.s3_key.set_contents_from_file.side_effect = IOError
+
+        with self.assertRaises(MultipleErrors) as e:
+            self.qep.process_email(StringIO(self.message.as_string()))
+        self.assertEqual(1, len(e.exception.exceptions))
+        self.assertIsInstance(e.exception.exceptions[0], IOError)
+        self.assertEqual(1, self.quote_dao.commit.call_count)
+        self.assertEqual(0, self.quote_dao.rollback.call_count)
+
+    def test_process_email_upload_error_after_failure(self):
+        """When an error stops an email, its uploads are still waited for,
+        so their errors are not reported with the next email.
+        """
+        self.format_1.matrix_attachment_name = 'filename.xls'
+        self.message.add_header('Content-Disposition', 'attachment',
+                                filename='filename.xls')
+        self.s3_key.set_contents_from_file.side_effect = [IOError, None]
+        self.quote_dao.commit.side_effect = [RuntimeError, None]
+        self.quote_parser.extract_quotes.side_effect = lambda: (
+            q for q in self.quotes)
+
+        with self.assertRaises(RuntimeError):
+            self.qep.process_email(StringIO(self.message.as_string()))
+        self.qep.process_email(StringIO(self.message.as_string()))
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
+        self.assertEqual(2, self.quote_dao.commit.call_count)
 
     @skip("")
     def test_process_email_body(self):
@@ -331,7 +438,7 @@ class TestQuoteEmailProcessor(TestCase):
         self.s3_connection.get_bucket.assert_called_once_with(
             self.s3_bucket_name)
         self.s3_bucket.new_key.assert_called_once_with(self.message['Subject'])
-        self.assertEqual(1, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
 
     def test_process_email_no_quotes(self):
         self.message.add_header('Content-Disposition', 'attachment',
@@ -356,7 +463,7 @@ class TestQuoteEmailProcessor(TestCase):
         # the file DOES get stored in S3
         self.assertEqual(1, self.s3_connection.get_bucket.call_count)
         self.assertEqual(1, self.s3_bucket.new_key.call_count)
-        self.assertEqual(1, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(1, self.s3_key.set_contents_from_file.call_count)
 
     @skip("")
     def test_multiple_formats(self):
@@ -390,9 +497,187 @@ class TestQuoteEmailProcessor(TestCase):
 
         # 2 files should be uploaded to s3
         # (not checking file names or contents)
-        self.assertEqual(2, self.s3_connection.get_bucket.call_count)
+        # the same bucket is used for both
+        self.assertEqual(1, self.s3_connection.get_bucket.call_count)
         self.assertEqual(2, self.s3_bucket.new_key.call_count)
-        self.assertEqual(2, self.s3_key.set_contents_from_string.call_count)
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
+
+    def test_duplicate_attachments(self):
+        """When the same email is received twice, its attachments are only
+        processed the first time.
+        """
+        self.quote_dao.get_matrix_format_for_file.side_effect = [
+           self.format_1, self.format_2]
+        self.quote_parser.matrix_format = self.format_1
+        self.quote_parser_2.matrix_format = self.format_2
+        directory = mkdtemp()
+        self.addCleanup(rmtree, directory)
+        qep = QuoteEmailProcessor(
+            {1: self.QuoteParserClass1, 2: self.QuoteParserClass2},
+            self.quote_dao, self.s3_connection, self.s3_bucket_name,
+            attachment_index_dir=directory,
+            duplicate_window=timedelta(hours=1))
+
+        with open('test/quote_files/quote_email.txt') as f:
+            qep.process_email(f)
+        self.assertEqual(2 * len(self.quotes),
+                         self.quote_dao.insert_quotes.call_count)
+        self.assertEqual(2, self.quote_dao.commit.call_count)
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
+
+        # the 2 attachments are skipped without an error
+        with open('test/quote_files/quote_email.txt') as f:
+            qep.process_email(f)
+        self.assertEqual(
+            2, self.quote_dao.get_matrix_format_for_file.call_count)
+        self.assertEqual(2 * len(self.quotes),
+                         self.quote_dao.insert_quotes.call_count)
+        self.assertEqual(2, self.quote_dao.commit.call_count)
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
+        self.assertEqual(1, self.quote_parser.load_file.call_count)
+        self.assertEqual(1, self.quote_parser_2.load_file.call_count)
+
+    def test_multiple_formats_in_pool(self):
+        """Same as test_multiple_formats, but the 2 attachments are read at
+        the same time in worker processes.
+        """
+        self.quote_dao.get_matrix_format_for_file.side_effect = [
+           self.format_1, self.format_2]
+        # names of QuoteParsers are sent back from the worker processes
+        self.quote_parser.NAME = 'parser1'
+        self.quote_parser_2.NAME = 'parser2'
+        qep = QuoteEmailProcessor(
+            {1: self.QuoteParserClass1, 2: self.QuoteParserClass2},
+            self.quote_dao, self.s3_connection, self.s3_bucket_name,
+            attachment_processes=2)
+
+        with open('test/quote_files/quote_email.txt') as f:
+            qep.process_email(f)
+
+        # formats are identified, files are uploaded, and quotes are
+        # inserted in this process, one transaction per file
+        self.assertEqual(
+            2, self.quote_dao.get_matrix_format_for_file.call_count)
+        self.assertEqual(2, self.quote_dao.begin.call_count)
+        # supplier id of the Company is set in the worker processes
+        for quote in self.quotes:
+            quote.supplier_id = 2
+        self.assertEqual(2 * len(self.quotes),
+                         self.quote_dao.insert_quotes.call_count)
+        inserted_dicts = [args[0] for args, _ in
+                          self.quote_dao.insert_quotes.call_args_list]
+        expected_dicts = [q.raw_column_dict() for q in self.quotes]
+        self.assertEqual([expected_dicts, [], expected_dicts, []],
+                         inserted_dicts)
+        self.assertEqual(0, self.quote_dao.rollback.call_count)
+        self.assertEqual(2, self.quote_dao.commit.call_count)
+        self.assertEqual(2, self.s3_key.set_contents_from_file.call_count)
+
+    def test_multiple_formats_in_pool_errors(self):
+        """Inserting the quotes from the 1st file fails, and the 2nd file
+        fails in its worker process. Both are reported without waiting
+        forever for the rest of either file.
+        """
+        self.quote_dao.get_matrix_format_for_file.side_effect = [
+           self.format_1, self.format_2]
+        self.quote_dao.insert_quotes.side_effect = ValueError
+        self.quote_parser.NAME = 'parser1'
+        self.quote_parser_2.validate.side_effect = ValidationError
+        qep = QuoteEmailProcessor(
+            {1: self.QuoteParserClass1, 2: self.QuoteParserClass2},
+            self.quote_dao, self.s3_connection, self.s3_bucket_name,
+            attachment_processes=2)
+
+        with open('test/quote_files/quote_email.txt') as f:
+            with self.assertRaises(MultipleErrors) as e:
+                qep.process_email(f)
+        self.assertEqual([ValueError, WorkerError],
+                         [type(error) for error in e.exception.exceptions])
+        self.assertIn('ValidationError', e.exception.exceptions[1].message)
+        self.assertEqual(1, self.quote_dao.insert_quotes.call_count)
+        self.assertEqual(2, self.quote_dao.rollback.call_count)
+        self.assertEqual(0, self.quote_dao.commit.call_count)
+
+    def _process_email_in_pool_with_bad_file(self):
+        """Process the email with 2 attachments in worker processes, where
+        reading the 1st file fails.
+        :return: the WorkerError for the 1st file
+        """
+        self.quote_dao.get_matrix_format_for_file.side_effect = [
+           self.format_1, self.format_2]
+        self.quote_parser_2.NAME = 'parser2'
+        qep = QuoteEmailProcessor(
+            {1: self.QuoteParserClass1, 2: self.QuoteParserClass2},
+            self.quote_dao, self.s3_connection, self.s3_bucket_name,
+            attachment_processes=2)
+
+        with open('test/quote_files/quote_email.txt') as f:
+            with self.assertRaises(MultipleErrors) as e:
+                qep.process_email(f)
+        self.assertEqual(1, len(e.exception.exceptions))
+        # the 2nd file is still inserted
+        self.assertEqual(len(self.quotes),
+                         self.quote_dao.insert_quotes.call_count)
+        self.assertEqual(1, self.quote_dao.rollback.call_count)
+        self.assertEqual(1, self.quote_dao.commit.call_count)
+        return e.exception.exceptions[0]
+
+    def test_converter_error_in_pool(self):
+        # CalledProcessError can't be unpickled, so only its message and
+        # traceback are sent back
+        self.quote_parser.load_file.side_effect = CalledProcessError(
+            127, 'soffice --convert-to xls')
+        error = self._process_email_in_pool_with_bad_file()
+        self.assertIsInstance(error, WorkerError)
+        self.assertIn('CalledProcessError', error.message)
+        self.assertIn('soffice', error.message)
+
+    def test_killed_worker_in_pool(self):
+        def kill(*args):
+            os.kill(os.getpid(), signal.SIGKILL)
+        self.quote_parser.load_file.side_effect = kill
+        with patch.object(WorkerQueue, 'POLL_SECONDS', 0.1):
+            error = self._process_email_in_pool_with_bad_file()
+        self.assertIsInstance(error, WorkerError)
+        self.assertIn('stopped while reading', error.message)
+
+
+class TestInsertInThread(TestCase):
+    """Unit tests for _insert_in_thread.
+    """
+    def setUp(self):
+        self.inserted = []
+
+    def test_insert(self):
+        _insert_in_thread(self.inserted.append, iter(xrange(10)), 2)
+        self.assertEqual(range(10), self.inserted)
+
+    def test_insert_error(self):
+        def insert(batch):
+            if batch == 3:
+                raise ValueError
+            self.inserted.append(batch)
+        generated = []
+
+        def generate():
+            for i in xrange(100):
+                generated.append(i)
+                yield i
+
+        with self.assertRaises(ValueError):
+            _insert_in_thread(insert, generate(), 1)
+        self.assertEqual(range(3), self.inserted)
+        # generating stopped soon after the error
+        self.assertLess(len(generated), 100)
+
+    def test_generate_error(self):
+        def generate():
+            yield 1
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            _insert_in_thread(self.inserted.append, generate(), 2)
+        self.assertLessEqual(self.inserted, [1])
 
 
 class TestQuoteDAO(TestCase):
@@ -400,6 +685,7 @@ class TestQuoteDAO(TestCase):
     def setUpClass(self):
         create_tables()
         init_model()
+        init_altitude_db()
         clear_db()
 
     def setUp(self):
@@ -437,6 +723,160 @@ class TestQuoteDAO(TestCase):
         with self.assertRaises(UnknownFormatError):
             self.dao.get_matrix_format_for_file(self.supplier, 'a', False)
 
+    def test_get_matrix_format_for_file_cached(self):
+        self.format1.matrix_attachment_name = 'a.*'
+        self.format2.matrix_attachment_name = 'b.*'
+        Session().flush()
+        result = self.dao.get_matrix_format_for_file(self.supplier, 'A1',
+                                                     False)
+        self.assertEqual(self.format1.matrix_format_id,
+                         result.matrix_format_id)
+
+        # the cached copy is still usable after the session is committed
+        # and the original object is expired
+        Session().commit()
+        self.assertEqual('a.*', result.matrix_attachment_name)
+        self.assertEqual(
+            self.format2.matrix_format_id, self.dao.get_matrix_format_for_file(
+                self.supplier, 'b1', False).matrix_format_id)
+
+        # changes to formats are seen immediately
+        self.format2.matrix_attachment_name = 'c.*'
+        with self.assertRaises(UnknownFormatError):
+            self.dao.get_matrix_format_for_file(self.supplier, 'b1', False)
+        self.supplier.matrix_formats.append(
+            MatrixFormat(matrix_attachment_name='b.*', match_email_body=False))
+        Session().flush()
+        self.assertEqual('b.*', self.dao.get_matrix_format_for_file(
+            self.supplier, 'b1', False).matrix_attachment_name)
+        Session().delete(self.format1)
+        Session().flush()
+        with self.assertRaises(UnknownFormatError):
+            self.dao.get_matrix_format_for_file(self.supplier, 'a1', False)
+
+        # changes made without the ORM (as if by another process) are seen
+        # when the matcher expires
+        Session().query(MatrixFormat).filter_by(
+            matrix_format_id=self.format2.matrix_format_id).update(
+            {'matrix_attachment_name': 'd.*'}, synchronize_session=False)
+        self.assertEqual(1, len(format_matcher_cache.get_matcher(
+            self.supplier).match('c1', False)))
+        matcher = format_matcher_cache.get_matcher(
+            self.supplier, now=time() + format_matcher_cache.ttl)
+        self.assertEqual([], matcher.match('c1', False))
+        self.assertEqual('d.*', matcher.match('d1', False)[0]
+                         .matrix_attachment_name)
+
+    def test_get_supplier_objects_for_message_cached(self):
+        self.supplier.matrix_email_recipient = 'a@example.com'
+        AltitudeSession().add(Company(company_id=3, name='Supplier'))
+        Session().flush()
+        AltitudeSession().flush()
+        supplier, company_id = self.dao.get_supplier_objects_for_message(
+            'a@example.com')
+        self.assertEqual((self.supplier.id, 'Supplier', 3),
+                         (supplier.id, supplier.name, company_id))
+
+        # the cached copy is used without querying, even after the session
+        # is committed
+        Session().commit()
+        format_ids = {self.format1.matrix_format_id,
+                      self.format2.matrix_format_id}
+        query = Mock(side_effect=AssertionError)
+        with patch.object(Session(), 'query', query), \
+                patch.object(self.dao.altitude_session, 'query', query):
+            self.assertEqual(
+                (supplier, 3),
+                self.dao.get_supplier_objects_for_message('a@example.com'))
+            self.assertEqual(format_ids, {
+                f.matrix_format_id for f in
+                self.dao.get_matrix_formats(supplier, False)})
+
+        # changes to the supplier or its formats are seen immediately
+        self.supplier.matrix_email_recipient = 'b@example.com'
+        with self.assertRaises(UnknownSupplierError):
+            self.dao.get_supplier_objects_for_message('a@example.com')
+        self.supplier.matrix_email_recipient = 'a@example.com'
+        self.supplier.matrix_formats.append(
+            MatrixFormat(match_email_body=False))
+        Session().flush()
+        supplier, _ = self.dao.get_supplier_objects_for_message(
+            'a@example.com')
+        self.assertEqual(3, len(self.dao.get_matrix_formats(supplier, False)))
+
+        # entries expire, along with the supplier's formats, which may have
+        # been changed by another process
+        self.assertIsNotNone(supplier_cache.get('a@example.com'))
+        self.assertIsNone(supplier_cache.get(
+            'a@example.com', now=time() + supplier_cache.ttl))
+        self.assertFalse(format_matcher_cache.has_matcher(supplier.id))
+
+    def test_insert_quotes_start_months(self):
+        def make_record(price, start_month_count):
+            return MatrixQuoteRecord(
+                start_from=datetime(2000, 11, 1),
+                start_until=datetime(2000, 12, 1), term_months=12,
+                valid_from=datetime(2000, 1, 1),
+                valid_until=datetime(2000, 1, 2), price=price,
+                rate_class_alias='a', service_type=ELECTRIC,
+                date_received=datetime(2000, 1, 1),
+                start_month_count=start_month_count)
+        records = [make_record(0.1, 1), make_record(0.2, 3)]
+        expected = [
+            (0.1, datetime(2000, 11, 1), datetime(2000, 12, 1)),
+            (0.2, datetime(2000, 11, 1), datetime(2000, 12, 1)),
+            (0.2, datetime(2000, 12, 1), datetime(2001, 1, 1)),
+            (0.2, datetime(2001, 1, 1), datetime(2001, 2, 1)),
+        ]
+        s = AltitudeSession()
+
+        def get_rows():
+            return [(float(q.price), q.start_from, q.start_until) for q in
+                    s.query(MatrixQuote).order_by(MatrixQuote.price,
+                                                  MatrixQuote.start_from)]
+
+        # the database expands the quotes
+        self.dao.insert_quotes([r.raw_column_dict() for r in records])
+        self.assertEqual(expected, get_rows())
+        s.query(MatrixQuote).delete()
+
+        # same result when they are expanded in Python
+        self.dao.EXPANDING_DIALECTS = ()
+        self.dao.insert_quotes([r.raw_column_dict() for r in records])
+        self.assertEqual(expected, get_rows())
+
+    def test_insert_quotes_copy_and_values(self):
+        records = [MatrixQuoteRecord(
+            start_from=datetime(2000, 1, 1), start_until=datetime(2000, 2, 1),
+            term_months=12, valid_from=datetime(2000, 1, 1),
+            valid_until=datetime(2000, 1, 2), price=(i + 1) / 10.0,
+            rate_class_alias=alias, service_type=ELECTRIC,
+            date_received=datetime(2000, 1, 1), min_volume=None)
+            for i, alias in enumerate(['a', u'tab\there', 'back\\slash',
+                                       'new\nline', u'\xe9'])]
+        s = AltitudeSession()
+
+        def get_rows():
+            return [(q.rate_class_alias, float(q.price), q.min_volume) for q
+                    in s.query(MatrixQuote).order_by(MatrixQuote.price)]
+
+        expected = [(r.rate_class_alias, r.price, None) for r in records]
+
+        # COPY (the test database is PostgreSQL)
+        self.dao.insert_quotes([r.raw_column_dict() for r in records])
+        self.assertEqual(expected, get_rows())
+        s.query(MatrixQuote).delete()
+
+        # several multi-row INSERTs when each can only contain 2 rows
+        self.dao.COPY_DRIVERS = ()
+        column_count = len(records[0].raw_column_dict())
+        self.dao.PARAMETER_LIMITS = {'postgresql': column_count * 2 + 1}
+        with patch.object(self.dao.altitude_session, 'execute',
+                          wraps=self.dao.altitude_session.execute) as execute:
+            self.dao.insert_quotes([r.raw_column_dict() for r in records])
+        self.assertEqual(3, execute.call_count)
+        self.assertEqual(expected, get_rows())
+
 
 class TestQuoteEmailProcessorWithDB(TestCase):
     """Integration test using a real email with QuoteEmailProcessor,
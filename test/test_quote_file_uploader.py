@@ -0,0 +1,92 @@
+from cStringIO import StringIO
+from unittest import TestCase
+
+from boto.s3.bucket import Bucket
+from boto.s3.connection import S3Connection
+from boto.s3.key import Key
+from boto.s3.multipart import MultiPartUpload
+from mock import Mock
+
+from brokerage.quote_file_uploader import QuoteFileUploader
+from util.file_utils import AttachmentFile
+
+
+class QuoteFileUploaderTest(TestCase):
+    """Unit tests for QuoteFileUploader, with a mock S3 bucket.
+    """
+    def setUp(self):
+        self.s3_connection = Mock(autospec=S3Connection)
+        self.bucket = Mock(autospec=Bucket)
+        self.s3_connection.get_bucket.return_value = self.bucket
+        self.key = Mock(autospec=Key)
+        self.bucket.new_key.return_value = self.key
+        self.multipart_upload = Mock(autospec=MultiPartUpload)
+        self.bucket.initiate_multipart_upload.return_value = \
+            self.multipart_upload
+
+        # the files are closed after uploading, so their contents are
+        # recorded when they are uploaded
+        self.contents = []
+        self.key.set_contents_from_file.side_effect = \
+            lambda f: self.contents.append(f.read())
+        self.parts = []
+        def upload_part_from_file(f, part_number, size):
+            self.parts.append((f.read(size), part_number))
+        self.multipart_upload.upload_part_from_file.side_effect = \
+            upload_part_from_file
+
+        self.uploader = QuoteFileUploader(self.s3_connection, 'bucket',
+                                          threads=2)
+        self.uploader.MULTIPART_THRESHOLD = 10
+        self.uploader.PART_SIZE = 4
+
+    def test_upload(self):
+        quote_file = StringIO('aaa')
+        self.uploader.upload('a', quote_file)
+        # the caller can use the file while it is being uploaded
+        self.assertEqual('aaa', quote_file.read())
+        self.uploader.upload('b', StringIO('bbb'))
+        self.assertEqual([], self.uploader.wait())
+
+        # one bucket for all files
+        self.s3_connection.get_bucket.assert_called_once_with('bucket')
+        self.assertEqual(['a', 'b'], sorted(
+            args[0] for args, _ in self.bucket.new_key.call_args_list))
+        self.assertEqual(['aaa', 'bbb'], sorted(self.contents))
+
+    def test_upload_attachment_file(self):
+        attachment_file = AttachmentFile(0)
+        attachment_file.write('aaa')
+        attachment_file.seek(0)
+        self.uploader.upload('a', attachment_file)
+        # the upload does not depend on the original file
+        attachment_file.close()
+        self.assertEqual([], self.uploader.wait())
+        self.assertEqual(['aaa'], self.contents)
+
+    def test_multipart_upload(self):
+        self.uploader.upload('a', StringIO('0123456789'))
+        self.assertEqual([], self.uploader.wait())
+
+        self.bucket.initiate_multipart_upload.assert_called_once_with('a')
+        self.assertEqual([('0123', 1), ('4567', 2), ('89', 3)], self.parts)
+        self.multipart_upload.complete_upload.assert_called_once_with()
+        self.assertEqual(0, self.bucket.new_key.call_count)
+
+    def test_errors(self):
+        error = IOError()
+        def upload_part_from_file(f, part_number, size):
+            if part_number == 2:
+                raise error
+        self.multipart_upload.upload_part_from_file.side_effect = \
+            upload_part_from_file
+        self.uploader.upload('a', StringIO('0123456789'))
+        self.uploader.upload('b', StringIO('b'))
+        errors = self.uploader.wait()
+        self.assertEqual(1, len(errors))
+        self.assertEqual(('a', error), errors[0][:2])
+        self.multipart_upload.cancel_upload.assert_called_once_with()
+        self.assertEqual(0, self.multipart_upload.complete_upload.call_count)
+
+        # errors are only returned once
+        self.assertEqual([], self.uploader.wait())
@@ -1,18 +1,26 @@
 import re
-from collections import defaultdict
+from collections import defaultdict, Counter
+from cStringIO import StringIO
 from datetime import datetime
 from os.path import join, basename
+from threading import Thread
 from unittest import TestCase
 
-from mock import Mock
+from mock import Mock, ANY, patch
+from tablib import formats
 
 from brokerage import ROOT_PATH, init_altitude_db, init_model
 from brokerage.model import AltitudeSession
 from brokerage.validation import ELECTRIC
-from brokerage.quote_parser import QuoteParser, SpreadsheetReader
-from brokerage.quote_parsers import (
-    AEPMatrixParser, EntrustMatrixParser,
-    ChampionMatrixParser, GEEGasNJParser)
+from brokerage.exceptions import ValidationError, FileTooLargeError
+from brokerage.quote_parser import QuoteParser, SpreadsheetReader, \
+    ParserStats, ValidationPlan
+from brokerage.quote_parsers.aep import AEPMatrixParser
+from brokerage.quote_parsers.champion import ChampionMatrixParser
+from brokerage.quote_parsers.direct_energy import DirectEnergyMatrixParser
+from brokerage.quote_parsers.entrust import EntrustMatrixParser
+from brokerage.quote_parsers.gee_electric import GEEMatrixParser
+from brokerage.quote_parsers.gee_gas_nj import GEEGasNJParser
 from brokerage.quote_parsers.guttman_electric import GuttmanElectric
 from brokerage.quote_parsers.guttman_gas import GuttmanGas
 from brokerage.quote_parsers.spark import SparkMatrixParser
@@ -30,10 +38,7 @@ class QuoteParserTest(TestCase):
 
         class ExampleQuoteParser(QuoteParser):
             NAME = 'example'
-            reader = Mock()
-            def __init__(self):
-                super(ExampleQuoteParser, self).__init__()
-                self.reader = reader
+            reader_factory = Mock(return_value=reader)
             def _extract_quotes(self):
                 pass
 
@@ -67,6 +72,208 @@ class QuoteParserTest(TestCase):
                                                         (int, int))
 
 
+    def test_stats(self):
+        self.reader.call_counts = Counter()
+        self.qp.load_file(StringIO('abc'), 'example.xlsx', None)
+        self.reader.load_file.assert_called_once_with(ANY)
+        self.reader.call_counts['get'] += 2
+        self.qp.validate()
+
+        stats = self.qp.stats
+        self.assertEqual(3, stats.bytes_in)
+        self.assertEqual(3, stats.bytes_out)
+        self.assertEqual({'get': 2}, stats.reader_calls)
+        self.assertEqual(0, stats.quote_count)
+        self.assertIsNone(stats.get_quotes_per_second())
+        timers = stats.get_timers()
+        self.assertEqual(
+            {'%s.%s' % (phase, kind) for phase in ParserStats.PHASES
+             for kind in ('wall', 'cpu')}, set(timers.iterkeys()))
+        self.assertTrue(all(t >= 0 for t in timers.itervalues()))
+
+    def test_close(self):
+        self.reader.call_counts = Counter()
+        converted_file = Mock()
+        converter = Mock()
+        converter.convert_file.return_value = converted_file
+        self.qp._preprocess_file = lambda f, name: self.qp._convert_file(
+            converter, f, name)
+        with self.qp:
+            self.qp.load_file(StringIO('abc'), 'example.xlsx', None)
+            self.reader.load_file.assert_called_once_with(converted_file)
+            self.assertEqual(0, converted_file.close.call_count)
+            self.assertEqual(0, converter.close.call_count)
+            # (loading a file also closes the previous one)
+            self.reader.close.reset_mock()
+        self.reader.close.assert_called_once_with()
+        converted_file.close.assert_called_once_with()
+        converter.close.assert_called_once_with()
+
+        # closing again does nothing to the converted file
+        self.qp.close()
+        self.assertEqual(1, converted_file.close.call_count)
+        self.assertEqual(1, converter.close.call_count)
+
+    def test_max_memory(self):
+        self.reader.call_counts = Counter()
+        self.qp._max_memory = 2 ** 20
+        with patch('brokerage.quote_parser._get_memory_usage') as \
+                get_memory_usage:
+            get_memory_usage.side_effect = [10 ** 8, 10 ** 8 + 2 ** 20]
+            self.qp.load_file(StringIO('abc'), 'example.xlsx', None)
+            self.assertEqual(2 ** 20, self.qp.stats.memory_used)
+
+            self.reader.reset_mock()
+            get_memory_usage.side_effect = [10 ** 8, 10 ** 8 + 2 ** 20 + 1]
+            with self.assertRaises(FileTooLargeError):
+                self.qp.load_file(StringIO('abc'), 'example.xlsx', None)
+            # once before loading and once after the limit was exceeded
+            self.assertEqual(2, self.reader.close.call_count)
+
+            # no limit
+            self.qp._max_memory = None
+            get_memory_usage.side_effect = [10 ** 8, 10 ** 9]
+            self.qp.load_file(StringIO('abc'), 'example.xlsx', None)
+
+    def test_validation_plan(self):
+        reader = SpreadsheetReader(formats.csv)
+        reader.load_file(StringIO('a,b\n1,Price\n'))
+        plan = ValidationPlan([None], [
+            (0, 1, 'A', 'a'),
+            (None, 2, 'B', 'Pri.e'),
+            (0, 2, 1, 'Term'),
+            (0, 3, 'A', 'x'),
+        ])
+        self.assertEqual(5, plan.get_check_count())
+
+        # all failures are found, not just the first
+        failures = plan.get_failures(reader, sheet=0)
+        self.assertEqual(2, len(failures))
+        self.assertIn('Term', failures[0])
+        self.assertIn('"x"', failures[1])
+        with self.assertRaises(ValidationError) as context:
+            plan.run(reader, sheet=0)
+        self.assertIn('. ', context.exception.message)
+
+        plan = ValidationPlan(['a', None, 'b'], [('c', 1, 'A', 'a')])
+        self.assertEqual(['Expected sheet title "a"',
+                          'Expected sheet title "b"', 'No sheet named "c"'],
+                         plan.get_failures(reader))
+
+
+class ConcurrentParsingTest(TestCase):
+    """Parsing files of the same format in several threads at once should
+    give the same results as parsing them one at a time.
+    """
+    # GEE electric shifts its column layout for some sheets
+    PARSER_CLASS = GEEMatrixParser
+    FILE_PATH = join(ROOT_PATH, 'test', 'quote_files',
+                     'GEE Rack Rates_NY_10.27.2016.xlsx')
+    THREAD_COUNT = 4
+
+    def _parse(self):
+        parser = self.PARSER_CLASS()
+        with open(self.FILE_PATH, 'rb') as quote_file:
+            parser.load_file(quote_file, basename(self.FILE_PATH), None)
+        # date_received depends on the time of parsing, so leave it out
+        return [(q.rate_class_alias, q.start_from, q.start_until,
+                 q.term_months, q.valid_from, q.valid_until, q.min_volume,
+                 q.limit_volume, q.price) for q in parser.extract_quotes()]
+
+    def test_parse_in_threads(self):
+        expected = self._parse()
+        self.assertGreater(len(expected), 0)
+
+        results, errors = [None] * self.THREAD_COUNT, []
+        def parse(i):
+            try:
+                results[i] = self._parse()
+            except Exception as e:
+                errors.append(e)
+        threads = [Thread(target=parse, args=(i,))
+                   for i in xrange(self.THREAD_COUNT)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        for result in results:
+            self.assertEqual(expected, result)
+
+
+class ProcessPoolParsingTest(TestCase):
+    """Extracting quotes using worker processes should give the same quotes
+    in the same order as extracting them in the current process.
+    """
+    FILE_PATH = join(ROOT_PATH, 'test', 'quote_files', 'Entrust Energy '
+                     'Commercial Matrix Pricing_10182016.xlsx')
+
+    def _parse(self, processes):
+        parser = EntrustMatrixParser(processes=processes)
+        with open(self.FILE_PATH, 'rb') as quote_file:
+            parser.load_file(quote_file, basename(self.FILE_PATH), None)
+        quotes = [(q.rate_class_alias, q.start_from, q.term_months,
+                   q.min_volume, q.limit_volume, q.price, q.file_reference)
+                  for q in parser.extract_quotes()]
+        return quotes, parser.get_count()
+
+    def test_parse_in_processes(self):
+        expected_quotes, expected_count = self._parse(1)
+        quotes, count = self._parse(3)
+        self.assertEqual(len(expected_quotes), expected_count)
+        self.assertEqual(expected_count, count)
+        self.assertEqual(expected_quotes, quotes)
+
+
+class SniffTest(TestCase):
+    """QuoteParser.sniff should recognize files of the parser's format and
+    reject files of other formats, without loading them completely.
+    """
+    DIRECTORY = join(ROOT_PATH, 'test', 'quote_files')
+    ENTRUST_FILE_PATH = join(
+        DIRECTORY, 'Entrust Energy Commercial Matrix Pricing_10182016.xlsx')
+    SPARK_FILE_PATH = join(DIRECTORY, 'Spark Custom_LED_MATRIX.xlsx')
+    DIRECT_ENERGY_FILE_PATH = join(DIRECTORY,
+                                   'Matrix 1 Example - Direct Energy.xls')
+    GEE_GAS_PATH_NJ = join(DIRECTORY, 'NJ Rack Rates_1.7.2016.pdf')
+
+    def _sniff(self, parser_class, path):
+        with open(path, 'rb') as quote_file:
+            result = parser_class.sniff(quote_file)
+            self.assertEqual(0, quote_file.tell())
+        return result
+
+    def test_sniff(self):
+        self.assertEqual(1, self._sniff(EntrustMatrixParser,
+                                        self.ENTRUST_FILE_PATH))
+        self.assertEqual(0, self._sniff(EntrustMatrixParser,
+                                        self.SPARK_FILE_PATH))
+        self.assertEqual(1, self._sniff(DirectEnergyMatrixParser,
+                                        self.DIRECT_ENERGY_FILE_PATH))
+        self.assertEqual(0, self._sniff(EntrustMatrixParser,
+                                        self.DIRECT_ENERGY_FILE_PATH))
+        self.assertEqual(1, self._sniff(GEEGasNJParser, self.GEE_GAS_PATH_NJ))
+
+        # a file the Reader can't open at all
+        self.assertEqual(0, self._sniff(GEEGasNJParser, self.SPARK_FILE_PATH))
+        self.assertEqual(0, self._sniff(SparkMatrixParser,
+                                        self.GEE_GAS_PATH_NJ))
+
+        # formats that need preprocessing can't be sniffed
+        self.assertIsNone(self._sniff(AEPMatrixParser, self.SPARK_FILE_PATH))
+
+    def test_plans_are_created_once(self):
+        plan, pages = EntrustMatrixParser._get_fingerprint_plan()
+        self.assertIs(plan, EntrustMatrixParser._get_fingerprint_plan()[0])
+        self.assertIsNot(plan, ChampionMatrixParser._get_fingerprint_plan()[0])
+        self.assertIs(EntrustMatrixParser._get_validation_plan(),
+                      EntrustMatrixParser._get_validation_plan())
+        with patch('brokerage.quote_parser.ValidationPlan') as plan_class:
+            self._sniff(EntrustMatrixParser, self.ENTRUST_FILE_PATH)
+        self.assertEqual(0, plan_class.call_count)
+
+
 class MatrixQuoteParsersTest(TestCase):
     """Deprecated. Don't put new tests in here; instead use the
     QuoteParserTest class, following the example in test_quote_parsers/*.py
@@ -1,7 +1,7 @@
 from os.path import basename
 from datetime import datetime
 from unittest import TestCase
-from brokerage.quote_parsers import AEPMatrixParser
+from brokerage.quote_parsers.aep import AEPMatrixParser
 from test.test_quote_parsers import QuoteParserTest
 
 
@@ -3,7 +3,7 @@ from unittest import TestCase
 
 from mock import Mock
 
-from brokerage.quote_parsers import AmerigreenMatrixParser
+from brokerage.quote_parsers.amerigreen import AmerigreenMatrixParser
 from brokerage.validation import ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from brokerage.quote_parsers import DirectEnergyMatrixParser
+from brokerage.quote_parsers.direct_energy import DirectEnergyMatrixParser
 from brokerage.validation import ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
@@ -3,7 +3,7 @@ from unittest import TestCase
 
 from mock import Mock
 
-from brokerage.quote_parsers import DirectPortalMatrixParser
+from brokerage.quote_parsers.direct_portal import DirectPortalMatrixParser
 from brokerage.validation import ELECTRIC, GAS
 from test.test_quote_parsers import QuoteParserTest
 
@@ -39,6 +39,13 @@ class TestDirectPortal(QuoteParserTest, TestCase):
         # TODO: start period should really be 4 months long
         self.assertEqual(datetime(2016, 7, 1), q.start_from)
         self.assertEqual(datetime(2016, 8, 1), q.start_until)
+        self.assertEqual(4, q.start_month_count)
+        self.assertEqual(datetime(2016, 10, 1), q.last_start_from)
+        self.assertEqual([(datetime(2016, 7, 1), datetime(2016, 8, 1)),
+                          (datetime(2016, 8, 1), datetime(2016, 9, 1)),
+                          (datetime(2016, 9, 1), datetime(2016, 10, 1)),
+                          (datetime(2016, 10, 1), datetime(2016, 11, 1))],
+                         [(r.start_from, r.start_until) for r in q.expand()])
 
     def test_none_rca(self):
         # the quote in row 4 has None in column D, which should be
@@ -1,6 +1,6 @@
 from unittest import TestCase
 from datetime import datetime
-from brokerage.quote_parsers import EntrustMatrixParser
+from brokerage.quote_parsers.entrust import EntrustMatrixParser
 from brokerage.validation import ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
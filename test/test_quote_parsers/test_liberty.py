@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from brokerage.quote_parsers import LibertyMatrixParser
+from brokerage.quote_parsers.liberty import LibertyMatrixParser
 from brokerage.validation import ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from brokerage.quote_parsers import MajorEnergyMatrixParser
+from brokerage.quote_parsers.major_energy import MajorEnergyMatrixParser
 from brokerage.validation import GAS, ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
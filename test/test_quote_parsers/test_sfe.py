@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from brokerage.quote_parsers import SFEMatrixParser
+from brokerage.quote_parsers.sfe import SFEMatrixParser
 from brokerage.validation import ELECTRIC
 from test.test_quote_parsers import QuoteParserTest
 
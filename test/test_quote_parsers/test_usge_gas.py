@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from brokerage.quote_parsers import USGEGasMatrixParser
+from brokerage.quote_parsers.usge_gas import USGEGasMatrixParser
 from brokerage.validation import GAS
 from test.test_quote_parsers import QuoteParserTest
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase, skip
 
-from brokerage.quote_parsers import VolunteerMatrixParser
+from brokerage.quote_parsers.volunteer import VolunteerMatrixParser
 from brokerage.validation import GAS
 from test.test_quote_parsers import QuoteParserTest
 
@@ -0,0 +1,130 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from brokerage import init_altitude_db, init_model
+from brokerage.model import AltitudeSession, MatrixQuote, MatrixQuoteRecord
+from brokerage.quote_email_processor import QuoteDAO
+from brokerage.quote_snapshot import get_digest, IncrementalInserter, \
+    QuoteSnapshot
+from brokerage.validation import ELECTRIC
+from test import init_test_config, clear_db, create_tables
+
+
+def setUpModule():
+    init_test_config()
+
+
+def make_record(price, valid_until=datetime(2000, 1, 2),
+                start_month_count=1):
+    return MatrixQuoteRecord(
+        start_from=datetime(2000, 11, 1), start_until=datetime(2000, 12, 1),
+        term_months=12, valid_from=datetime(2000, 1, 1),
+        valid_until=valid_until, price=price, rate_class_alias='a',
+        service_type=ELECTRIC, min_volume=0, limit_volume=100,
+        date_received=datetime(2000, 1, 1),
+        start_month_count=start_month_count)
+
+
+class QuoteSnapshotTest(TestCase):
+    """Unit tests for QuoteSnapshot and get_digest.
+    """
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_get_digest(self):
+        quote_dict = make_record(0.07189999999999999).raw_column_dict()
+        digest = get_digest(quote_dict)
+
+        # values as they are read back from the database
+        db_dict = dict(quote_dict)
+        db_dict.update({
+            MatrixQuote.price.property.columns[0].name: Decimal('0.0719000'),
+            MatrixQuote.min_volume.property.columns[0].name: 0.,
+            MatrixQuote.rate_class_alias.property.columns[0].name: u'a'})
+        self.assertEqual(digest, get_digest(db_dict))
+
+        # validity dates don't matter, but other values do
+        other_dict = make_record(0.07189999999999999, valid_until=datetime(
+            2000, 2, 1)).raw_column_dict()
+        self.assertEqual(digest, get_digest(other_dict))
+        other_dict = make_record(0.072).raw_column_dict()
+        self.assertNotEqual(digest, get_digest(other_dict))
+
+    def test_save_load(self):
+        path = os.path.join(self.directory, 'snapshot.json')
+        self.assertIsNone(QuoteSnapshot.load(path))
+        snapshot = QuoteSnapshot()
+        snapshot.add('a', 1)
+        snapshot.add('b', 2)
+        snapshot.save(path)
+
+        loaded = QuoteSnapshot.load(path)
+        self.assertEqual(2, len(loaded))
+        self.assertEqual(1, loaded.get_id('a'))
+        self.assertEqual(2, loaded.get_id('b'))
+        self.assertIsNone(loaded.get_id('c'))
+        self.assertEqual(['snapshot.json'], os.listdir(self.directory))
+
+
+class IncrementalInserterTest(TestCase):
+    """Integration test for IncrementalInserter with QuoteDAO, including the
+    database.
+    """
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        init_model()
+        init_altitude_db()
+
+    def setUp(self):
+        clear_db()
+        self.dao = QuoteDAO()
+
+    def tearDown(self):
+        clear_db()
+
+    def _insert(self, records, old_snapshot):
+        inserter = IncrementalInserter(self.dao, old_snapshot)
+        inserter.insert_quotes([r.raw_column_dict() for r in records])
+        snapshot = inserter.finish()
+        self.dao.commit()
+        return inserter, snapshot
+
+    def _get_rows(self):
+        return [(float(q.price), q.start_from, q.valid_until) for q in
+                AltitudeSession().query(MatrixQuote).order_by(
+                    MatrixQuote.price, MatrixQuote.start_from)]
+
+    def test_insert_quotes(self):
+        # first file: everything is inserted
+        inserter, snapshot = self._insert(
+            [make_record(0.1), make_record(0.2, start_month_count=2)],
+            QuoteSnapshot())
+        self.assertEqual((3, 0), (inserter.inserted_count,
+                                  inserter.unchanged_count))
+        self.assertEqual(3, len(snapshot))
+        self.assertEqual(3, self.dao.count_quotes(snapshot.get_ids()))
+
+        # second file: one quote is the same, one has a new price
+        new_valid_until = datetime(2000, 1, 3)
+        inserter, snapshot = self._insert(
+            [make_record(0.1, valid_until=new_valid_until),
+             make_record(0.3, valid_until=new_valid_until,
+                         start_month_count=2)], snapshot)
+        self.assertEqual((2, 1), (inserter.inserted_count,
+                                  inserter.unchanged_count))
+        self.assertEqual(3, len(snapshot))
+        self.assertEqual([
+            (0.1, datetime(2000, 11, 1), new_valid_until),
+            (0.2, datetime(2000, 11, 1), datetime(2000, 1, 2)),
+            (0.2, datetime(2000, 12, 1), datetime(2000, 1, 2)),
+            (0.3, datetime(2000, 11, 1), new_valid_until),
+            (0.3, datetime(2000, 12, 1), new_valid_until),
+        ], self._get_rows())
@@ -1,5 +1,17 @@
+import os
+from datetime import datetime
+from StringIO import StringIO
 from unittest import TestCase
+
+from mock import patch
+from tablib import Databook, Dataset, formats
+
+from brokerage.exceptions import ValidationError
 from brokerage.quote_parser import SpreadsheetReader
+from brokerage.reader import NOT_FOUND, ReaderTrace, Reader, parse_number, \
+    _compile_regex
+from testfixtures import TempDirectory
+from util.file_utils import AttachmentFile
 
 class SpreadsheetReaderTest(TestCase):
     """Unit tests for SpreadsheetReader.
@@ -50,3 +62,132 @@ class SpreadsheetReaderTest(TestCase):
 
         # backwards range is not supported
         self.assertEqual([], SpreadsheetReader.column_range(1, 0, step=-1))
+
+    def test_try_get_try_match(self):
+        reader = SpreadsheetReader(formats.csv)
+        reader.load_file(StringIO('a,b\n1-2 kWh,x\n'))
+
+        self.assertEqual('1-2 kWh', reader.try_get(0, 2, 'A', basestring))
+        self.assertIs(NOT_FOUND, reader.try_get(0, 2, 'A', float))
+        self.assertIs(NOT_FOUND, reader.try_get(0, 3, 'A', basestring))
+        self.assertEqual(
+            [1, 2], reader.try_match(0, 2, 'A', '(\d+)-(\d+) kWh', (int, int)))
+        self.assertIs(NOT_FOUND,
+                      reader.try_match(0, 2, 'B', '(\d+)-(\d+) kWh', (int, int)))
+        self.assertIs(NOT_FOUND, reader.try_match(0, 2, 'A', '(\S+) kWh', int))
+
+        # the raising versions still raise
+        with self.assertRaises(ValidationError):
+            reader.get(0, 2, 'A', float)
+        with self.assertRaises(ValidationError):
+            reader.get_matches(0, 2, 'A', '(\S+) kWh', int)
+
+    def test_pattern_and_converter_caches(self):
+        self.assertIs(_compile_regex('(\d+)'), _compile_regex('(\d+)'))
+        pattern = _compile_regex('(\w+)')
+        self.assertIs(pattern, _compile_regex(pattern))
+
+        converters = Reader._get_converters([int, str])
+        self.assertEqual((parse_number, str), converters)
+        self.assertIs(converters, Reader._get_converters([int, str]))
+        self.assertEqual((parse_number,), Reader._get_converters(float))
+
+    def test_close(self):
+        with SpreadsheetReader(formats.csv) as reader:
+            reader.load_file(StringIO('a,b\n1,2\n'))
+            self.assertTrue(reader.is_loaded())
+            self.assertEqual('2', reader.get(0, 2, 'B', basestring))
+        self.assertFalse(reader.is_loaded())
+
+        # can load another file after closing
+        reader.load_file(StringIO('c\n3\n'))
+        self.assertEqual('3', reader.get(0, 2, 'A', basestring))
+
+    def test_date_columns(self):
+        # numbers in a marked column are dates, starting at the first row
+        sheet = Dataset([42370, 42370], [42401.5, 0.1], ['N/A', 0.2],
+                        [True, 0.3], headers=['Start', 'Price'])
+        sheet.title = 'Sheet'
+        reader = SpreadsheetReader(formats.xls)
+        reader.set_date_columns([('Sheet', 'A', 2)])
+        with patch.object(SpreadsheetReader, 'get_databook_from_file',
+                          return_value=Databook([sheet])):
+            reader.load_file(StringIO())
+        self.assertEqual(datetime(2016, 1, 1),
+                         reader.get(0, 2, 'A', datetime))
+        self.assertEqual(datetime(2016, 2, 1, 12),
+                         reader.get(0, 3, 'A', datetime))
+        self.assertEqual('N/A', reader.get(0, 4, 'A', basestring))
+        self.assertEqual(True, reader.get(0, 5, 'A', bool))
+        self.assertEqual('Start', reader.get(0, 1, 'A', basestring))
+        self.assertEqual(42370, reader.get(0, 2, 'B', int))
+
+    def test_trace_and_pruning(self):
+        sheets = []
+        for title in ('one', 'two'):
+            rows = [['%s%s' % (c, r) for c in 'abc'] for r in xrange(1, 7)]
+            sheet = Dataset(*rows[1:], headers=rows[0])
+            sheet.title = title
+            sheets.append(sheet)
+        content = Databook(sheets).xls
+        reader = SpreadsheetReader(formats.xls)
+        reader.start_trace()
+        reader.load_file(StringIO(content))
+        reader.get(0, 2, 'A', basestring)
+        reader.get(0, 3, 'B', basestring)
+        self.assertEqual((2, 3, 0, 1), reader.trace.get_bounds('one'))
+        self.assertIsNone(reader.trace.get_bounds('two'))
+        reader_trace = reader.trace
+
+        # the traced region is decoded, and the rest is only loaded when
+        # needed
+        reader = SpreadsheetReader(formats.xls)
+        reader.PRUNING_MARGIN = 0
+        reader.set_pruning_trace(reader_trace)
+        reader.load_file(StringIO(content))
+        self.assertEqual(['one', 'two'], reader.get_sheet_titles())
+        self.assertEqual(6, reader.get_height(0))
+        self.assertEqual(3, reader.get_width(0))
+        self.assertEqual('b3', reader.get(0, 3, 'B', basestring))
+        self.assertEqual(0, reader.call_counts['full_load'])
+        self.assertEqual('c6', reader.get(0, 6, 'C', basestring))
+        self.assertEqual(1, reader.call_counts['full_load'])
+
+        # the size of a sheet that was not decoded requires the whole file
+        reader.load_file(StringIO(content))
+        self.assertEqual(6, reader.get_height('two'))
+        self.assertEqual(2, reader.call_counts['full_load'])
+        self.assertEqual('c6', reader.get('two', 6, 'C', basestring))
+
+        # an AttachmentFile is loaded again from the file itself
+        attachment_file = AttachmentFile(0)
+        attachment_file.write(content)
+        attachment_file.seek(0)
+        reader.load_file(attachment_file)
+        self.assertEqual('b3', reader.get(0, 3, 'B', basestring))
+        self.assertEqual('c6', reader.get(0, 6, 'C', basestring))
+        self.assertEqual(3, reader.call_counts['full_load'])
+        attachment_file.close()
+
+        # other formats are always loaded completely
+        reader = SpreadsheetReader(formats.csv)
+        reader.set_pruning_trace(reader_trace)
+        reader.load_file(StringIO('a,b\n1,2\n'))
+        self.assertEqual('2', reader.get(0, 2, 'B', basestring))
+        self.assertIsNone(reader._pruned_limits)
+
+    def test_trace_save_load(self):
+        trace = ReaderTrace()
+        trace.record('a', 1, 2)
+        trace.record('a', 5, 0)
+        other = ReaderTrace()
+        other.record('b', 3, 3)
+        trace.update(other)
+        with TempDirectory() as d:
+            path = os.path.join(d.path, 'trace.json')
+            self.assertIsNone(ReaderTrace.load(path))
+            trace.save(path)
+            loaded = ReaderTrace.load(path)
+        self.assertEqual((1, 5, 0, 2), loaded.get_bounds('a'))
+        self.assertEqual((3, 3, 3, 3), loaded.get_bounds('b'))
+        self.assertIsNone(loaded.get_bounds('c'))
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+from brokerage import ROOT_PATH
+from brokerage.quote_parser import QuoteParser
+from brokerage.quote_parsers import CLASSES_FOR_FORMATS, ParserRegistry
+
+# code run in a new process to import the email-processing script the same
+# way it starts when Postfix runs it. it prints the time that took and the
+# names of all modules that were imported (not counting the None entries
+# that Python 2 adds to sys.modules for failed implicit relative imports).
+IMPORT_SCRIPT = '''
+import sys
+from time import time
+start = time()
+import bin.receive_matrix_email
+print time() - start
+print ' '.join(sorted(name for name, module in sys.modules.iteritems()
+                      if module is not None))
+'''
+
+
+class ParserRegistryTest(TestCase):
+    """Unit tests for ParserRegistry and CLASSES_FOR_FORMATS.
+    """
+    def test_lookup(self):
+        registry = ParserRegistry('email', {1: 'parser:HeaderParser'})
+        self.assertEqual([1], list(registry))
+        self.assertEqual(1, len(registry))
+        self.assertIsNone(registry._classes.get(1))
+        from email.parser import HeaderParser
+        self.assertIs(HeaderParser, registry[1])
+        self.assertIs(HeaderParser, registry._classes[1])
+        self.assertIsNone(registry.get(2))
+        with self.assertRaises(KeyError):
+            registry[2]
+
+    def test_classes_for_formats(self):
+        # every path is correct
+        classes = CLASSES_FOR_FORMATS.values()
+        for parser_class in classes:
+            self.assertTrue(issubclass(parser_class, QuoteParser))
+        self.assertEqual(len(classes), len(set(classes)))
+
+
+class StartupTest(TestCase):
+    """Checks that bin/receive_matrix_email.py starts quickly, because it
+    runs once for every email that is received (when the daemon is not
+    used).
+    """
+    # maximum time to import everything in seconds. this is several times
+    # more than it should take, so the test doesn't fail on a slow machine.
+    BUDGET = 3
+
+    # modules that should only be imported when a file is read
+    LAZY_MODULE_PREFIXES = ['brokerage.quote_parsers.', 'pint', 'pdfminer']
+
+    def test_import_time(self):
+        output = subprocess.check_output([sys.executable, '-c',
+                                          IMPORT_SCRIPT], cwd=ROOT_PATH)
+        seconds, module_names = output.splitlines()
+        for module_name in module_names.split():
+            for prefix in self.LAZY_MODULE_PREFIXES:
+                self.assertFalse(module_name.startswith(prefix), module_name)
+        self.assertLess(float(seconds), self.BUDGET)
@@ -1,11 +1,12 @@
 import calendar
 from datetime import date, datetime
 import unittest
+import warnings
 from util.dateutils import iso_year_start, iso_week_generator, w_week_number, \
     date_by_w_week, get_w_week_start, length_of_w_week, days_in_month, \
     estimate_month, months_of_past_year, month_offset, month_difference, \
     date_generator, nth_weekday, next_w_week_start, parse_datetime, parse_date, \
-    get_end_of_day
+    get_end_of_day, excel_number_to_datetime, excel_numbers_to_datetimes
 from util.dateutils import iso_to_date
 
 
@@ -312,3 +313,29 @@ class DateUtilsTest(unittest.TestCase):
         self.assertEqual(end, get_end_of_day(date(2000, 1, 1)))
         self.assertEqual(end, get_end_of_day(datetime(2000, 1, 1)))
         self.assertEqual(end, get_end_of_day(datetime(2000, 1, 1, 2, 3)))
+
+    def test_excel_number_to_datetime(self):
+        self.assertEqual(datetime(2016, 1, 1), excel_number_to_datetime(42370))
+        self.assertEqual(datetime(2016, 1, 1, 6),
+                         excel_number_to_datetime(42370.25))
+        # Excel's nonexistent 1900-02-29 is day 60
+        self.assertEqual(datetime(1900, 1, 1), excel_number_to_datetime(1))
+        self.assertEqual(datetime(1900, 2, 28), excel_number_to_datetime(59))
+        self.assertEqual(datetime(1900, 3, 1), excel_number_to_datetime(60))
+        self.assertEqual(datetime(1900, 3, 1), excel_number_to_datetime(61))
+
+    def test_excel_numbers_to_datetimes(self):
+        numbers = [42370, 42370.25, 1, 59, 60, 61, 0.1 + 0.2]
+        self.assertEqual([excel_number_to_datetime(n) for n in numbers],
+                         excel_numbers_to_datetimes(numbers))
+        self.assertEqual([], excel_numbers_to_datetimes([]))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(
+                [datetime(2016, 1, 1), None],
+                excel_numbers_to_datetimes([42370, float('nan')]))
+        self.assertEqual([], caught)
+
+        result = excel_numbers_to_datetimes([42370], datetime64=True)
+        self.assertEqual('datetime64[us]', str(result.dtype))
+        self.assertEqual([datetime(2016, 1, 1)], result.tolist())
@@ -3,7 +3,7 @@ from unittest import TestCase
 from os.path import join
 
 from brokerage import ROOT_PATH
-from util.email_util import get_attachments
+from util.email_util import get_attachments, read_email
 
 
 class EmailUtilsTest(TestCase):
@@ -12,7 +12,7 @@ class EmailUtilsTest(TestCase):
     EMAIL_NO_ATTACHMENT_PATH = 'example_email_no_attachment.txt'
 
     def setUp(self):
-        dir = join(ROOT_PATH, 'test', 'utils')
+        self.dir = dir = join(ROOT_PATH, 'test', 'utils')
         with open(join(dir, self.EMAIL_WITH_ATTACHMENT_PATH)) as email_file:
             self.message_with_attachment = email.message_from_file(email_file)
         with open(join(dir, self.EMAIL_NO_ATTACHMENT_PATH)) as email_file:
@@ -27,3 +27,30 @@ class EmailUtilsTest(TestCase):
 
     def test_get_attachments_0(self):
         self.assertEqual(0, len(get_attachments(self.message_no_attachment)))
+
+    def test_read_email(self):
+        with open(join(self.dir, self.EMAIL_WITH_ATTACHMENT_PATH)) as \
+                email_file:
+            message, files = read_email(email_file)
+        self.assertEqual(self.message_with_attachment['Subject'],
+                         message['Subject'])
+        self.assertEqual(1, len(files))
+        name, attachment_file, match_email = files[0]
+        self.assertEqual('DailyReportCSV.csv', name)
+        self.assertEqual(get_attachments(self.message_with_attachment)[0][1],
+                         attachment_file.read())
+        attachment_file.close()
+
+        # same result when the attachment doesn't fit in memory
+        with open(join(self.dir, self.EMAIL_WITH_ATTACHMENT_PATH)) as \
+                email_file:
+            _, files = read_email(email_file, max_memory=1000)
+        self.assertEqual(14768, len(files[0][1].read()))
+        files[0][1].close()
+
+        with open(join(self.dir, self.EMAIL_NO_ATTACHMENT_PATH)) as \
+                email_file:
+            message, files = read_email(email_file)
+        self.assertEqual(self.message_no_attachment['Subject'],
+                         message['Subject'])
+        self.assertEqual([], files)
@@ -2,7 +2,8 @@
 '''
 from unittest import TestCase
 from testfixtures import TempDirectory
-from util.file_utils import make_directories_if_necessary
+from util.file_utils import make_directories_if_necessary, AttachmentFile, \
+    get_content
 from os.path import sep, join
 from os import access, F_OK
 from errno import ENOTDIR
@@ -42,3 +43,52 @@ class FileUtilsTest(TestCase):
             make_directories_if_necessary('/dev/null')
 
 
+class AttachmentFileTest(TestCase):
+    def _check(self, attachment_file, on_disk):
+        attachment_file.write('abc')
+        attachment_file.write('def')
+        self.assertEqual(6, attachment_file.tell())
+        attachment_file.seek(0)
+        self.assertEqual('abcdef', attachment_file.read())
+        self.assertEqual(on_disk, attachment_file._on_disk)
+
+        attachment_file.seek(1)
+        other_file = attachment_file.reopen()
+        self.assertEqual('abcdef', other_file.read())
+        self.assertEqual(1, attachment_file.tell())
+        self.assertEqual('abcdef', attachment_file.get_buffer()[:])
+
+        # the content is moved to disk if necessary
+        path = attachment_file.get_path()
+        with open(path) as path_file:
+            self.assertEqual('abcdef', path_file.read())
+        self.assertEqual(1, attachment_file.tell())
+        self.assertEqual('abcdef', attachment_file.get_buffer()[:])
+
+        attachment_file.close()
+        self.assertFalse(access(path, F_OK))
+        # reopened files can still be read
+        other_file.seek(0)
+        self.assertEqual('abcdef', other_file.read())
+        other_file.close()
+
+    def test_in_memory(self):
+        self._check(AttachmentFile(6), False)
+
+    def test_on_disk(self):
+        self._check(AttachmentFile(5), True)
+
+    def test_empty(self):
+        attachment_file = AttachmentFile(0)
+        attachment_file.get_path()
+        self.assertEqual('', attachment_file.get_buffer())
+        attachment_file.close()
+
+    def test_get_content(self):
+        attachment_file = AttachmentFile(0)
+        attachment_file.write('abc')
+        attachment_file.seek(0)
+        self.assertEqual('abc', get_content(attachment_file)[:])
+        attachment_file.seek(1)
+        self.assertEqual('bc', get_content(attachment_file))
+        attachment_file.close()
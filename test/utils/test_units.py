@@ -1,7 +1,8 @@
 """Test for utils.units
 """
 from unittest import TestCase
-from util.units import convert_to_therms
+from brokerage.model import PHYSICAL_UNITS
+from util.units import convert_to_therms, unit_registry, _LazyUnitRegistry
 
 class TestUnits(TestCase):
     """Unit tests for functions in utils.units.
@@ -16,3 +17,14 @@ class TestUnits(TestCase):
 
         # NOTE: no test coverage for CCF since only energy and power units
         # are supposed to be supported
+
+    def test_physical_units(self):
+        # every allowed unit can be converted
+        for unit_name in PHYSICAL_UNITS:
+            getattr(unit_registry, unit_name)
+
+    def test_lazy_unit_registry(self):
+        registry = _LazyUnitRegistry()
+        self.assertIsNone(registry._registry)
+        self.assertEqual(1000, registry.MWh.to(registry.kWh).magnitude)
+        self.assertIsNotNone(registry._registry)
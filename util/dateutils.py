@@ -5,6 +5,8 @@ from datetime import date, datetime, timedelta
 from dateutil import parser
 import math
 
+import numpy as np
+
 # convenient format strings
 ISO_8601_DATE = '%Y-%m-%d'
 ISO_8601_DATETIME = '%Y-%m-%dT%H:%M:%SZ'
@@ -287,13 +289,43 @@ def get_end_of_day(date_or_datetime):
         d = date_or_datetime
     return date_to_datetime(d + timedelta(days=1))
 
+# Excel counts days from 1900-01-01 = 1, but it also counts 1900-02-29, which
+# does not exist, as day 60. so the epoch is 1899-12-30 for day numbers after
+# that and 1899-12-31 before it (day 60 itself becomes 1900-03-01).
+EXCEL_EPOCH = datetime(1899, 12, 30)
+EXCEL_FIRST_CORRECT_DAY = 61
+
 def excel_number_to_datetime(number):
     """Dates in some XLS spreadsheets will appear as numbers of days since
-    (apparently) December 30, 1899.
+    (apparently) December 30, 1899 (see EXCEL_EPOCH).
     :param number: int or float
     :return: datetime
     """
-    return datetime(1899, 12, 30) + timedelta(days=number)
+    if number < EXCEL_FIRST_CORRECT_DAY:
+        number += 1
+    return EXCEL_EPOCH + timedelta(days=number)
+
+def excel_numbers_to_datetimes(numbers, datetime64=False):
+    """Same as excel_number_to_datetime for a whole sequence of numbers
+    at once, which is much faster than converting them one at a time.
+    :param numbers: sequence or numpy array of ints or floats (NaN becomes
+    NaT, or None in the list)
+    :param datetime64: if True, return a numpy array of datetime64[us]
+    instead of a list
+    :return: list of datetimes
+    """
+    days = np.asarray(numbers, dtype=float)
+    # comparing NaN is harmless here (it stays NaN), but numpy warns
+    with np.errstate(invalid='ignore'):
+        days = np.where(days < EXCEL_FIRST_CORRECT_DAY, days + 1, days)
+    # rounded to microseconds like timedelta(days=...)
+    microseconds = np.round(days * 86400e6)
+    result = np.datetime64(EXCEL_EPOCH, 'us') + np.where(
+        np.isnan(microseconds), np.timedelta64('NaT', 'us'),
+        np.nan_to_num(microseconds).astype(np.int64).astype('timedelta64[us]'))
+    if datetime64:
+        return result
+    return result.tolist()
 
 def excel_datetime_to_number(dt):
     """
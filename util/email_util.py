@@ -1,6 +1,10 @@
 from email.header import decode_header
+from email.parser import HeaderParser
+import binascii
 import os
+import quopri
 import smtplib
+from tempfile import SpooledTemporaryFile
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import mimetypes
@@ -11,6 +15,8 @@ from email.mime.base import MIMEBase
 from email.mime.image import MIMEImage
 from jinja2 import Template
 
+from util.file_utils import AttachmentFile
+
 def send_email(from_user, recipients, subject, originator, password, smtp_host,
         smtp_port, template_html, template_values, attachment_paths=[],
         bcc_addrs=None):
@@ -132,3 +138,178 @@ def get_attachments(message):
         result.append((file_name, file_content, match_email_body))
     return result
 
+
+# attachments read by read_email are kept in memory up to this many bytes,
+# and stored in temporary files on disk if they are larger
+MAX_ATTACHMENT_MEMORY = 8 * 2 ** 20
+
+
+def _read_headers(lines):
+    """Read the headers of an email or MIME part, up to and including the
+    blank line after them.
+    :param lines: iterator of lines of the email
+    :return: email.message.Message containing only the headers
+    """
+    header_lines = []
+    for line in lines:
+        if line in ('\n', '\r\n'):
+            break
+        header_lines.append(line)
+    return HeaderParser().parsestr(''.join(header_lines))
+
+
+def _match_boundary(line, boundaries):
+    """
+    :param boundaries: list of MIME multipart boundary strings
+    :return: (boundary, True if it is the closing delimiter) if 'line' is a
+    delimiter for one of 'boundaries', otherwise None
+    """
+    if not line.startswith('--'):
+        return None
+    text = line.rstrip()
+    for boundary in boundaries:
+        if text == '--' + boundary:
+            return boundary, False
+        if text == '--' + boundary + '--':
+            return boundary, True
+    return None
+
+
+def _skip_to_boundary(lines, boundaries):
+    """Skip lines until a delimiter for one of 'boundaries'.
+    :return: the delimiter line, or '' at the end of the email
+    """
+    for line in lines:
+        if _match_boundary(line, boundaries) is not None:
+            return line
+    return ''
+
+
+def _get_attachment_name(headers):
+    """:return: file name of a MIME part that is an attachment (has a
+    "Content-Disposition" header and a file name), or None
+    """
+    if headers.get('Content-Disposition') is None:
+        return None
+    file_name = headers.get_filename()
+    if file_name is None:
+        return None
+    # decode_header is used to decode base64 encoded attachment name
+    # of the format =?utf-8?B?RGFpbHkgTWF0cml4IFByaWNlLnhscw==?=
+    # according to  RFC 2047. This call has no effect if the
+    # attachment name is not base64 encoded
+    file_name = decode_header(file_name)[0][0]
+    if file_name == '':
+        return None
+    return file_name
+
+
+def _decode_body(headers, lines, boundaries, output_file):
+    """Write the decoded body of a MIME part into 'output_file', reading one
+    line at a time, until a delimiter for one of 'boundaries'.
+    :return: the delimiter line, or '' at the end of the email
+    """
+    encoding = headers.get('Content-Transfer-Encoding', '').strip().lower()
+    # base64 characters that are left over because they were not a multiple
+    # of 4
+    remainder = ''
+    # each line is written when the next one is read, because the line
+    # break before a delimiter belongs to the delimiter
+    previous_line = None
+    end_line = ''
+    for line in lines:
+        if _match_boundary(line, boundaries) is not None:
+            end_line = line
+            break
+        if encoding == 'base64':
+            data = remainder + ''.join(line.split())
+            length = len(data) // 4 * 4
+            remainder = data[length:]
+            try:
+                output_file.write(binascii.a2b_base64(data[:length]))
+            except binascii.Error:
+                # like the "email" module, ignore undecodable data
+                pass
+            continue
+        if previous_line is not None:
+            output_file.write(previous_line)
+        previous_line = line
+    if previous_line is not None:
+        if previous_line.endswith('\r\n'):
+            previous_line = previous_line[:-2]
+        elif previous_line.endswith('\n'):
+            previous_line = previous_line[:-1]
+        output_file.write(previous_line)
+    return end_line
+
+
+def _read_part(headers, lines, boundaries, attachments, max_memory):
+    """Read the body of an email or MIME part whose headers have already
+    been read, adding its attachments to 'attachments'.
+    :param boundaries: boundaries of the multipart parts that contain it
+    :return: the delimiter line that ended the part, or '' at the end of the
+    email
+    """
+    if headers.get_content_maintype() == 'multipart' and \
+            headers.get_boundary() is not None:
+        inner_boundaries = boundaries + [headers.get_boundary()]
+        # skip the preamble
+        line = _skip_to_boundary(lines, inner_boundaries)
+        while True:
+            match = _match_boundary(line, inner_boundaries)
+            if match is None or match[0] != headers.get_boundary():
+                # end of the email, or of a part that contains this one
+                return line
+            if match[1]:
+                # skip the epilogue
+                return _skip_to_boundary(lines, boundaries)
+            line = _read_part(_read_headers(lines), lines, inner_boundaries,
+                              attachments, max_memory)
+
+    if headers.get_content_type() == 'message/rfc822':
+        # a forwarded email
+        return _read_part(_read_headers(lines), lines, boundaries,
+                          attachments, max_memory)
+
+    file_name = _get_attachment_name(headers)
+    if file_name is None:
+        return _skip_to_boundary(lines, boundaries)
+    attachment_file = AttachmentFile(max_memory)
+    # quoted-printable is decoded all at once, because its line breaks can
+    # be encoded
+    if headers.get('Content-Transfer-Encoding', '').strip().lower() == \
+            'quoted-printable':
+        encoded_file = SpooledTemporaryFile(max_size=max_memory)
+        line = _decode_body(headers, lines, boundaries, encoded_file)
+        encoded_file.seek(0)
+        quopri.decode(encoded_file, attachment_file)
+        encoded_file.close()
+    else:
+        line = _decode_body(headers, lines, boundaries, attachment_file)
+    attachment_file.seek(0)
+    attachments.append((file_name, attachment_file, False))
+    return line
+
+
+def read_email(email_file, max_memory=MAX_ATTACHMENT_MEMORY):
+    """Read an email one line at a time, decoding each attachment into its
+    own file as it goes. Unlike email.message_from_file, which keeps the
+    whole email and the decoded attachments in memory, this never holds more
+    than 'max_memory' bytes of each attachment.
+
+    Attachments are found the same way as in get_attachments, including
+    those in forwarded emails.
+
+    :param email_file: file containing the email
+    :param max_memory: size in bytes of the largest attachment that is kept
+    in memory; larger ones are stored in temporary files
+    :return: email.message.Message with only the headers of the email, and
+    list of (name, file, False) tuples for each attachment, where the file
+    is a util.file_utils.AttachmentFile positioned at the start (which
+    should be closed by the caller).
+    """
+    lines = iter(email_file.readline, '')
+    headers = _read_headers(lines)
+    attachments = []
+    _read_part(headers, lines, [], attachments, max_memory)
+    return headers, attachments
@@ -1,8 +1,13 @@
 '''Put filesystem-related utilities here.
 '''
+from StringIO import StringIO
+from cStringIO import StringIO as ReadOnlyStringIO
 from errno import EEXIST
+from mmap import mmap, ACCESS_READ
+import os
 from os.path import isdir, split, sep
 from os import access, F_OK, mkdir
+from tempfile import NamedTemporaryFile
 
 def make_directories_if_necessary(absolute_path):
     '''Create all directories in 'absolute_path' (string) if they don't already
@@ -34,3 +39,89 @@ def make_directories_if_necessary(absolute_path):
     assert access(absolute_path, F_OK)
     assert isdir(absolute_path)
 
+
+class AttachmentFile(object):
+    '''Seekable file containing an email attachment, whose content can be
+    shared by everything that uses the attachment (S3 upload, file
+    converters and Readers) without being copied. Like
+    tempfile.SpooledTemporaryFile, it is kept in memory while it is small,
+    and moved to a temporary file on disk when it grows beyond
+    'max_memory' bytes, but that file has a path.
+
+    Besides the usual file methods (which are those of the underlying file),
+    there are:
+    - get_path, for programs that need a file name
+    - get_buffer, for libraries that need the content as a string
+    - reopen, for reading it independently of this file's position
+    It should not be written to after any of these has been used.
+    '''
+    def __init__(self, max_memory):
+        self._max_memory = max_memory
+        # the Python version of StringIO is used because its 'getvalue'
+        # returns the same string every time instead of a copy
+        self._file = StringIO()
+        self._on_disk = False
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def write(self, data):
+        self._file.write(data)
+        if not self._on_disk and self._file.tell() > self._max_memory:
+            self._move_to_disk()
+
+    def _move_to_disk(self):
+        disk_file = NamedTemporaryFile(prefix='attachment-')
+        disk_file.write(self._file.getvalue())
+        disk_file.seek(self._file.tell())
+        self._file.close()
+        self._file = disk_file
+        self._on_disk = True
+
+    def get_path(self):
+        '''Return the path of a file on disk with the same content (if it
+        was in memory, it is written to a temporary file first). The file
+        is removed when the AttachmentFile is closed.
+        '''
+        if not self._on_disk:
+            self._move_to_disk()
+        self._file.flush()
+        return self._file.name
+
+    def get_buffer(self):
+        '''Return the whole content as a string, or if it is on disk, a new
+        read-only mmap of the file, which can be used like a string. The
+        mmap stays valid until it is closed (some libraries, like xlrd,
+        close it themselves) or garbage-collected.
+        '''
+        if not self._on_disk:
+            return self._file.getvalue()
+        self._file.flush()
+        if os.fstat(self._file.fileno()).st_size == 0:
+            # an empty file can't be mapped
+            return ''
+        return mmap(self._file.fileno(), 0, access=ACCESS_READ)
+
+    def reopen(self):
+        '''Return a new read-only file object with the same content, which
+        has its own position and can be used by another thread. It stays
+        readable until it is closed, even after the AttachmentFile is
+        closed.
+        '''
+        if not self._on_disk:
+            return ReadOnlyStringIO(self._file.getvalue())
+        self._file.flush()
+        return open(self._file.name, 'rb')
+
+    def close(self):
+        self._file.close()
+
+
+def get_content(f):
+    '''Return the content of a file object from its current position to the
+    end. For an AttachmentFile at the start, this is the buffer from
+    AttachmentFile.get_buffer, so the content is not copied.
+    '''
+    if isinstance(f, AttachmentFile) and f.tell() == 0:
+        return f.get_buffer()
+    return f.read()
@@ -62,7 +62,13 @@ class PDFUtil(object):
         device.close()
         return text
 
-    def get_pdfminer_layout(self, pdf_file):
+    def get_pdfminer_layout(self, pdf_file, page_numbers=None):
+        """
+        :param pdf_file: file object
+        :param page_numbers: optional set of page numbers (starting at 1) to
+        analyze. other pages are None in the result.
+        :return: list of pdfminer LTPage objects (or None), one for each page
+        """
         pdf_file.seek(0)
         parser = PDFParser(pdf_file)
         document = PDFDocument(parser)
@@ -72,7 +78,10 @@ class PDFUtil(object):
         interpreter = PDFPageInterpreter(rsrcmgr, device)
         try:
             pages = []
-            for page in PDFPage.create_pages(document):
+            for i, page in enumerate(PDFPage.create_pages(document)):
+                if page_numbers is not None and i + 1 not in page_numbers:
+                    pages.append(None)
+                    continue
                 interpreter.process_page(page)
                 pages.append(device.get_result())
         except PDFSyntaxError as e:
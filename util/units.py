@@ -1,15 +1,33 @@
-from pint import UnitRegistry
+def _create_unit_registry():
+    # pint is imported here because importing it also takes a while
+    from pint import UnitRegistry
+    registry = UnitRegistry()
+    registry.define('thms = 1 * therm = therms')
+    registry.define('kilowatthour = kWh = kwh')
+    registry.define('megatwatthour = MWh = 1000 * kWh')
+    registry.define('centumcubicfoot = 1 * therm = ccf = therms')
+    registry.define('kilowattdaily = 0 * therm = kwd = kWD')
+    registry.define('MMBTU = 10**6 * btu')
+    registry.define('mmbtu = MMBTU')
+    registry.define('Mcf = 10 * ccf')
+    return registry
+
+
+class _LazyUnitRegistry(object):
+    """Stands in for a pint UnitRegistry, which is only created when one of
+    its attributes is first used, because creating it takes a long time
+    (it parses pint's whole list of unit definitions).
+    """
+    def __init__(self):
+        self._registry = None
+
+    def __getattr__(self, name):
+        if self._registry is None:
+            self._registry = _create_unit_registry()
+        return getattr(self._registry, name)
 
 # pint unitregistry variable used for unit conversion
-unit_registry = UnitRegistry()
-unit_registry.define('thms = 1 * therm = therms')
-unit_registry.define('kilowatthour = kWh = kwh')
-unit_registry.define('megatwatthour = MWh = 1000 * kWh')
-unit_registry.define('centumcubicfoot = 1 * therm = ccf = therms')
-unit_registry.define('kilowattdaily = 0 * therm = kwd = kWD')
-unit_registry.define('MMBTU = 10**6 * btu')
-unit_registry.define('mmbtu = MMBTU')
-unit_registry.define('Mcf = 10 * ccf')
+unit_registry = _LazyUnitRegistry()
 
 def convert_to_therms(quantity, unit_name, ccf_conversion_factor=None):
     unit = unit_registry.parse_expression(unit_name)